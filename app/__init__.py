@@ -20,14 +20,26 @@ from flask import Flask, render_template, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_mail import Mail
 from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config
-from authlib.integrations.flask_client import OAuth
+from app.cache import init_caches, cargar_usuario_sesion
+from app.ratelimit import init_ratelimit
+from app.oidc import init_oidc
+from app.query_counter import init_detector_n1
+from app.scoring import init_scoring
+from app.notificaciones import init_notificaciones
+from app.idempotencia import init_idempotencia
+from app.archivo import init_archivo
+from app.serializacion import init_serializacion
+from app.eventos import init_eventos
+from app.compresion import init_compresion
+from app.asincrono import init_asincrono
+from app.arranque import FasesArranque, init_arranque
 
 # Inicializar extensiones (sin vincular a app todavía)
 db = SQLAlchemy()
 mail = Mail()
 login_manager = LoginManager()
-oauth = OAuth()
 
 
 def create_app(config_name='default'):
@@ -45,12 +57,23 @@ def create_app(config_name='default'):
         Flask: Instancia configurada de la aplicación Flask
     """
 
+    # Tiempos de cada fase (flask startup-profile, ver app/arranque.py)
+    fases = FasesArranque()
+
     # Crear instancia de Flask
     app = Flask(__name__)
 
     # Cargar configuración desde config.py
     app.config.from_object(config[config_name])
 
+    # Detrás de un proxy (Railway): IP y esquema del cliente según
+    # X-Forwarded-For y X-Forwarded-Proto. Sin esto todos los clientes
+    # tendrían la IP del proxy y compartirían los límites por IP
+    if app.config['PROXY_SALTOS']:
+        saltos = app.config['PROXY_SALTOS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=saltos, x_proto=saltos)
+    fases.marcar('configuracion')
+
     # Inicializar extensiones con la app
     db.init_app(app)
     mail.init_app(app)
@@ -60,19 +83,30 @@ def create_app(config_name='default'):
     login_manager.login_view = 'auth.login'  # Ruta de login
     login_manager.login_message = 'Por favor, inicia sesión para acceder a esta página.'
     login_manager.login_message_category = 'info'
-
-    # Configurar OAuth
-    oauth.init_app(app)
-    oauth.register(
-        name='google',
-        client_id=app.config['GOOGLE_CLIENT_ID'],
-        client_secret=app.config['GOOGLE_CLIENT_SECRET'],
-        server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-        client_kwargs={'scope': 'openid email profile'}
-    )
+    init_caches(app)
+
+    # Compresión gzip/brotli (el último after_request en ejecutarse)
+    init_compresion(app)
+
+    # Rate limiting (login y API)
+    init_ratelimit(app)
+    init_scoring(app)
+    init_notificaciones(app)
+    init_idempotencia(app)
+    init_archivo(app)
+    init_serializacion(app)
+    init_eventos(app)
+    init_asincrono(app)
+    fases.marcar('extensiones')
+
+    # Configurar OAuth (discovery y JWKS cacheados, ver app/oidc.py).
+    # El cliente de Authlib se crea con el primer login (cliente_google)
+    init_oidc(app)
+    fases.marcar('oidc')
 
     # Importar modelos
     from app import models
+    fases.marcar('modelos')
 
     # User loader para Flask-Login
     @login_manager.user_loader
@@ -83,10 +117,13 @@ def create_app(config_name='default'):
         Args:
             user_id (str): ID del usuario como string
 
+        Usa la caché de sesiones (app/cache.py) para no consultar la BD
+        en cada petición autenticada.
+
         Returns:
-            Usuario: Instancia del usuario o None
+            UsuarioSesion: Proyección del usuario o None
         """
-        return models.Usuario.query.get(int(user_id))
+        return cargar_usuario_sesion(int(user_id))
 
     # Registrar blueprints (rutas)
     from app.routes import auth, mascotas, solicitudes
@@ -95,10 +132,19 @@ def create_app(config_name='default'):
     app.register_blueprint(mascotas.bp)
     app.register_blueprint(solicitudes.bp)
     app.register_blueprint(api_bp)
+    fases.marcar('blueprints')
+
+    # Crear tablas en la base de datos si no existen (solo desarrollo y
+    # tests: en producción el esquema es el de scripts_bd/)
+    if app.config['CREAR_TABLAS']:
+        with app.app_context():
+            db.create_all()
+        fases.marcar('esquema')
 
-    # Crear tablas en la base de datos si no existen
-    with app.app_context():
-        db.create_all()
+    # Detector de N+1 (solo desarrollo)
+    if app.config['SQL_N1_DETECTION']:
+        with app.app_context():
+            init_detector_n1(app, db.engine)
 
     # Error handler para archivos demasiado grandes
     @app.errorhandler(413)
@@ -134,4 +180,7 @@ def create_app(config_name='default'):
                              total_usuarios=total_usuarios,
                              mascotas_destacadas=mascotas_destacadas)
 
+    fases.marcar('rutas')
+    init_arranque(app, fases)
+
     return app
\ No newline at end of file
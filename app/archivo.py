@@ -0,0 +1,137 @@
+"""
+Archivado de solicitudes resueltas antiguas.
+
+La tabla solicitudes solo crece; las aprobadas y rechazadas con más de
+ARCHIVO_SOLICITUDES_DIAS se mueven a solicitudes_archivadas en lotes de
+ARCHIVO_SOLICITUDES_LOTE (un commit por lote, sin bloqueos largos). Así
+la cola del panel admin, la búsqueda por usuario y mascota de
+solicitudes.nueva y sus índices solo cargan con las solicitudes vivas.
+
+- archivar_solicitudes: mueve las solicitudes por lotes
+- obtener_solicitud: busca una solicitud y, si ya no está, en el
+  archivo (detalle de la web y de la API admin)
+
+En PostgreSQL, scripts_bd/03_particiones.sql particiona además
+solicitudes por fecha_solicitud; tras archivar, las particiones antiguas
+quedan vacías y se pueden eliminar.
+
+Uso:
+    flask archivar-solicitudes                 # con la config
+    flask archivar-solicitudes --dias 365 --lote 500
+"""
+
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy.orm import joinedload
+
+ESTADOS_RESUELTOS = ('aprobada', 'rechazada')
+
+# Columnas que se copian de solicitudes a solicitudes_archivadas
+COLUMNAS_ARCHIVO = (
+    'id', 'usuario_id', 'mascota_id', 'fecha_solicitud', 'estado', 'cuestionario_json',
+    'comentarios_admin', 'fecha_revision', 'revisado_por', 'puntuacion'
+)
+
+
+def archivar_solicitudes(dias=None, lote=None):
+    """
+    Mueve las solicitudes resueltas antiguas al archivo, por lotes.
+
+    Cada lote se copia con un INSERT ... SELECT y se borra de
+    solicitudes (y de respuestas_cuestionario) en la misma transacción.
+
+    Args:
+        dias (int): Antigüedad mínima (ARCHIVO_SOLICITUDES_DIAS)
+        lote (int): Solicitudes por transacción (ARCHIVO_SOLICITUDES_LOTE)
+
+    Returns:
+        int: Número de solicitudes archivadas
+    """
+    from app import db
+    from app.cache import invalidar_conteos_solicitudes
+    from app.models import RespuestasCuestionario, Solicitud, SolicitudArchivada
+
+    config = current_app.config
+    dias = config['ARCHIVO_SOLICITUDES_DIAS'] if dias is None else dias
+    lote = lote or config['ARCHIVO_SOLICITUDES_LOTE']
+    ahora = datetime.utcnow()
+    limite = ahora - timedelta(days=dias)
+
+    columnas = [getattr(Solicitud, nombre) for nombre in COLUMNAS_ARCHIVO]
+    total = 0
+
+    while True:
+        # Índice (estado, fecha_solicitud, id)
+        ids = db.session.execute(
+            db.select(Solicitud.id)
+            .where(Solicitud.estado.in_(ESTADOS_RESUELTOS), Solicitud.fecha_solicitud < limite)
+            .order_by(Solicitud.id)
+            .limit(lote)
+        ).scalars().all()
+
+        if not ids:
+            break
+
+        db.session.execute(
+            db.insert(SolicitudArchivada).from_select(
+                list(COLUMNAS_ARCHIVO) + ['fecha_archivo'],
+                db.select(*columnas, db.literal(ahora, db.DateTime)).where(Solicitud.id.in_(ids))
+            )
+        )
+        db.session.execute(
+            db.delete(RespuestasCuestionario).where(RespuestasCuestionario.solicitud_id.in_(ids))
+        )
+        db.session.execute(
+            db.delete(Solicitud).where(Solicitud.id.in_(ids)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        total += len(ids)
+
+    if total:
+        # Los DELETE masivos no disparan los eventos del mapper
+        invalidar_conteos_solicitudes()
+    return total
+
+
+def obtener_solicitud(solicitud_id):
+    """
+    Busca una solicitud con su mascota y solicitante, también en el archivo.
+
+    Args:
+        solicitud_id (int): ID de la solicitud
+
+    Returns:
+        Solicitud, SolicitudArchivada o None si no existe
+    """
+    from app.models import Solicitud, SolicitudArchivada
+
+    for modelo in (Solicitud, SolicitudArchivada):
+        solicitud = modelo.query.options(
+            joinedload(modelo.mascota),
+            joinedload(modelo.usuario)
+        ).filter_by(id=solicitud_id).first()
+        if solicitud is not None:
+            return solicitud
+    return None
+
+
+@click.command('archivar-solicitudes')
+@click.option('--dias', type=int, help='Antigüedad mínima en días (ARCHIVO_SOLICITUDES_DIAS)')
+@click.option('--lote', type=int, help='Solicitudes por transacción (ARCHIVO_SOLICITUDES_LOTE)')
+def archivar_solicitudes_command(dias, lote):
+    """Mueve las solicitudes resueltas antiguas a solicitudes_archivadas."""
+    total = archivar_solicitudes(dias=dias, lote=lote)
+    click.echo(f'{total} solicitudes archivadas')
+
+
+def init_archivo(app):
+    """
+    Registra el comando `flask archivar-solicitudes`.
+
+    Args:
+        app: Instancia de Flask
+    """
+    app.cli.add_command(archivar_solicitudes_command)
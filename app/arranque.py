@@ -0,0 +1,195 @@
+"""
+Perfil del arranque de la app (importaciones y fases de create_app).
+
+Cada worker de gunicorn importa la app y ejecuta create_app al arrancar
+y cada vez que se recicla (max_requests). Las dependencias pesadas
+(boto3, Authlib, NumPy, el engine async) se importan con su primer uso,
+y create_all solo se ejecuta en desarrollo y tests (CREAR_TABLAS).
+
+`flask startup-profile` arranca la app en un intérprete nuevo (en el
+actual ya está todo importado) con `python -X importtime` y muestra:
+
+- El tiempo de `from app import create_app` y los módulos que más tardan
+- El tiempo de cada fase de create_app (FasesArranque)
+
+Con preload_app (gunicorn.conf.py) el maestro crea la app una vez y los
+workers la heredan con fork, compartiendo su memoria (copy-on-write).
+reiniciar_tras_fork les quita lo que no se puede compartir entre
+procesos: conexiones a la BD, clientes HTTP, hilos y locks.
+
+Uso:
+    flask startup-profile
+    flask startup-profile --config production --top 20
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import click
+
+# Script del intérprete nuevo: importa y crea la app y devuelve los tiempos
+SCRIPT_PERFIL = """
+import json, sys, time
+inicio = time.perf_counter()
+from app import create_app
+importacion = time.perf_counter() - inicio
+app = create_app(sys.argv[1])
+print(json.dumps({'importacion': importacion, 'fases': app.extensions['arranque'].fases}))
+"""
+
+
+class FasesArranque:
+    """
+    Cronómetro de las fases de create_app.
+
+    Se guarda en app.extensions['arranque'].
+
+    Attributes:
+        fases (list): Pares [fase, segundos] en orden
+    """
+
+    def __init__(self):
+        """Empieza a contar desde la creación."""
+        self.fases = []
+        self._ultima = time.perf_counter()
+
+    def marcar(self, fase):
+        """
+        Cierra una fase: el tiempo desde la marca anterior.
+
+        Args:
+            fase (str): Nombre de la fase terminada
+        """
+        ahora = time.perf_counter()
+        self.fases.append([fase, ahora - self._ultima])
+        self._ultima = ahora
+
+
+def parsear_importtime(salida):
+    """
+    Tiempos de la salida de `python -X importtime`.
+
+    Args:
+        salida (str): stderr del intérprete
+
+    Returns:
+        list: Tuplas (módulo, nivel, segundos acumulados), en el orden de
+              la salida (los submódulos antes que el módulo que los importa)
+    """
+    modulos = []
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        _, acumulado, nombre = linea[len('import time:'):].split('|')
+        if not acumulado.strip().isdigit():
+            continue  # cabecera
+        nivel = (len(nombre) - len(nombre.lstrip()) - 1) // 2
+        modulos.append((nombre.strip(), nivel, int(acumulado) / 1e6))
+    return modulos
+
+
+def perfil_arranque(config_name):
+    """
+    Arranca la app en un intérprete nuevo y mide importaciones y fases.
+
+    Args:
+        config_name (str): Configuración de create_app
+
+    Returns:
+        dict: importacion (segundos), fases ([fase, segundos]) y
+              modulos (parsear_importtime)
+
+    Raises:
+        RuntimeError: Si la app no arranca con esa configuración
+    """
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT_PERFIL, config_name],
+        cwd=raiz, capture_output=True, text=True, env={**os.environ, 'FLASK_ENV': config_name}
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1])
+
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    resultado['modulos'] = parsear_importtime(proceso.stderr)
+    return resultado
+
+
+@click.command('startup-profile')
+@click.option('--config', 'config_name', default=lambda: os.environ.get('FLASK_ENV') or 'development',
+              help='Configuración con la que arrancar la app')
+@click.option('--top', default=15, help='Módulos más lentos a mostrar')
+def startup_profile_command(config_name, top):
+    """Tiempo de importación y de cada fase de create_app en un arranque en frío."""
+    try:
+        perfil = perfil_arranque(config_name)
+    except RuntimeError as e:
+        raise click.ClickException(f'La app no arranca con {config_name!r}: {e}')
+
+    click.echo(f"Importación de app: {perfil['importacion'] * 1000:.0f} ms")
+    # Dependencias importadas directamente (por la app o por create_app)
+    directos = [m for m in perfil['modulos'] if m[1] <= 1 and m[0] != 'app']
+    for nombre, _, segundos in sorted(directos, key=lambda m: m[2], reverse=True)[:top]:
+        click.echo(f'  {segundos * 1000:7.1f} ms  {nombre}')
+
+    total = sum(segundos for _, segundos in perfil['fases'])
+    click.echo(f'create_app({config_name!r}): {total * 1000:.0f} ms')
+    for fase, segundos in perfil['fases']:
+        click.echo(f'  {segundos * 1000:7.1f} ms  {fase}')
+
+
+def liberar_conexiones(app, cerrar=True):
+    """
+    Vacía los pools de conexiones de SQLAlchemy de la app.
+
+    Args:
+        app: Instancia de Flask
+        cerrar (bool): Cerrar las conexiones (en el maestro). En un worker
+                       se sueltan sin cerrarlas: son las del maestro
+    """
+    from app import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=cerrar)
+
+
+def reiniciar_tras_fork(app):
+    """
+    Prepara la app heredada del maestro en un worker recién creado.
+
+    - Pools de SQLAlchemy vacíos (cada worker abre sus conexiones)
+    - Cliente de S3 (boto3) y de Google (Authlib): se crean de nuevo con
+      el primer uso
+    - Pool HTTP de OIDC propio (discovery y JWKS cacheados se conservan)
+    - Enviador de emails, broker de eventos y engine async sin los hilos,
+      locks y conexiones del maestro. Flask-Mail no guarda conexiones:
+      cada lote de emails abre la suya
+
+    Args:
+        app: Instancia de Flask
+    """
+    liberar_conexiones(app, cerrar=False)
+
+    app.extensions.pop('s3', None)
+    app.extensions.pop('oauth_google', None)
+
+    for nombre in ('oidc', 'notificaciones', 'eventos', 'asincrono'):
+        extension = app.extensions.get(nombre)
+        if extension is not None:
+            extension.tras_fork()
+
+
+def init_arranque(app, fases):
+    """
+    Guarda los tiempos del arranque y registra `flask startup-profile`.
+
+    Args:
+        app: Instancia de Flask
+        fases (FasesArranque): Cronómetro de create_app
+    """
+    app.extensions['arranque'] = fases
+    app.cli.add_command(startup_profile_command)
@@ -0,0 +1,469 @@
+"""
+Ruta de lectura async de la API pública (despliegue ASGI).
+
+Con gunicorn síncrono cada petición a /api/mascotas/ ocupa un worker
+mientras espera a la BD. Desplegada como ASGI (asgi.py, worker de
+uvicorn), la app atiende la lista y el detalle de mascotas con vistas
+async y un engine async de SQLAlchemy (asyncpg en PostgreSQL, aiosqlite
+en SQLite): mientras una consulta espera, el mismo proceso atiende otras
+peticiones.
+
+- La consulta SQL es la misma que la de las vistas síncronas
+  (consulta_lista, consulta_detalle) y la respuesta pasa por los mismos
+  before_request y after_request de Flask (rate limiting, compresión...)
+- El resto de rutas (web, API con escritura, SSE) se atienden con la app
+  Flask WSGI en un pool de ASGI_HILOS_WSGI hilos (a2wsgi)
+
+Dependencias opcionales (se importan al usarse, no al arrancar):
+sqlalchemy[asyncio], asyncpg o aiosqlite y a2wsgi; uvicorn para desplegar.
+
+Uso:
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+    flask benchmark-async --peticiones 2000 --concurrencia 200 --latencia-ms 20
+"""
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import click
+from flask import current_app, request
+from sqlalchemy import event
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+# Drivers async equivalentes a los síncronos de SQLALCHEMY_DATABASE_URI
+DRIVERS_ASYNC = {
+    'postgres': 'postgresql+asyncpg',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite'
+}
+
+
+def url_async(uri):
+    """
+    URL de la BD con el driver async equivalente.
+
+    Args:
+        uri (str): SQLALCHEMY_DATABASE_URI
+
+    Returns:
+        str: URL para create_async_engine
+
+    Raises:
+        ValueError: Si es SQLite en memoria (el engine async vería otra BD)
+                    o no hay driver async para el esquema
+    """
+    esquema, separador, resto = uri.partition('://')
+    if esquema not in DRIVERS_ASYNC or not separador:
+        raise ValueError(f'Sin driver async para {esquema!r}')
+    if esquema == 'sqlite' and resto in ('', '/', '/:memory:'):
+        raise ValueError('La ruta async necesita una BD en fichero o en servidor, no SQLite en memoria')
+    return f'{DRIVERS_ASYNC[esquema]}://{resto}'
+
+
+class MotorAsync:
+    """
+    Engine y sesiones async de la app.
+
+    El engine se crea con la primera consulta, ya en el bucle de eventos
+    del worker (los pools async no se comparten entre bucles ni entre
+    procesos). Se guarda en app.extensions['asincrono'].
+    """
+
+    def __init__(self, app):
+        """
+        Constructor del motor.
+
+        Args:
+            app: Instancia de Flask
+        """
+        self.app = app
+        self.engine = None
+        self._sesiones = None
+
+    def sesion(self):
+        """
+        Nueva sesión async (usar con `async with`).
+
+        Returns:
+            AsyncSession
+        """
+        if self.engine is None:
+            # Se importa aquí: con `flask run` o gunicorn WSGI no se usa
+            try:
+                from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+            except ImportError:
+                raise RuntimeError('La ruta async necesita sqlalchemy[asyncio] (greenlet)')
+
+            config = self.app.config
+            uri = config['SQLALCHEMY_ASYNC_DATABASE_URI'] or url_async(config['SQLALCHEMY_DATABASE_URI'])
+            self.engine = create_async_engine(
+                uri,
+                pool_size=config['ASYNC_POOL_SIZE'],
+                max_overflow=config['ASYNC_MAX_OVERFLOW'],
+                pool_pre_ping=True
+            )
+            self._sesiones = async_sessionmaker(self.engine, expire_on_commit=False)
+        return self._sesiones()
+
+    def tras_fork(self):
+        """
+        En un worker recién creado: sin el engine del maestro.
+
+        Sus conexiones pertenecen al bucle de eventos del maestro; el
+        worker crea el suyo con la primera consulta.
+        """
+        self.engine = None
+        self._sesiones = None
+
+    async def cerrar(self):
+        """Cierra las conexiones del pool (al apagar el worker)."""
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+
+async def listar_mascotas():
+    """Versión async de MascotaList.get (mismos parámetros y respuesta)."""
+    from app.models import Mascota
+    from app.routes.api.mascotas import consulta_lista, parsear_campos
+    from app.serializacion import respuesta_json, serializador
+
+    try:
+        campos = parsear_campos(request.args.get('fields'))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    async with current_app.extensions['asincrono'].sesion() as sesion:
+        filas = (await sesion.execute(consulta_lista(request.args, campos))).all()
+    return respuesta_json(serializador(Mascota, campos).filas(filas))
+
+
+async def detalle_mascota(id):
+    """Versión async de MascotaDetail.get (mismos parámetros y respuesta)."""
+    from app.models import Mascota
+    from app.routes.api.mascotas import consulta_detalle, parsear_campos
+    from app.serializacion import respuesta_json, serializador
+
+    try:
+        campos = parsear_campos(request.args.get('fields'))
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    async with current_app.extensions['asincrono'].sesion() as sesion:
+        fila = (await sesion.execute(consulta_detalle(id, campos))).first()
+    if fila is None:
+        return {'message': 'Mascota no encontrada'}, 404
+    return respuesta_json(serializador(Mascota, campos).fila(fila))
+
+
+# Endpoints de Flask que se atienden con vistas async
+VISTAS_ASYNC = {
+    'api.mascotas_mascota_list': listar_mascotas,
+    'api.mascotas_mascota_detail': detalle_mascota
+}
+
+
+def environ_wsgi(scope, cuerpo=b''):
+    """
+    Entorno WSGI equivalente a un scope HTTP de ASGI.
+
+    Args:
+        scope (dict): Scope de la petición
+        cuerpo (bytes): Cuerpo de la petición
+
+    Returns:
+        dict: environ para app.request_context()
+    """
+    servidor = scope.get('server') or ('localhost', 80)
+    cliente = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': servidor[0],
+        'SERVER_PORT': str(servidor[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': cliente[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(cuerpo),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    for nombre, valor in scope['headers']:
+        nombre = nombre.decode('latin-1').upper().replace('-', '_')
+        valor = valor.decode('latin-1')
+        if nombre not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            nombre = f'HTTP_{nombre}'
+        environ[nombre] = f'{environ[nombre]},{valor}' if nombre in environ else valor
+    return environ
+
+
+class AppASGI:
+    """
+    Aplicación ASGI: lecturas públicas async y el resto con Flask (WSGI).
+
+    Attributes:
+        app: Instancia de Flask
+        wsgi: La app Flask adaptada a ASGI (a2wsgi, pool de hilos)
+        proxy: ProxyFix para el environ de las vistas async (PROXY_SALTOS)
+    """
+
+    def __init__(self, app):
+        """
+        Constructor de la aplicación.
+
+        Args:
+            app: Instancia de Flask (create_app)
+        """
+        try:
+            from a2wsgi import WSGIMiddleware
+        except ImportError:
+            raise RuntimeError('El despliegue ASGI necesita a2wsgi')
+
+        self.app = app
+        self.wsgi = WSGIMiddleware(app, workers=app.config['ASGI_HILOS_WSGI'])
+
+        # Las vistas async no pasan por app.wsgi_app: el mismo ProxyFix
+        # que en create_app, aplicado solo al environ
+        saltos = app.config['PROXY_SALTOS']
+        self.proxy = ProxyFix(lambda environ, start_response: environ, x_for=saltos, x_proto=saltos) if saltos else None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.ciclo_de_vida(receive, send)
+
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            environ = environ_wsgi(scope)
+            if self.proxy is not None:
+                environ = self.proxy(environ, None)
+            try:
+                endpoint, argumentos = self.app.url_map.bind_to_environ(environ).match()
+            except HTTPException:
+                # 404, 405 y redirecciones: las resuelve Flask
+                endpoint = None
+
+            vista = VISTAS_ASYNC.get(endpoint)
+            if vista is not None:
+                return await self.atender(environ, vista, argumentos, send)
+
+        await self.wsgi(scope, receive, send)
+
+    async def atender(self, environ, vista, argumentos, send):
+        """
+        Atiende una petición con una vista async.
+
+        La respuesta pasa por los before_request y after_request de la
+        app y por sus manejadores de errores como en Flask
+        (full_dispatch_request), pero la vista se espera en el bucle de
+        eventos en lugar de bloquear un hilo. Los hooks son síncronos
+        (rate limiting con BD, compresión...): se ejecutan en un hilo
+        (asyncio.to_thread copia el contexto de la petición) para no
+        parar el bucle.
+        """
+        app = self.app
+        with app.request_context(environ):
+            try:
+                try:
+                    respuesta = await asyncio.to_thread(app.preprocess_request)
+                    if respuesta is None:
+                        respuesta = await vista(**argumentos)
+                except Exception as e:
+                    # HTTPException y errorhandler de la app (abort() en un hook...)
+                    respuesta = app.handle_user_exception(e)
+                respuesta = await asyncio.to_thread(app.finalize_request, respuesta)
+            except Exception as e:
+                respuesta = app.make_response(app.handle_exception(e))
+
+        cabeceras = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in respuesta.headers.items()]
+        await send({'type': 'http.response.start', 'status': respuesta.status_code, 'headers': cabeceras})
+        cuerpo = b'' if environ['REQUEST_METHOD'] == 'HEAD' else respuesta.get_data()
+        await send({'type': 'http.response.body', 'body': cuerpo})
+
+    async def ciclo_de_vida(self, receive, send):
+        """Arranque y parada del worker: al parar se cierra el pool async."""
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                await self.app.extensions['asincrono'].cerrar()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def peticion_asgi(aplicacion, ruta, query=b''):
+    """
+    Hace una petición GET a una app ASGI sin servidor (tests y benchmark).
+
+    Args:
+        aplicacion: App ASGI
+        ruta (str): Ruta, p.ej. '/api/mascotas/'
+        query (bytes): Query string
+
+    Returns:
+        tuple: (código, cabeceras (dict), cuerpo (bytes))
+    """
+    mensajes = []
+
+    async def recibir():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def enviar(mensaje):
+        mensajes.append(mensaje)
+
+    await aplicacion({
+        'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': ruta, 'raw_path': ruta.encode(),
+        'root_path': '', 'query_string': query, 'headers': [], 'scheme': 'http', 'server': ('localhost', 80), 'client': ('127.0.0.1', 0)
+    }, recibir, enviar)
+
+    inicio = mensajes[0]
+    cabeceras = {k.decode(): v.decode() for k, v in inicio['headers']}
+    cuerpo = b''.join(m.get('body', b'') for m in mensajes[1:])
+    return inicio['status'], cabeceras, cuerpo
+
+
+def simular_latencia(engine, segundos):
+    """
+    Añade una espera a cada consulta, como el viaje de red a la BD.
+
+    En SQLite la espera es una función SQL que duerme en el hilo de la
+    conexión: bloquea el hilo en la ruta síncrona, pero no el bucle de
+    eventos en la async (aiosqlite usa su propio hilo), igual que una
+    espera de red. En PostgreSQL se usa pg_sleep.
+
+    Args:
+        engine: Engine síncrono (o engine.sync_engine del async)
+        segundos (float): Espera por consulta
+    """
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def registrar_funcion(conexion, registro):
+            conexion.create_function('latencia', 0, lambda: time.sleep(segundos))
+
+        espera = 'SELECT latencia()'
+    else:
+        espera = f'SELECT pg_sleep({float(segundos)})'
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def esperar(conexion, cursor, sentencia, parametros, contexto, executemany):
+        if sentencia != espera:
+            cursor.execute(espera)
+
+
+def comparar_rendimiento(app, peticiones=2000, concurrencia=200, hilos=4, latencia_ms=20):
+    """
+    Peticiones por segundo a /api/mascotas/<id>: ruta síncrona frente a async.
+
+    La síncrona se mide con `hilos` peticiones a la vez (como `hilos`
+    workers síncronos de gunicorn); la async con `concurrencia`
+    peticiones a la vez en un solo bucle de eventos (un worker uvicorn).
+
+    Args:
+        app: Instancia de Flask con una BD en fichero o en servidor
+        peticiones (int): Peticiones de cada ruta
+        concurrencia (int): Peticiones simultáneas en la ruta async
+        hilos (int): Peticiones simultáneas en la ruta síncrona
+        latencia_ms (float): Latencia simulada por consulta (0 = ninguna)
+
+    Returns:
+        dict: Peticiones por segundo de cada ruta
+
+    Raises:
+        ValueError: Si la BD es SQLite en memoria o no hay mascotas
+    """
+    from app import db
+    from app.models import Mascota
+
+    if not app.config['SQLALCHEMY_ASYNC_DATABASE_URI']:
+        url_async(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    app.config['RATELIMIT_ENABLED'] = False
+    with app.app_context():
+        mascota_id = db.session.query(db.func.min(Mascota.id)).scalar()
+        if mascota_id is None:
+            raise ValueError('Hace falta al menos una mascota en la BD')
+        engine = db.engine
+    ruta = f'/api/mascotas/{mascota_id}'
+
+    if latencia_ms:
+        simular_latencia(engine, latencia_ms / 1000)
+        # Las conexiones abiertas no tienen la función de latencia
+        engine.dispose()
+
+    # Ruta síncrona: `hilos` workers
+    cliente = app.test_client()
+
+    def sincrona(_):
+        assert cliente.get(ruta).status_code == 200
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(sincrona, range(peticiones)))
+    sincronas = peticiones / (time.perf_counter() - inicio)
+
+    # Ruta async: un bucle de eventos con `concurrencia` peticiones a la vez
+    aplicacion = AppASGI(app)
+    motor = app.extensions['asincrono']
+
+    async def medir():
+        limite = asyncio.Semaphore(concurrencia)
+
+        async def asincrona():
+            async with limite:
+                codigo, _, _ = await peticion_asgi(aplicacion, ruta)
+                assert codigo == 200
+
+        # Crear el engine (sin conectar) y calentar el pool antes de medir
+        async with motor.sesion():
+            pass
+        if latencia_ms:
+            simular_latencia(motor.engine.sync_engine, latencia_ms / 1000)
+        await peticion_asgi(aplicacion, ruta)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(asincrona() for _ in range(peticiones)))
+        segundos = time.perf_counter() - inicio
+        await motor.cerrar()
+        return peticiones / segundos
+
+    asincronas = asyncio.run(medir())
+    return {'sincrona': sincronas, 'async': asincronas}
+
+
+@click.command('benchmark-async')
+@click.option('--peticiones', default=2000, help='Peticiones de cada ruta')
+@click.option('--concurrencia', default=200, help='Peticiones simultáneas en la ruta async')
+@click.option('--hilos', default=4, help='Peticiones simultáneas en la ruta síncrona (workers)')
+@click.option('--latencia-ms', default=20.0, help='Latencia simulada por consulta (0 = la real de la BD)')
+def benchmark_async_command(peticiones, concurrencia, hilos, latencia_ms):
+    """Compara peticiones/s de /api/mascotas/<id> en la ruta síncrona y la async."""
+    try:
+        resultado = comparar_rendimiento(
+            current_app._get_current_object(), peticiones, concurrencia, hilos, latencia_ms
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"síncrona ({hilos} workers): {resultado['sincrona']:.0f} peticiones/s")
+    click.echo(f"async (concurrencia {concurrencia}): {resultado['async']:.0f} peticiones/s")
+    click.echo(f"{resultado['async'] / resultado['sincrona']:.1f}x")
+
+
+def init_asincrono(app):
+    """
+    Prepara el engine async (se crea al usarse) y `flask benchmark-async`.
+
+    Args:
+        app: Instancia de Flask
+    """
+    app.extensions['asincrono'] = MotorAsync(app)
+    app.cli.add_command(benchmark_async_command)
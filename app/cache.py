@@ -0,0 +1,331 @@
+"""
+Cachés en memoria por worker.
+
+Este módulo contiene:
+- TTLCache: caché clave/valor con caducidad (TTL) y tamaño máximo (LRU)
+- UsuarioSesion: proyección ligera del Usuario para Flask-Login
+- Funciones para cargar e invalidar usuarios en la caché de sesiones
+- RevocacionesUsuarios: usuarios cuyos JWT ya no deben aceptarse
+- Conteos de solicitudes por estado para el panel de administración
+
+La lista de access tokens revocados (logout) también usa una TTLCache,
+guardada en app.extensions['jwt_denylist'].
+
+Cada worker de gunicorn tiene su propia caché, guardada en
+app.extensions['usuario_cache']. La invalidación explícita solo afecta
+al worker que modifica el usuario; en el resto, el TTL limita el tiempo
+máximo que se puede servir un dato desactualizado.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+
+
+class TTLCache:
+    """
+    Caché en memoria con caducidad y tamaño acotado.
+
+    Las entradas caducan `ttl` segundos después de guardarse. Cuando se
+    supera `maxsize`, se descarta la entrada usada hace más tiempo (LRU).
+    Es segura para usar desde varios hilos.
+
+    Attributes:
+        maxsize (int): Número máximo de entradas
+        ttl (float): Segundos de vida de cada entrada
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        """
+        Constructor de la caché.
+
+        Args:
+            maxsize (int): Número máximo de entradas
+            ttl (float): Segundos de vida de cada entrada
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave, default=None):
+        """
+        Obtiene un valor de la caché.
+
+        Args:
+            clave: Clave a buscar
+            default: Valor a devolver si no existe o ha caducado
+
+        Returns:
+            El valor guardado o `default`
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return default
+
+            valor, expira = entrada
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return default
+
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor):
+        """
+        Guarda un valor en la caché.
+
+        Args:
+            clave: Clave de la entrada
+            valor: Valor a guardar
+        """
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        """Elimina una entrada de la caché (si existe)."""
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        """Vacía la caché."""
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class UsuarioSesion(UserMixin):
+    """
+    Proyección ligera de Usuario para la sesión de Flask-Login.
+
+    Solo contiene los campos necesarios para saber quién es el usuario
+    (id, email, nombre, rol, activo). Evita cargar columnas pesadas
+    como direccion o password_hash en cada petición autenticada.
+
+    Attributes:
+        id (int): Identificador del usuario
+        email (str): Email del usuario
+        nombre (str): Nombre del usuario
+        rol (str): 'adoptante' o 'admin'
+        activo (bool): Si la cuenta está activa
+    """
+
+    def __init__(self, id, email, nombre, rol, activo):
+        self.id = id
+        self.email = email
+        self.nombre = nombre
+        self.rol = rol
+        self.activo = activo
+
+    @property
+    def is_active(self):
+        """Flask-Login: una cuenta desactivada no está activa."""
+        return bool(self.activo)
+
+    def is_admin(self):
+        """
+        Comprueba si el usuario es administrador.
+
+        Returns:
+            bool: True si es admin, False si es adoptante
+        """
+        return self.rol == 'admin'
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<UsuarioSesion {self.email} ({self.rol})>'
+
+
+class RevocacionesUsuarios:
+    """
+    Conjunto en memoria de usuarios con tokens revocados.
+
+    Permite validar un JWT sin consultar la BD en cada petición. Se
+    refresca desde la BD como mucho cada `intervalo` segundos con una
+    única query que solo trae los usuarios desactivados o con tokens
+    revocados (token_version > 0), no la tabla completa.
+
+    Attributes:
+        intervalo (float): Segundos entre refrescos desde la BD
+        inactivos (set): IDs de usuarios desactivados
+        versiones (dict): Versión mínima de token aceptada por usuario
+    """
+
+    def __init__(self, intervalo=30):
+        """
+        Constructor del conjunto de revocaciones.
+
+        Args:
+            intervalo (float): Segundos entre refrescos desde la BD
+        """
+        self.intervalo = intervalo
+        self.inactivos = set()
+        self.versiones = {}
+        self._refrescado = None
+        self._lock = threading.Lock()
+
+    def caducar(self):
+        """Fuerza un refresco desde la BD en la próxima comprobación."""
+        self._refrescado = None
+
+    def refrescar(self):
+        """Recarga los usuarios desactivados y las versiones de token."""
+        from app import db
+        from app.models import Usuario
+
+        filas = db.session.query(Usuario.id, Usuario.activo, Usuario.token_version)\
+            .filter((Usuario.activo.is_(False)) | (Usuario.token_version > 0))\
+            .all()
+
+        self.inactivos = {id for id, activo, _ in filas if not activo}
+        self.versiones = {id: version for id, _, version in filas if version}
+        self._refrescado = time.monotonic()
+
+    def esta_revocado(self, user_id, token_version):
+        """
+        Comprueba si un token de un usuario ha sido revocado.
+
+        Args:
+            user_id (int): ID del usuario del token
+            token_version (int): Versión de token incluida en el JWT
+
+        Returns:
+            bool: True si el token no debe aceptarse
+        """
+        if self._refrescado is None or time.monotonic() - self._refrescado > self.intervalo:
+            with self._lock:
+                if self._refrescado is None or time.monotonic() - self._refrescado > self.intervalo:
+                    self.refrescar()
+
+        if user_id in self.inactivos:
+            return True
+        return token_version < self.versiones.get(user_id, 0)
+
+
+def init_caches(app):
+    """
+    Crea las cachés en memoria de la app (usuarios, JWT, conteos).
+
+    Args:
+        app: Instancia de Flask
+    """
+    app.extensions['usuario_cache'] = TTLCache(
+        maxsize=app.config['USER_CACHE_MAX_SIZE'],
+        ttl=app.config['USER_CACHE_TTL_SECONDS']
+    )
+    app.extensions['jwt_revocaciones'] = RevocacionesUsuarios(
+        intervalo=app.config['JWT_REVOCATION_REFRESH_SECONDS']
+    )
+    app.extensions['jwt_denylist'] = TTLCache(
+        maxsize=app.config['JWT_DENYLIST_CACHE_SIZE'],
+        ttl=app.config['JWT_DENYLIST_CACHE_SECONDS']
+    )
+    app.extensions['solicitudes_conteos'] = TTLCache(
+        maxsize=1,
+        ttl=app.config['SOLICITUDES_CONTEOS_TTL_SECONDS']
+    )
+
+
+def cargar_usuario_sesion(user_id):
+    """
+    Carga la proyección de un usuario, usando la caché si es posible.
+
+    Si no está en caché, hace una única query con las columnas de la
+    proyección. Los usuarios desactivados no se devuelven, de forma que
+    Flask-Login cierra su sesión.
+
+    Args:
+        user_id (int): ID del usuario
+
+    Returns:
+        UsuarioSesion: Proyección del usuario o None
+    """
+    from app import db
+    from app.models import Usuario
+
+    cache = current_app.extensions['usuario_cache']
+    usuario = cache.get(user_id)
+
+    if usuario is None:
+        fila = db.session.query(
+            Usuario.id, Usuario.email, Usuario.nombre, Usuario.rol, Usuario.activo
+        ).filter(Usuario.id == user_id).first()
+
+        if fila is None:
+            return None
+
+        usuario = UsuarioSesion(*fila)
+        cache.set(user_id, usuario)
+
+    return usuario if usuario.activo else None
+
+
+def invalidar_usuario(user_id):
+    """
+    Elimina un usuario de la caché de sesiones del worker actual.
+
+    También fuerza el refresco de las revocaciones de JWT, para que
+    una desactivación se aplique de inmediato en este worker.
+    Se llama automáticamente al modificar o borrar un Usuario
+    (ver listeners en app/models.py).
+
+    Args:
+        user_id (int): ID del usuario
+    """
+    if not has_app_context():
+        return
+
+    cache = current_app.extensions.get('usuario_cache')
+    if cache is not None:
+        cache.delete(user_id)
+
+    revocaciones = current_app.extensions.get('jwt_revocaciones')
+    if revocaciones is not None:
+        revocaciones.caducar()
+
+
+def conteos_solicitudes():
+    """
+    Número de solicitudes por estado, con una única query GROUP BY.
+
+    El resultado se cachea SOLICITUDES_CONTEOS_TTL_SECONDS segundos y se
+    invalida al crear o modificar solicitudes en este worker.
+
+    Returns:
+        dict: {'pendiente': n, 'aprobada': n, 'rechazada': n, 'todas': n}
+    """
+    from app import db
+    from app.models import Solicitud
+
+    cache = current_app.extensions['solicitudes_conteos']
+    conteos = cache.get('estados')
+
+    if conteos is None:
+        conteos = {'pendiente': 0, 'aprobada': 0, 'rechazada': 0}
+        filas = db.session.query(Solicitud.estado, db.func.count(Solicitud.id))\
+            .group_by(Solicitud.estado)\
+            .all()
+        conteos.update(dict(filas))
+        conteos['todas'] = sum(n for _, n in filas)
+        cache.set('estados', conteos)
+
+    return conteos
+
+
+def invalidar_conteos_solicitudes():
+    """Descarta los conteos de solicitudes cacheados en este worker."""
+    if not has_app_context():
+        return
+
+    cache = current_app.extensions.get('solicitudes_conteos')
+    if cache is not None:
+        cache.clear()
@@ -0,0 +1,207 @@
+"""
+Feed de cambios para la sincronización incremental de la API.
+
+Las apps que replican el catálogo (o las solicitudes de un usuario) ya
+no tienen que descargarlo entero: piden los cambios posteriores a una
+marca y guardan la marca `siguiente` que se les devuelve. El tráfico
+depende de cuánto cambia el catálogo, no de su tamaño.
+
+- Mascota y Solicitud tienen fecha_actualizacion (se actualiza en cada
+  UPDATE, también en los masivos de Core) e índices por
+  (fecha_actualizacion, id). La asigna la base de datos (ahora_utc), no
+  el reloj de cada worker
+- Al borrar una mascota queda una marca de borrado en
+  mascotas_eliminadas
+- La marca es el par (fecha, id) de la última fila entregada, con el
+  formato 'fecha_id' del cursor del panel admin. El orden es estricto:
+  una marca nunca retrocede ni repite filas
+
+En PostgreSQL la fecha es la del inicio de la transacción, no la del
+commit: una transacción lenta podría confirmar una fila con una fecha
+anterior a la marca ya entregada. Por eso solo se entregan las filas con
+más de CAMBIOS_MARGEN_SEGUNDOS de antigüedad según el mismo reloj. Es la
+duración máxima de cualquier transacción que escriba en mascotas,
+mascotas_eliminadas o solicitudes (también cada lote de los comandos
+flask); una más larga puede perder cambios en el feed.
+"""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from app.serializacion import serializador
+
+
+def codificar_marca(fecha, fila_id):
+    """
+    Marca que apunta a un cambio.
+
+    Args:
+        fecha (datetime): fecha_actualizacion (o de eliminación) de la fila
+        fila_id (int): ID de la fila
+
+    Returns:
+        str: Marca 'fecha_id'
+    """
+    return f'{fecha.isoformat()}_{fila_id}'
+
+
+def decodificar_marca(marca):
+    """
+    Convierte una marca en (fecha, id).
+
+    A diferencia del cursor del panel admin, una marca no válida es un
+    error: ignorarla haría que el cliente volviera a descargarlo todo.
+
+    Args:
+        marca (str): Marca devuelta en `siguiente` (None o vacía = desde el principio)
+
+    Returns:
+        tuple: (fecha, id) o None si no hay marca
+
+    Raises:
+        ValueError: Si la marca no es válida
+    """
+    if not marca:
+        return None
+
+    fecha, _, fila_id = marca.rpartition('_')
+    return datetime.fromisoformat(fecha), int(fila_id)
+
+
+def posteriores(query, columna_fecha, columna_id, marca, limite):
+    """
+    Filas posteriores a una marca, en orden (fecha, id).
+
+    Solo incluye las filas con más de CAMBIOS_MARGEN_SEGUNDOS según el
+    reloj de la base de datos (ver el docstring del módulo).
+
+    Args:
+        query: Query base
+        columna_fecha: Columna con la fecha del cambio
+        columna_id: Columna con el ID de la fila
+        marca (tuple): (fecha, id) de decodificar_marca, o None
+        limite (int): Número máximo de filas
+
+    Returns:
+        list: Filas de la query
+    """
+    from app import db
+    from app.models import ahora_utc
+
+    corte = db.session.scalar(db.select(ahora_utc()))
+    corte -= timedelta(seconds=current_app.config['CAMBIOS_MARGEN_SEGUNDOS'])
+    query = query.filter(columna_fecha <= corte)
+
+    if marca:
+        fecha, ultimo_id = marca
+        query = query.filter(or_(
+            columna_fecha > fecha,
+            and_(columna_fecha == fecha, columna_id > ultimo_id)
+        ))
+
+    return query.order_by(columna_fecha, columna_id).limit(limite).all()
+
+
+def pagina_cambios(cambios, marca, limite):
+    """
+    Ordena los cambios de una o varias tablas y corta la página.
+
+    Args:
+        cambios (list): Tuplas (fecha, id, tipo, dato); de cada tabla
+                        basta con sus limite + 1 primeras
+        marca (str): Marca recibida (se devuelve si no hay cambios)
+        limite (int): Cambios por página
+
+    Returns:
+        dict: {tipo: [datos]}, siguiente (marca del último cambio) y
+              hay_mas (si quedan cambios para otra llamada)
+    """
+    cambios = sorted(cambios, key=lambda cambio: (cambio[0], cambio[1]))
+    pagina = cambios[:limite]
+
+    resultado = {}
+    for _, _, tipo, dato in pagina:
+        resultado.setdefault(tipo, []).append(dato)
+
+    resultado['siguiente'] = codificar_marca(*pagina[-1][:2]) if pagina else marca
+    resultado['hay_mas'] = len(cambios) > limite
+    return resultado
+
+
+def cambios_mascotas(campos, marca, limite):
+    """
+    Mascotas modificadas y eliminadas después de una marca.
+
+    Args:
+        campos (tuple): Campos de las mascotas a devolver (incluye id)
+        marca (str): Marca de la sincronización anterior (o None)
+        limite (int): Cambios por página
+
+    Returns:
+        dict: mascotas (modificadas o nuevas, en cualquier estado),
+              eliminadas (ids), siguiente y hay_mas
+
+    Raises:
+        ValueError: Si la marca no es válida
+    """
+    from app.models import Mascota, MascotaEliminada
+
+    desde = decodificar_marca(marca)
+
+    query = Mascota.query.with_entities(
+        Mascota.fecha_actualizacion,
+        *[getattr(Mascota, campo) for campo in campos]
+    )
+    filas = posteriores(query, Mascota.fecha_actualizacion, Mascota.id, desde, limite + 1)
+    convertir = serializador(Mascota, campos)
+
+    eliminadas = posteriores(
+        MascotaEliminada.query.with_entities(MascotaEliminada.fecha_eliminacion, MascotaEliminada.id),
+        MascotaEliminada.fecha_eliminacion, MascotaEliminada.id, desde, limite + 1
+    )
+
+    cambios = []
+    for fila in filas:
+        mascota = convertir.fila(fila[1:])
+        cambios.append((fila[0], mascota['id'], 'mascotas', mascota))
+    cambios.extend((fecha, mascota_id, 'eliminadas', mascota_id) for fecha, mascota_id in eliminadas)
+
+    resultado = pagina_cambios(cambios, marca, limite)
+    resultado.setdefault('mascotas', [])
+    resultado.setdefault('eliminadas', [])
+    return resultado
+
+
+def cambios_solicitudes(usuario_id, marca, limite):
+    """
+    Solicitudes de un usuario creadas o modificadas después de una marca.
+
+    Las solicitudes no se borran (las archivadas siguen resueltas en la
+    copia del cliente), así que no hay marcas de borrado.
+
+    Args:
+        usuario_id (int): Dueño de las solicitudes
+        marca (str): Marca de la sincronización anterior (o None)
+        limite (int): Cambios por página
+
+    Returns:
+        dict: solicitudes, siguiente y hay_mas
+
+    Raises:
+        ValueError: Si la marca no es válida
+    """
+    from app.models import Solicitud
+
+    solicitudes = posteriores(
+        Solicitud.query.filter_by(usuario_id=usuario_id),
+        Solicitud.fecha_actualizacion, Solicitud.id, decodificar_marca(marca), limite + 1
+    )
+
+    resultado = pagina_cambios(
+        [(s.fecha_actualizacion, s.id, 'solicitudes', s.to_dict()) for s in solicitudes],
+        marca, limite
+    )
+    resultado.setdefault('solicitudes', [])
+    return resultado
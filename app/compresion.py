@@ -0,0 +1,162 @@
+"""
+Compresión de respuestas (gzip y brotli) negociada con Accept-Encoding.
+
+Se comprimen las respuestas HTML, JSON, CSS, JS y texto de al menos
+COMPRESION_MINIMO_BYTES. Brotli se usa si el paquete está instalado y
+el cliente lo acepta; si no, gzip.
+
+Las respuestas GET llevan un ETag calculado sobre el contenido sin
+comprimir, con el sufijo de la codificación (cada variante tiene el
+suyo). Si el cliente ya tiene esa variante (If-None-Match) se responde
+304 sin comprimir nada, y los bytes comprimidos se guardan en una caché
+por ETag y codificación: una página del catálogo o una lista de la API
+que no cambia se comprime una vez por variante, no en cada petición.
+
+Las respuestas en streaming (SSE, ficheros) no se tocan.
+"""
+
+import gzip
+
+from flask import request
+
+from app.cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli solo se usa gzip
+    brotli = None
+
+
+def codificaciones_disponibles():
+    """Codificaciones soportadas, por orden de preferencia."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def elegir_codificacion(aceptadas):
+    """
+    Elige la codificación según Accept-Encoding.
+
+    Args:
+        aceptadas: request.accept_encodings (Accept de Werkzeug)
+
+    Returns:
+        str: 'br', 'gzip' o None si el cliente no acepta ninguna
+    """
+    candidatas = [c for c in codificaciones_disponibles() if aceptadas[c] > 0]
+    if not candidatas:
+        return None
+    # Mayor calidad (q) primero; a igual calidad, el orden de preferencia
+    return max(candidatas, key=lambda c: aceptadas[c])
+
+
+def comprimir(datos, codificacion, config):
+    """
+    Comprime unos bytes.
+
+    Args:
+        datos (bytes): Cuerpo sin comprimir
+        codificacion (str): 'br' o 'gzip'
+        config: Configuración de la app (niveles de compresión)
+
+    Returns:
+        bytes: Cuerpo comprimido
+    """
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=config['COMPRESION_NIVEL_BROTLI'])
+    # mtime=0: la misma entrada da siempre los mismos bytes
+    return gzip.compress(datos, compresslevel=config['COMPRESION_NIVEL_GZIP'], mtime=0)
+
+
+def es_comprimible(response, config):
+    """Indica si una respuesta se puede comprimir."""
+    return (
+        200 <= response.status_code < 300
+        and response.status_code != 206
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and 'Content-Encoding' not in response.headers
+        and response.mimetype in config['COMPRESION_TIPOS']
+    )
+
+
+class Compresor:
+    """
+    Comprime las respuestas y guarda las variantes ya comprimidas.
+
+    Se guarda en app.extensions['compresion'].
+
+    Attributes:
+        cache (TTLCache): Bytes comprimidos por (ETag, codificación)
+    """
+
+    def __init__(self, app):
+        """
+        Constructor del compresor.
+
+        Args:
+            app: Instancia de Flask
+        """
+        self.config = app.config
+        self.cache = TTLCache(
+            maxsize=app.config['COMPRESION_CACHE_ENTRADAS'],
+            ttl=app.config['COMPRESION_CACHE_TTL_SECONDS']
+        )
+
+    def procesar(self, response):
+        """
+        Añade ETag, responde 304 si procede y comprime la respuesta.
+
+        Args:
+            response: Respuesta de Flask
+
+        Returns:
+            La misma respuesta, modificada
+        """
+        if not es_comprimible(response, self.config):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        codificacion = elegir_codificacion(request.accept_encodings)
+        if len(response.get_data()) < self.config['COMPRESION_MINIMO_BYTES']:
+            codificacion = None
+
+        etag = None
+        if request.method in ('GET', 'HEAD'):
+            etag, debil = response.get_etag()
+            if etag is None:
+                response.add_etag()
+                etag, debil = response.get_etag()
+            if codificacion:
+                etag = f'{etag}-{codificacion}'
+                response.set_etag(etag, weak=debil)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        if codificacion is None:
+            return response
+
+        comprimido = self.cache.get((etag, codificacion)) if etag else None
+        if comprimido is None:
+            comprimido = comprimir(response.get_data(), codificacion, self.config)
+            if etag:
+                self.cache.set((etag, codificacion), comprimido)
+
+        response.set_data(comprimido)
+        response.headers['Content-Encoding'] = codificacion
+        return response
+
+
+def init_compresion(app):
+    """
+    Activa la compresión de respuestas (COMPRESION_ACTIVA).
+
+    Args:
+        app: Instancia de Flask
+    """
+    if not app.config['COMPRESION_ACTIVA']:
+        return
+
+    compresor = Compresor(app)
+    app.extensions['compresion'] = compresor
+    app.after_request(compresor.procesar)
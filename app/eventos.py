@@ -0,0 +1,421 @@
+"""
+Eventos en tiempo real (Server-Sent Events) del estado de las solicitudes.
+
+Los adoptantes ya no tienen que recargar mis_solicitudes ni consultar
+/api/solicitudes/mias periódicamente: se conectan a un flujo SSE y
+reciben cada aprobación o rechazo de sus solicitudes.
+
+- registrar: guarda el cambio en eventos_solicitud en la transacción de
+  la revisión (como los emails de app/notificaciones.py). Si se deshace,
+  no hay evento
+- La tabla es la fuente de verdad: el ID del evento es el id SSE y un
+  cliente que se reconecta con Last-Event-ID recibe los posteriores
+- El canal entre workers solo despierta a los flujos abiertos del
+  usuario, que vuelven a leer la tabla:
+    - 'memoria': en el propio proceso, tras el commit (tests, un worker)
+    - 'postgres': NOTIFY dentro de la transacción (se entrega al hacer
+      commit) y un hilo por worker que hace LISTEN
+- Cada EVENTOS_LATIDO_SEGUNDOS se envía un comentario para que proxies
+  y balanceadores no cierren la conexión, y a los
+  EVENTOS_DURACION_MAXIMA_SEGUNDOS se cierra el flujo: el navegador
+  (EventSource) se reconecta solo con Last-Event-ID
+- Cada flujo abierto ocupa un hilo del worker todo el tiempo; por encima
+  de EVENTOS_MAX_FLUJOS por worker se responde 503 con Retry-After, para
+  que queden hilos libres para el resto de peticiones
+
+Uso:
+    flask limpiar-eventos    # borra los de más de EVENTOS_RETENCION_HORAS
+"""
+
+import importlib
+import logging
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.serializacion import codificar
+
+logger = logging.getLogger(__name__)
+
+# Eventos leídos de la tabla por consulta
+LOTE_EVENTOS = 100
+
+
+class BrokerMemoria:
+    """
+    Canal de eventos dentro del proceso.
+
+    Cada flujo SSE abierto tiene una cola; publicar() la despierta. Con
+    varios workers solo llegan los eventos confirmados en el mismo
+    proceso (usar 'postgres').
+    """
+
+    def __init__(self, app):
+        """
+        Constructor del broker.
+
+        Args:
+            app: Instancia de Flask
+        """
+        self.app = app
+        self._colas = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def suscribir(self, usuario_id, maximo=None):
+        """
+        Abre una suscripción a los eventos de un usuario.
+
+        Args:
+            usuario_id (int): Usuario del flujo SSE
+            maximo (int): Suscripciones abiertas como máximo en el proceso
+                          (None: sin límite)
+
+        Returns:
+            queue.Queue: Cola que recibe un aviso por cada publicación;
+                         None si ya hay `maximo` suscripciones abiertas
+        """
+        cola = queue.Queue(maxsize=1)
+        with self._lock:
+            if maximo is not None and self.abiertas() >= maximo:
+                return None
+            self._colas[usuario_id].add(cola)
+        return cola
+
+    def abiertas(self):
+        """Número de suscripciones abiertas en el proceso."""
+        return sum(len(colas) for colas in self._colas.values())
+
+    def desuscribir(self, usuario_id, cola):
+        """Cierra una suscripción abierta con suscribir()."""
+        with self._lock:
+            colas = self._colas.get(usuario_id)
+            if colas is not None:
+                colas.discard(cola)
+                if not colas:
+                    del self._colas[usuario_id]
+
+    def publicar(self, usuario_id):
+        """
+        Despierta los flujos abiertos de un usuario.
+
+        Los avisos se agrupan: si la cola ya tiene uno, no se añade otro
+        (el flujo lee todos los eventos nuevos de la tabla).
+
+        Args:
+            usuario_id (int): Destinatario de los eventos nuevos
+        """
+        with self._lock:
+            colas = list(self._colas.get(usuario_id, ()))
+        for cola in colas:
+            try:
+                cola.put_nowait(True)
+            except queue.Full:
+                pass
+
+    def tras_fork(self):
+        """En un worker recién creado: sin las suscripciones ni el lock del maestro."""
+        self._colas = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def en_transaccion(self, session, usuario_id):
+        """Anota el aviso para publicarlo cuando se confirme la transacción."""
+        session.info.setdefault('eventos_usuarios', set()).add(usuario_id)
+
+    def tras_commit(self, usuarios):
+        """Publica los avisos de una transacción confirmada."""
+        for usuario_id in usuarios:
+            self.publicar(usuario_id)
+
+
+class BrokerPostgres(BrokerMemoria):
+    """
+    Canal de eventos entre workers con LISTEN/NOTIFY de PostgreSQL.
+
+    El NOTIFY se hace dentro de la transacción de la revisión, así que
+    PostgreSQL lo entrega solo si se confirma. Cada worker tiene un hilo
+    con una conexión dedicada en LISTEN que reparte los avisos a sus
+    flujos abiertos; se arranca con la primera suscripción (después del
+    fork de gunicorn).
+    """
+
+    def __init__(self, app):
+        """
+        Constructor del broker.
+
+        Args:
+            app: Instancia de Flask
+        """
+        super().__init__(app)
+        self.canal = app.config['EVENTOS_CANAL']
+        self._hilo = None
+
+    def suscribir(self, usuario_id, maximo=None):
+        """Abre una suscripción y arranca el hilo LISTEN si no existe."""
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name='eventos-listen', daemon=True)
+                self._hilo.start()
+        return super().suscribir(usuario_id, maximo)
+
+    def tras_fork(self):
+        """El hilo LISTEN del maestro no existe en el worker: se arranca otro."""
+        super().tras_fork()
+        self._hilo = None
+
+    def en_transaccion(self, session, usuario_id):
+        """NOTIFY en la transacción actual (se entrega con el commit)."""
+        from app import db
+
+        session.execute(db.select(db.func.pg_notify(self.canal, str(usuario_id))))
+
+    def tras_commit(self, usuarios):
+        """Nada: los avisos llegan a todos los workers por LISTEN."""
+
+    def _escuchar(self, engine):
+        """Escucha el canal con una conexión propia hasta que falle."""
+        conexion = engine.raw_connection()
+        # Fuera del pool: la conexión queda en LISTEN todo el tiempo
+        conexion.detach()
+        dbapi = conexion.driver_connection
+        try:
+            dbapi.autocommit = True
+            with dbapi.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.canal}"')
+
+            # Durante la reconexión se han podido perder avisos: los
+            # flujos abiertos vuelven a leer la tabla
+            with self._lock:
+                usuarios = list(self._colas)
+            for usuario_id in usuarios:
+                self.publicar(usuario_id)
+
+            while True:
+                if select.select([dbapi], [], [], 60) == ([], [], []):
+                    continue
+                dbapi.poll()
+                while dbapi.notifies:
+                    aviso = dbapi.notifies.pop(0)
+                    self.publicar(int(aviso.payload))
+        finally:
+            conexion.close()
+
+    def _bucle(self):
+        """Hilo LISTEN: recibe las notificaciones y, si se pierde la conexión, reconecta tras EVENTOS_REINTENTO_MS."""
+        from app import db
+
+        with self.app.app_context():
+            engine = db.engine
+        while True:
+            try:
+                self._escuchar(engine)
+            except Exception:
+                logger.exception('Error en LISTEN %s; reconectando', self.canal)
+                time.sleep(self.app.config['EVENTOS_REINTENTO_MS'] / 1000)
+
+
+BACKENDS = {
+    'memoria': BrokerMemoria,
+    'postgres': BrokerPostgres
+}
+
+
+def registrar(usuario_id, solicitud_id, estado):
+    """
+    Guarda un cambio de estado en la transacción actual (sin commit).
+
+    Args:
+        usuario_id (int): Dueño de la solicitud
+        solicitud_id (int): Solicitud revisada
+        estado (str): Nuevo estado
+    """
+    from app import db
+    from app.models import EventoSolicitud
+
+    db.session.add(EventoSolicitud(usuario_id=usuario_id, solicitud_id=solicitud_id, estado=estado))
+
+    broker = current_app.extensions.get('eventos')
+    if broker is not None:
+        broker.en_transaccion(db.session, usuario_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publicar_eventos(session):
+    """Tras un commit con eventos nuevos, avisa a los flujos abiertos."""
+    usuarios = session.info.pop('eventos_usuarios', None)
+    if not usuarios or not has_app_context():
+        return
+
+    broker = current_app.extensions.get('eventos')
+    if broker is not None:
+        broker.tras_commit(usuarios)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_eventos(session):
+    """Un rollback descarta también los avisos."""
+    session.info.pop('eventos_usuarios', None)
+
+
+def eventos_posteriores(usuario_id, ultimo_id, limite=LOTE_EVENTOS):
+    """
+    Eventos de un usuario posteriores a un ID.
+
+    Args:
+        usuario_id (int): Usuario
+        ultimo_id (int): Último evento recibido por el cliente
+        limite (int): Número máximo de eventos
+
+    Returns:
+        list: Dicts del evento (EventoSolicitud.to_dict), en orden
+    """
+    from app.models import EventoSolicitud
+
+    eventos = EventoSolicitud.query\
+        .filter(EventoSolicitud.usuario_id == usuario_id, EventoSolicitud.id > ultimo_id)\
+        .order_by(EventoSolicitud.id)\
+        .limit(limite)\
+        .all()
+    return [e.to_dict() for e in eventos]
+
+
+def ultimo_evento(usuario_id):
+    """ID del último evento de un usuario (0 si no tiene)."""
+    from app import db
+    from app.models import EventoSolicitud
+
+    return db.session.query(db.func.max(EventoSolicitud.id))\
+        .filter(EventoSolicitud.usuario_id == usuario_id)\
+        .scalar() or 0
+
+
+def formatear(evento):
+    """Un evento en el formato de texto de SSE."""
+    return f"id: {evento['id']}\nevent: solicitud\ndata: {codificar(evento).decode()}\n\n"
+
+
+def flujo_eventos(usuario_id):
+    """
+    Respuesta SSE con los cambios de estado de las solicitudes de un usuario.
+
+    Si el cliente envía Last-Event-ID (o ?ultimo=, para la primera
+    conexión) se repiten antes los eventos posteriores; si no, solo se
+    envían los nuevos. Con EVENTOS_MAX_FLUJOS flujos ya abiertos en el
+    worker se responde 503 con Retry-After y el `retry` de SSE.
+
+    Args:
+        usuario_id (int): Usuario autenticado
+
+    Returns:
+        flask.Response: text/event-stream
+    """
+    app = current_app._get_current_object()
+    broker = app.extensions['eventos']
+    config = app.config
+
+    ultimo = request.headers.get('Last-Event-ID') or request.args.get('ultimo')
+    ultimo_id = int(ultimo) if ultimo and ultimo.isdigit() else ultimo_evento(usuario_id)
+
+    # Suscribirse antes de leer la tabla: no se pierde nada entre medias
+    cola = broker.suscribir(usuario_id, config['EVENTOS_MAX_FLUJOS'])
+    if cola is None:
+        # Sin hilos para más flujos: el cliente vuelve a intentarlo luego
+        espera = config['EVENTOS_REINTENTO_MS']
+        return app.response_class(f'retry: {espera}\n\n', status=503, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'Retry-After': str(max(1, round(espera / 1000)))
+        })
+
+    def generar():
+        nonlocal ultimo_id
+        try:
+            yield f"retry: {config['EVENTOS_REINTENTO_MS']}\n\n"
+            limite = time.monotonic() + config['EVENTOS_DURACION_MAXIMA_SEGUNDOS']
+            leer = True
+
+            while True:
+                while leer:
+                    # Contexto propio por lectura: no se retiene una
+                    # conexión del pool mientras el flujo espera
+                    with app.app_context():
+                        eventos = eventos_posteriores(usuario_id, ultimo_id)
+                    for evento in eventos:
+                        ultimo_id = evento['id']
+                        yield formatear(evento)
+                    leer = len(eventos) == LOTE_EVENTOS
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return
+                try:
+                    leer = cola.get(timeout=min(config['EVENTOS_LATIDO_SEGUNDOS'], restante))
+                except queue.Empty:
+                    yield ': latido\n\n'
+        finally:
+            broker.desuscribir(usuario_id, cola)
+
+    respuesta = app.response_class(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # nginx: no acumular el flujo en el buffer del proxy
+        'X-Accel-Buffering': 'no'
+    })
+    # También si el cliente se va antes del primer byte (el finally del
+    # generador no llega a ejecutarse) y la suscripción contaría en el límite
+    respuesta.call_on_close(lambda: broker.desuscribir(usuario_id, cola))
+    return respuesta
+
+
+def limpiar_eventos():
+    """
+    Borra los eventos de más de EVENTOS_RETENCION_HORAS.
+
+    Returns:
+        int: Número de eventos borrados
+    """
+    from app import db
+    from app.models import EventoSolicitud
+
+    limite = datetime.utcnow() - timedelta(hours=current_app.config['EVENTOS_RETENCION_HORAS'])
+    borrados = db.session.execute(
+        db.delete(EventoSolicitud).where(EventoSolicitud.fecha < limite)
+    ).rowcount
+    db.session.commit()
+    return borrados
+
+
+@click.command('limpiar-eventos')
+def limpiar_eventos_command():
+    """Borra los eventos SSE antiguos."""
+    click.echo(f'{limpiar_eventos()} eventos borrados')
+
+
+def init_eventos(app):
+    """
+    Crea el canal de eventos y registra `flask limpiar-eventos`.
+
+    EVENTOS_BACKEND: 'memoria', 'postgres' o 'paquete.modulo.Clase'; sin
+    valor se usa 'postgres' si la BD es PostgreSQL y 'memoria' si no.
+
+    Args:
+        app: Instancia de Flask
+    """
+    nombre = app.config['EVENTOS_BACKEND']
+    if not nombre:
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+        nombre = 'postgres' if uri.startswith('postgres') else 'memoria'
+
+    if nombre in BACKENDS:
+        clase = BACKENDS[nombre]
+    else:
+        modulo, _, clase = nombre.rpartition('.')
+        clase = getattr(importlib.import_module(modulo), clase)
+
+    app.extensions['eventos'] = clase(app)
+    app.cli.add_command(limpiar_eventos_command)
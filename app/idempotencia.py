@@ -0,0 +1,241 @@
+"""
+Claves de idempotencia (cabecera Idempotency-Key) para la API.
+
+Un cliente que reintenta una petición (p.ej. una app móvil sin
+cobertura) envía la misma Idempotency-Key y recibe la respuesta
+original sin que la petición se vuelva a ejecutar.
+
+- La clave se reserva (estado 'en_curso') antes de ejecutar la vista,
+  en su propia conexión y con commit inmediato. Un duplicado que llega
+  mientras la primera sigue en curso recibe 409 con Retry-After en el
+  momento, sin ocupar un hilo esperando
+- La reserva caduca a los IDEMPOTENCIA_RESERVA_SEGUNDOS (varias veces
+  el timeout de gunicorn): si el worker muere a mitad (timeout, OOM,
+  despliegue) la clave no queda bloqueada y un reintento posterior la
+  vuelve a reservar
+- Al terminar se guardan el código y el cuerpo de la respuesta durante
+  IDEMPOTENCIA_TTL_SEGUNDOS. Los errores 5xx y las excepciones liberan
+  la clave para poder reintentar. completar y liberar solo tocan la
+  reserva propia (fecha_creacion): una petición que termina después de
+  que otra le haya quitado la reserva caducada no pisa la nueva
+- Reutilizar una clave con otro cuerpo devuelve 422
+
+Las claves son por usuario (tabla claves_idempotencia). Las caducadas
+se borran al reutilizarlas o con `flask limpiar-idempotencia`.
+
+Uso:
+    @jwt_required
+    @idempotente
+    def post(self): ...
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from functools import wraps
+
+import click
+from flask import current_app, g, request
+from sqlalchemy.exc import IntegrityError
+
+CABECERA = 'Idempotency-Key'
+LONGITUD_MAXIMA = 255
+
+
+def huella_peticion():
+    """
+    Hash de la petición: método, ruta y cuerpo JSON canónico.
+
+    Returns:
+        str: SHA-256 en hexadecimal
+    """
+    datos = request.get_json(silent=True)
+    if datos is None:
+        cuerpo = request.get_data(as_text=True)
+    else:
+        cuerpo = json.dumps(datos, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f'{request.method} {request.path}\n{cuerpo}'.encode()).hexdigest()
+
+
+def reservar(usuario_id, clave, huella, reserva):
+    """
+    Intenta reservar una clave para ejecutar la petición.
+
+    Una clave caducada (también una reserva 'en_curso' abandonada) se
+    borra y se vuelve a reservar.
+
+    Args:
+        usuario_id (int): Usuario dueño de la clave
+        clave (str): Valor de la cabecera Idempotency-Key
+        huella (str): Hash de la petición (huella_peticion)
+        reserva (datetime): Marca de esta reserva (fecha_creacion)
+
+    Returns:
+        Fila existente (mapping) si la clave ya estaba usada, None si se
+        ha reservado para esta petición
+    """
+    from app import db
+    from app.models import ClaveIdempotencia
+
+    tabla = ClaveIdempotencia.__table__
+    de_la_clave = (tabla.c.usuario_id == usuario_id, tabla.c.clave == clave)
+
+    with db.engine.begin() as conn:
+        conn.execute(tabla.delete().where(*de_la_clave, tabla.c.expira < reserva))
+        try:
+            with conn.begin_nested():
+                conn.execute(tabla.insert().values(
+                    usuario_id=usuario_id,
+                    clave=clave,
+                    hash_peticion=huella,
+                    estado='en_curso',
+                    fecha_creacion=reserva,
+                    expira=reserva + timedelta(seconds=current_app.config['IDEMPOTENCIA_RESERVA_SEGUNDOS'])
+                ))
+            return None
+        except IntegrityError:
+            return conn.execute(db.select(tabla).where(*de_la_clave)).mappings().first()
+
+
+def de_la_reserva(tabla, usuario_id, clave, reserva):
+    """Condición de la fila 'en_curso' reservada por esta petición."""
+    return (
+        tabla.c.usuario_id == usuario_id,
+        tabla.c.clave == clave,
+        tabla.c.estado == 'en_curso',
+        tabla.c.fecha_creacion == reserva
+    )
+
+
+def completar(usuario_id, clave, reserva, codigo, cuerpo):
+    """
+    Guarda la respuesta de una petición para repetirla en los reintentos.
+
+    La clave pasa a caducar a los IDEMPOTENCIA_TTL_SEGUNDOS.
+
+    Args:
+        usuario_id (int): Usuario dueño de la clave
+        clave (str): Valor de la cabecera Idempotency-Key
+        reserva (datetime): Marca de la reserva (reservar)
+        codigo (int): Código HTTP de la respuesta
+        cuerpo: Cuerpo de la respuesta (serializable a JSON)
+    """
+    from app import db
+    from app.models import ClaveIdempotencia
+
+    tabla = ClaveIdempotencia.__table__
+    expira = datetime.utcnow() + timedelta(seconds=current_app.config['IDEMPOTENCIA_TTL_SEGUNDOS'])
+    with db.engine.begin() as conn:
+        conn.execute(
+            tabla.update()
+            .where(*de_la_reserva(tabla, usuario_id, clave, reserva))
+            .values(estado='completada', codigo=codigo, respuesta=cuerpo, expira=expira)
+        )
+
+
+def liberar(usuario_id, clave, reserva):
+    """
+    Borra la reserva de una clave cuya petición ha fallado.
+
+    Args:
+        usuario_id (int): Usuario dueño de la clave
+        clave (str): Valor de la cabecera Idempotency-Key
+        reserva (datetime): Marca de la reserva (reservar)
+    """
+    from app import db
+    from app.models import ClaveIdempotencia
+
+    tabla = ClaveIdempotencia.__table__
+    with db.engine.begin() as conn:
+        conn.execute(tabla.delete().where(*de_la_reserva(tabla, usuario_id, clave, reserva)))
+
+
+def separar_respuesta(resultado):
+    """
+    Separa el valor devuelto por una vista en (cuerpo, código).
+
+    Args:
+        resultado: dict o tupla (cuerpo, código[, cabeceras])
+
+    Returns:
+        tuple: (cuerpo, código)
+    """
+    if isinstance(resultado, tuple):
+        return resultado[0], resultado[1] if len(resultado) > 1 else 200
+    return resultado, 200
+
+
+def idempotente(f):
+    """
+    Decorador que aplica Idempotency-Key a una vista de la API.
+
+    Debe ir dentro de @jwt_required (usa g.current_user). Sin cabecera
+    la vista se ejecuta como siempre.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        clave = request.headers.get(CABECERA)
+        if not clave:
+            return f(*args, **kwargs)
+
+        if len(clave) > LONGITUD_MAXIMA:
+            return {'error': f'{CABECERA} demasiado larga (máximo {LONGITUD_MAXIMA})'}, 400
+
+        usuario_id = g.current_user.id
+        huella = huella_peticion()
+        reserva = datetime.utcnow()
+
+        existente = reservar(usuario_id, clave, huella, reserva)
+        if existente is not None:
+            if existente['hash_peticion'] != huella:
+                return {'error': f'{CABECERA} ya usada con otra petición'}, 422
+            if existente['estado'] == 'completada':
+                return existente['respuesta'], existente['codigo'], {'Idempotent-Replayed': 'true'}
+            # La primera sigue en curso: el cliente reintenta más tarde
+            reintento = str(current_app.config['IDEMPOTENCIA_REINTENTO_SEGUNDOS'])
+            return {'error': 'Hay una petición con esta clave en curso'}, 409, {'Retry-After': reintento}
+
+        try:
+            resultado = f(*args, **kwargs)
+        except Exception:
+            liberar(usuario_id, clave, reserva)
+            raise
+
+        cuerpo, codigo = separar_respuesta(resultado)
+        if codigo >= 500:
+            liberar(usuario_id, clave, reserva)
+        else:
+            completar(usuario_id, clave, reserva, codigo, cuerpo)
+        return resultado
+    return decorated
+
+
+def limpiar_claves():
+    """
+    Borra las claves de idempotencia caducadas.
+
+    Returns:
+        int: Número de claves borradas
+    """
+    from app import db
+    from app.models import ClaveIdempotencia
+
+    tabla = ClaveIdempotencia.__table__
+    with db.engine.begin() as conn:
+        return conn.execute(tabla.delete().where(tabla.c.expira < datetime.utcnow())).rowcount
+
+
+@click.command('limpiar-idempotencia')
+def limpiar_idempotencia_command():
+    """Borra las claves de idempotencia caducadas."""
+    click.echo(f'{limpiar_claves()} claves de idempotencia borradas')
+
+
+def init_idempotencia(app):
+    """
+    Registra el comando `flask limpiar-idempotencia`.
+
+    Args:
+        app: Instancia de Flask
+    """
+    app.cli.add_command(limpiar_idempotencia_command)
@@ -1,13 +1,59 @@
 """
 Modelos de la base de datos usando SQLAlchemy.
-Representa las entidades: Usuario, Mascota, Solicitud.
+Representa las entidades: Usuario, Mascota (con sus marcas de borrado
+MascotaEliminada), Solicitud (con sus RespuestasCuestionario tipadas y
+el histórico SolicitudArchivada), los cambios de estado para SSE
+(EventoSolicitud), los tokens de la API (TokenRefresco, TokenRevocado),
+los contadores del rate limiting compartido (LimiteTasa), las claves
+de idempotencia (ClaveIdempotencia) y la bandeja de salida de emails
+(Notificacion, NotificacionFallida, ResumenEnviado).
 """
 
-from datetime import datetime
+import hashlib
+import secrets
+from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from flask import has_app_context
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import validates
+from sqlalchemy.sql.expression import FunctionElement
 
 from app import db
+from app.cache import invalidar_usuario, invalidar_conteos_solicitudes
+from app.scoring import puntuar_solicitud, normalizar_respuesta
+from app import eventos, notificaciones
+
+
+class ahora_utc(FunctionElement):
+    """
+    Hora UTC de la base de datos, para las fechas del feed de cambios.
+
+    Las asigna el servidor en el propio INSERT/UPDATE (en PostgreSQL, el
+    inicio de la transacción) y no el reloj de cada worker: todas las
+    marcas salen del mismo reloj. Ver app/cambios.py.
+    """
+
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(ahora_utc)
+def _ahora_utc(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(ahora_utc, 'postgresql')
+def _ahora_utc_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(ahora_utc, 'sqlite')
+def _ahora_utc_sqlite(element, compiler, **kw):
+    # Con microsegundos y el mismo formato que guarda SQLAlchemy (se compara como texto)
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
 
 
 class Usuario(UserMixin, db.Model):
@@ -35,6 +81,7 @@ class Usuario(UserMixin, db.Model):
         rol (str): 'adoptante' o 'admin'
         fecha_registro (datetime): Fecha de creación de la cuenta
         activo (bool): Si la cuenta está activa
+        token_version (int): Versión de los JWT; al incrementarla se revocan los anteriores
         solicitudes (relationship): Solicitudes creadas por el usuario
         solicitudes_revisadas (relationship): Solicitudes revisadas (solo admin)
     """
@@ -54,6 +101,7 @@ class Usuario(UserMixin, db.Model):
     activo = db.Column(db.Boolean, nullable=False, default=True)
     oauth_provider = db.Column(db.String(20), nullable=True)
     oauth_id = db.Column(db.String(100), nullable=True, unique=True)
+    token_version = db.Column(db.Integer, nullable=False, default=0)
 
     # Relaciones
     solicitudes = db.relationship(
@@ -121,6 +169,11 @@ class Usuario(UserMixin, db.Model):
         """
         return self.rol == 'admin'
 
+    def revocar_tokens(self):
+        """Invalida todos los JWT emitidos hasta ahora para este usuario."""
+        self.token_version = (self.token_version or 0) + 1
+        db.session.commit()
+
     def __repr__(self):
         """Representación en string del objeto."""
         return f'<Usuario {self.email} ({self.rol})>'
@@ -140,6 +193,13 @@ class Usuario(UserMixin, db.Model):
         }
 
 
+@event.listens_for(Usuario, 'after_update')
+@event.listens_for(Usuario, 'after_delete')
+def _invalidar_usuario_cache(mapper, connection, usuario):
+    """Invalida la caché de sesión al modificar o borrar un Usuario."""
+    invalidar_usuario(usuario.id)
+
+
 class Mascota(db.Model):
     """
     Modelo de Mascota disponible para adopción.
@@ -162,6 +222,7 @@ class Mascota(db.Model):
         fecha_ingreso (datetime): Cuándo llegó al refugio
         vacunado (bool): Si está vacunado
         esterilizado (bool): Si está esterilizado
+        fecha_actualizacion (datetime): Último cambio (feed de cambios)
         solicitudes (relationship): Solicitudes para esta mascota
     """
 
@@ -181,6 +242,7 @@ class Mascota(db.Model):
     fecha_ingreso = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     vacunado = db.Column(db.Boolean, nullable=False, default=False)
     esterilizado = db.Column(db.Boolean, nullable=False, default=False)
+    fecha_actualizacion = db.Column(db.DateTime, nullable=False, default=ahora_utc(), onupdate=ahora_utc())
 
     # Relaciones
     solicitudes = db.relationship(
@@ -190,6 +252,13 @@ class Mascota(db.Model):
         cascade='all, delete-orphan'
     )
 
+    # Feed de cambios: filas modificadas tras una marca (fecha, id)
+    __table_args__ = (
+        db.Index('idx_mascotas_actualizacion', 'fecha_actualizacion', 'id'),
+        # Sin reutilizar IDs en SQLite: las marcas de borrado conservan el suyo
+        {'sqlite_autoincrement': True}
+    )
+
     def __init__(self, nombre, especie, descripcion, **kwargs):
         """
         Constructor de Mascota.
@@ -260,6 +329,44 @@ class Mascota(db.Model):
         }
 
 
+class MascotaEliminada(db.Model):
+    """
+    Marca de borrado de una mascota (tombstone) para el feed de cambios.
+
+    Se crea automáticamente al borrar una Mascota, para que los clientes
+    que sincronizan el catálogo (/api/mascotas/cambios) la eliminen.
+
+    Attributes:
+        id (int): ID que tenía la mascota
+        fecha_eliminacion (datetime): Cuándo se borró
+    """
+
+    __tablename__ = 'mascotas_eliminadas'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    fecha_eliminacion = db.Column(db.DateTime, nullable=False, default=ahora_utc())
+
+    __table_args__ = (
+        db.Index('idx_mascotas_eliminadas_fecha', 'fecha_eliminacion', 'id'),
+    )
+
+
+@event.listens_for(Mascota, 'after_delete')
+def _marcar_eliminada(mapper, connection, mascota):
+    """Registra la marca de borrado en la misma transacción que el DELETE."""
+    connection.execute(MascotaEliminada.__table__.insert().values(
+        id=mascota.id, fecha_eliminacion=ahora_utc()
+    ))
+
+
+class ConflictoSolicitud(ValueError):
+    """La solicitud no se puede crear: mascota no disponible o solicitud duplicada."""
+
+
+# Comentario de las solicitudes rechazadas al aprobarse otra de la misma mascota
+COMENTARIO_RECHAZO_ADOPTADA = 'La mascota ha sido adoptada por otro solicitante.'
+
+
 class Solicitud(db.Model):
     """
     Modelo de Solicitud de Adopción.
@@ -278,13 +385,20 @@ class Solicitud(db.Model):
         comentarios_admin (str): Feedback del administrador
         fecha_revision (datetime): Cuándo fue revisada
         revisado_por (int): ID del admin que revisó
+        puntuacion (float): Puntuación 0-100 del cuestionario (app/scoring.py)
+        puntuacion_version (str): Versión de las reglas usadas para puntuar
+        fecha_actualizacion (datetime): Último cambio (feed de cambios de /mias)
         usuario (relationship): Usuario que creó la solicitud
         mascota (relationship): Mascota solicitada
         revisor (relationship): Admin que revisó
+        respuestas (relationship): Respuestas tipadas del cuestionario
     """
 
     __tablename__ = 'solicitudes'
 
+    # Las resueltas antiguas se mueven a SolicitudArchivada (app/archivo.py)
+    archivada = False
+
     # Atributos de la tabla
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False, index=True)
@@ -295,10 +409,29 @@ class Solicitud(db.Model):
     comentarios_admin = db.Column(db.Text)
     fecha_revision = db.Column(db.DateTime)
     revisado_por = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    puntuacion = db.Column(db.Float)
+    puntuacion_version = db.Column(db.String(16))
+    fecha_actualizacion = db.Column(db.DateTime, nullable=False, default=ahora_utc(), onupdate=ahora_utc())
+
+    # Copia tipada e indexada de las respuestas conocidas (1:1)
+    respuestas = db.relationship(
+        'RespuestasCuestionario',
+        uselist=False,
+        lazy='select',
+        cascade='all, delete-orphan'
+    )
 
     # Constraint: Un usuario no puede solicitar la misma mascota dos veces
+    # Índices compuestos para la cola del panel admin (estado + orden por fecha o puntuación)
     __table_args__ = (
         db.UniqueConstraint('usuario_id', 'mascota_id', name='unique_usuario_mascota'),
+        db.Index('idx_solicitudes_estado_fecha', 'estado', 'fecha_solicitud', 'id'),
+        # Por COALESCE(puntuacion, -1): el orden de la cola (sin puntuar al final)
+        db.Index('idx_solicitudes_estado_puntuacion', 'estado', db.text('COALESCE(puntuacion, -1)'), 'id'),
+        # Feed de cambios de /mias: solicitudes de un usuario tras una marca
+        db.Index('idx_solicitudes_usuario_actualizacion', 'usuario_id', 'fecha_actualizacion', 'id'),
+        # Sin reutilizar IDs en SQLite: las archivadas conservan el suyo
+        {'sqlite_autoincrement': True}
     )
 
     def __init__(self, usuario_id, mascota_id, cuestionario=None):
@@ -314,37 +447,253 @@ class Solicitud(db.Model):
         self.mascota_id = mascota_id
         self.cuestionario_json = cuestionario or {}
 
-    def aprobar(self, admin_id, comentario=None):
+    @validates('cuestionario_json')
+    def _indexar_cuestionario(self, clave, cuestionario):
+        """Mantiene RespuestasCuestionario al asignar el cuestionario."""
+        valores = RespuestasCuestionario.extraer(cuestionario)
+        if self.respuestas is None:
+            self.respuestas = RespuestasCuestionario(**valores)
+        else:
+            for campo, valor in valores.items():
+                setattr(self.respuestas, campo, valor)
+        return cuestionario
+
+    @classmethod
+    def crear(cls, usuario_id, mascota_id, cuestionario=None):
         """
-        Aprueba la solicitud de adopción.
+        Crea una solicitud y reserva la mascota sin condiciones de carrera.
+
+        La reserva es un UPDATE condicional (estado 'disponible' ->
+        'en_proceso'): la BD lo aplica de forma atómica, así que de varias
+        peticiones simultáneas para la misma mascota solo una lo consigue.
+        La solicitud y la reserva se confirman en el mismo commit.
+        Lo usan tanto la web como la API.
+
+        Args:
+            usuario_id (int): ID del usuario solicitante
+            mascota_id (int): ID de la mascota
+            cuestionario (dict): Respuestas del formulario (opcional)
+
+        Returns:
+            Solicitud: Solicitud creada
+
+        Raises:
+            ConflictoSolicitud: Si la mascota ya no está disponible o el
+                                usuario ya tiene una solicitud para ella
+        """
+        reservada = db.session.execute(
+            db.update(Mascota)
+            .where(Mascota.id == mascota_id, Mascota.estado == 'disponible')
+            .values(estado='en_proceso')
+        ).rowcount
+
+        if not reservada:
+            db.session.rollback()
+            raise ConflictoSolicitud('Esta mascota ya no está disponible para adopción.')
+
+        # Solicitud repetida (p. ej. tras un rechazo), también si ya se ha
+        # archivado. La tabla particionada de PostgreSQL no tiene
+        # unique_usuario_mascota; el UPDATE anterior bloquea la fila de la
+        # mascota hasta el commit, así que ninguna otra solicitud para ella
+        # puede insertarse entre la consulta y el INSERT
+        duplicada = db.session.execute(
+            db.select(cls.id)
+            .where(cls.usuario_id == usuario_id, cls.mascota_id == mascota_id)
+            .union_all(
+                db.select(SolicitudArchivada.id)
+                .where(SolicitudArchivada.usuario_id == usuario_id, SolicitudArchivada.mascota_id == mascota_id)
+            )
+            .limit(1)
+        ).first()
+        if duplicada is not None:
+            db.session.rollback()
+            raise ConflictoSolicitud('Ya has enviado una solicitud para esta mascota.')
+
+        solicitud = cls(usuario_id, mascota_id, cuestionario)
+
+        # Aviso a los administradores, en la misma transacción
+        # (antes de add: el duplicado debe saltar en el commit, no en un autoflush)
+        notificaciones.notificar_nueva_solicitud(
+            solicitud, db.session.get(Mascota, mascota_id), db.session.get(Usuario, usuario_id)
+        )
+        db.session.add(solicitud)
+
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # unique_usuario_mascota (tabla sin particionar): solo como respaldo
+            db.session.rollback()
+            raise ConflictoSolicitud('Ya has enviado una solicitud para esta mascota.')
+
+        return solicitud
+
+    def aprobar(self, admin_id, comentario=None, confirmar=True):
+        """
+        Aprueba la solicitud de adopción en una sola transacción.
+
+        Bloquea la fila de la mascota (SELECT ... FOR UPDATE en
+        PostgreSQL), aprueba la solicitud, marca la mascota como adoptada
+        y rechaza el resto de solicitudes pendientes de la misma mascota
+        con un único UPDATE y el comentario COMENTARIO_RECHAZO_ADOPTADA.
 
         Args:
             admin_id (int): ID del administrador que aprueba
             comentario (str): Mensaje para el usuario (opcional)
+            confirmar (bool): Hacer commit (o rollback si falla); False
+                              deja la transacción al llamador (revisar_lote)
+
+        Returns:
+            int: Número de solicitudes rechazadas automáticamente
+
+        Raises:
+            ValueError: Si la solicitud ya no está pendiente o la
+                        mascota ya ha sido adoptada
         """
+        mascota = db.session.execute(
+            db.select(Mascota)
+            .where(Mascota.id == self.mascota_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).scalar_one()
+        db.session.refresh(self, ['estado'])
+
+        if not self.esta_pendiente() or mascota.estado == 'adoptado':
+            if confirmar:
+                db.session.rollback()
+            raise ValueError('La solicitud ya ha sido revisada o la mascota ya fue adoptada')
+
+        ahora = datetime.utcnow()
         self.estado = 'aprobada'
         self.revisado_por = admin_id
-        self.fecha_revision = datetime.utcnow()
+        self.fecha_revision = ahora
         self.comentarios_admin = comentario
 
         # Marcar la mascota como adoptada
-        self.mascota.marcar_adoptado()
+        mascota.estado = 'adoptado'
 
-        db.session.commit()
+        # Emails y eventos SSE del adoptante y de las demás solicitudes pendientes (una query)
+        notificaciones.notificar_revision(
+            self.usuario.email, self.usuario.nombre, mascota, 'aprobada', comentario
+        )
+        eventos.registrar(self.usuario_id, self.id, 'aprobada')
+        competidores = db.session.query(Usuario.email, Usuario.nombre, Usuario.id, Solicitud.id)\
+            .join(Solicitud, Solicitud.usuario_id == Usuario.id)\
+            .filter(
+                Solicitud.mascota_id == self.mascota_id,
+                Solicitud.estado == 'pendiente',
+                Solicitud.id != self.id
+            ).all()
+        for email, nombre, usuario_id, solicitud_id in competidores:
+            notificaciones.notificar_revision(
+                email, nombre, mascota, 'rechazada', COMENTARIO_RECHAZO_ADOPTADA
+            )
+            eventos.registrar(usuario_id, solicitud_id, 'rechazada')
+
+        # Rechazar de una vez las demás solicitudes pendientes de la mascota
+        rechazadas = db.session.execute(
+            db.update(Solicitud)
+            .where(
+                Solicitud.mascota_id == self.mascota_id,
+                Solicitud.estado == 'pendiente',
+                Solicitud.id != self.id
+            )
+            .values(
+                estado='rechazada',
+                revisado_por=admin_id,
+                fecha_revision=ahora,
+                comentarios_admin=COMENTARIO_RECHAZO_ADOPTADA
+            )
+            .execution_options(synchronize_session='fetch')
+        ).rowcount
 
-    def rechazar(self, admin_id, comentario=None):
+        if confirmar:
+            db.session.commit()
+            # El UPDATE masivo no dispara los eventos del mapper
+            invalidar_conteos_solicitudes()
+        return rechazadas
+
+    def rechazar(self, admin_id, comentario=None, confirmar=True):
         """
         Rechaza la solicitud de adopción.
 
         Args:
             admin_id (int): ID del administrador que rechaza
             comentario (str): Razón del rechazo (opcional)
+            confirmar (bool): Hacer commit; False deja la transacción al
+                              llamador (revisar_lote)
         """
         self.estado = 'rechazada'
         self.revisado_por = admin_id
         self.fecha_revision = datetime.utcnow()
         self.comentarios_admin = comentario
+
+        # Email y evento SSE al adoptante, en la misma transacción
+        notificaciones.notificar_revision(
+            self.usuario.email, self.usuario.nombre, self.mascota, 'rechazada', comentario
+        )
+        eventos.registrar(self.usuario_id, self.id, 'rechazada')
+        if confirmar:
+            db.session.commit()
+
+    @classmethod
+    def revisar_lote(cls, admin_id, decisiones):
+        """
+        Aplica varias decisiones de aprobación/rechazo en una transacción.
+
+        Cada decisión se aplica en su propio SAVEPOINT: si una falla (no
+        existe, ya está revisada, mascota ya adoptada) se deshace solo
+        esa y el resto se confirma en un único commit.
+
+        Args:
+            admin_id (int): ID del administrador que revisa
+            decisiones (list): Dicts con 'id', 'accion' ('aprobar' o
+                               'rechazar') y 'comentario' (opcional)
+
+        Returns:
+            list: Un resultado por decisión, en el mismo orden, con 'id',
+                  'ok', 'estado' o 'error' y, al aprobar, las
+                  'rechazadas_automaticamente'
+        """
+        resultados = []
+
+        for decision in decisiones:
+            solicitud_id = decision.get('id')
+            accion = decision.get('accion')
+            comentario = decision.get('comentario')
+
+            if accion not in ('aprobar', 'rechazar'):
+                resultados.append({'id': solicitud_id, 'ok': False, 'error': 'Acción no válida'})
+                continue
+
+            try:
+                with db.session.begin_nested():
+                    solicitud = db.session.execute(
+                        db.select(cls)
+                        .where(cls.id == solicitud_id)
+                        .with_for_update()
+                        .execution_options(populate_existing=True)
+                    ).scalar_one_or_none()
+
+                    if solicitud is None:
+                        raise LookupError('Solicitud no encontrada')
+
+                    if accion == 'aprobar':
+                        rechazadas = solicitud.aprobar(admin_id, comentario, confirmar=False)
+                        resultados.append({
+                            'id': solicitud_id, 'ok': True, 'estado': 'aprobada',
+                            'rechazadas_automaticamente': rechazadas
+                        })
+                    else:
+                        if not solicitud.esta_pendiente():
+                            raise ValueError('La solicitud ya ha sido revisada')
+                        solicitud.rechazar(admin_id, comentario, confirmar=False)
+                        resultados.append({'id': solicitud_id, 'ok': True, 'estado': 'rechazada'})
+            except (LookupError, ValueError) as e:
+                resultados.append({'id': solicitud_id, 'ok': False, 'error': str(e)})
+
         db.session.commit()
+        invalidar_conteos_solicitudes()
+        return resultados
 
     def esta_pendiente(self):
         """
@@ -369,5 +718,557 @@ class Solicitud(db.Model):
             'estado': self.estado,
             'fecha_revision': self.fecha_revision.isoformat() if self.fecha_revision else None,
             'comentarios_admin': self.comentarios_admin,
+            'puntuacion': self.puntuacion,
             'cuestionario': self.cuestionario_json
-        }
\ No newline at end of file
+        }
+
+
+@event.listens_for(Solicitud, 'before_insert')
+def _puntuar_nueva(mapper, connection, solicitud):
+    """Puntúa el cuestionario de una solicitud nueva (ver app/scoring.py)."""
+    if solicitud.puntuacion is None and has_app_context():
+        puntuar_solicitud(solicitud)
+
+
+@event.listens_for(Solicitud, 'after_insert')
+@event.listens_for(Solicitud, 'after_update')
+@event.listens_for(Solicitud, 'after_delete')
+def _invalidar_conteos(mapper, connection, solicitud):
+    """Invalida los conteos por estado al crear o modificar una solicitud."""
+    invalidar_conteos_solicitudes()
+
+class RespuestasCuestionario(db.Model):
+    """
+    Respuestas del cuestionario en columnas tipadas e indexadas.
+
+    Copia de las claves conocidas de Solicitud.cuestionario_json, para
+    que filtros como "con jardín y menos de 4 horas solo" sean una
+    búsqueda por índice en lugar de decodificar el JSON de cada fila.
+    Se mantiene sola al asignar Solicitud.cuestionario_json.
+
+    Attributes:
+        solicitud_id (int): ID de la solicitud (clave primaria)
+        vivienda_tipo (str): 'casa', 'apartamento', 'finca'
+        vivienda_propia (str): 'propia' o 'alquilada'
+        tiene_jardin (bool): Si tiene jardín
+        tiene_mascotas (bool): Si tiene otras mascotas
+        horas_solo (str): '0-4', '4-8' o '8+'
+        compromiso_gastos (bool): Se compromete a asumir los gastos
+        compromiso_tiempo (bool): Se compromete a dedicarle tiempo
+        emergencia_veterinaria (str): 'veterinario', 'consulta', 'espera'
+    """
+
+    __tablename__ = 'respuestas_cuestionario'
+
+    # Campos de texto con valores cerrados, campos sí/no y tramos de horas
+    CAMPOS_TEXTO = ('vivienda_tipo', 'vivienda_propia', 'emergencia_veterinaria')
+    CAMPOS_SI_NO = ('tiene_jardin', 'tiene_mascotas', 'compromiso_gastos', 'compromiso_tiempo')
+    HORAS_SOLO = ('0-4', '4-8', '8+')
+
+    solicitud_id = db.Column(
+        db.Integer,
+        db.ForeignKey('solicitudes.id', ondelete='CASCADE'),
+        primary_key=True
+    )
+    vivienda_tipo = db.Column(db.String(20), index=True)
+    vivienda_propia = db.Column(db.String(20))
+    tiene_jardin = db.Column(db.Boolean)
+    tiene_mascotas = db.Column(db.Boolean)
+    horas_solo = db.Column(db.String(3))
+    compromiso_gastos = db.Column(db.Boolean, index=True)
+    compromiso_tiempo = db.Column(db.Boolean)
+    emergencia_veterinaria = db.Column(db.String(20))
+
+    __table_args__ = (
+        db.Index('idx_respuestas_jardin_horas', 'tiene_jardin', 'horas_solo'),
+    )
+
+    @classmethod
+    def extraer(cls, cuestionario):
+        """
+        Extrae y tipa las respuestas conocidas de un cuestionario.
+
+        Args:
+            cuestionario (dict): Respuestas en formato JSON
+
+        Returns:
+            dict: {columna: valor}; None si falta o no es válido
+        """
+        cuestionario = cuestionario or {}
+        valores = {}
+
+        for campo in cls.CAMPOS_TEXTO:
+            valor = normalizar_respuesta(cuestionario.get(campo))
+            valores[campo] = valor[:20] if isinstance(valor, str) and valor else None
+
+        for campo in cls.CAMPOS_SI_NO:
+            valor = normalizar_respuesta(cuestionario.get(campo))
+            valores[campo] = valor if isinstance(valor, bool) else None
+
+        horas = cuestionario.get('horas_solo')
+        valores['horas_solo'] = horas if horas in cls.HORAS_SOLO else None
+
+        return valores
+
+    @classmethod
+    def filtrar(cls, query, args):
+        """
+        Aplica a una query de Solicitud los filtros de cuestionario de la URL.
+
+        Acepta vivienda_tipo, vivienda_propia, emergencia_veterinaria,
+        horas_solo (uno o varios separados por comas) y los campos sí/no
+        (tiene_jardin=si, compromiso_gastos=no...). Los valores no
+        válidos se ignoran.
+
+        Args:
+            query: Query de Solicitud
+            args (dict): Parámetros de la petición (request.args)
+
+        Returns:
+            tuple: (query filtrada, dict de filtros aplicados)
+        """
+        filtros = {}
+        condiciones = []
+
+        for campo in cls.CAMPOS_TEXTO:
+            valor = normalizar_respuesta(args.get(campo))
+            if isinstance(valor, str) and valor:
+                filtros[campo] = valor
+                condiciones.append(getattr(cls, campo) == valor)
+
+        for campo in cls.CAMPOS_SI_NO:
+            valor = normalizar_respuesta(args.get(campo))
+            if isinstance(valor, bool):
+                filtros[campo] = 'si' if valor else 'no'
+                condiciones.append(getattr(cls, campo).is_(valor))
+
+        horas = [h for h in (args.get('horas_solo') or '').split(',') if h in cls.HORAS_SOLO]
+        if horas:
+            filtros['horas_solo'] = ','.join(horas)
+            condiciones.append(cls.horas_solo.in_(horas))
+
+        if condiciones:
+            query = query.join(Solicitud.respuestas).filter(*condiciones)
+
+        return query, filtros
+
+    @classmethod
+    def rellenar(cls, lote=1000):
+        """
+        Crea las filas que faltan a partir de cuestionario_json.
+
+        Las solicitudes anteriores a esta tabla no tienen respuestas
+        tipadas y los filtros del cuestionario las dejarían fuera.
+
+        Args:
+            lote (int): Solicitudes por INSERT
+
+        Returns:
+            int: Número de filas creadas
+        """
+        total = 0
+        ultimo_id = 0
+
+        while True:
+            filas = db.session.query(Solicitud.id, Solicitud.cuestionario_json)\
+                .outerjoin(cls, cls.solicitud_id == Solicitud.id)\
+                .filter(cls.solicitud_id.is_(None), Solicitud.id > ultimo_id)\
+                .order_by(Solicitud.id)\
+                .limit(lote)\
+                .all()
+            if not filas:
+                break
+
+            # INSERT en lote (executemany)
+            db.session.execute(db.insert(cls), [
+                {'solicitud_id': solicitud_id, **cls.extraer(cuestionario)}
+                for solicitud_id, cuestionario in filas
+            ])
+            db.session.commit()
+            total += len(filas)
+            ultimo_id = filas[-1][0]
+
+        return total
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<RespuestasCuestionario solicitud:{self.solicitud_id}>'
+
+
+class SolicitudArchivada(db.Model):
+    """
+    Solicitud resuelta antigua, movida fuera de la tabla solicitudes.
+
+    La crea el archivado por lotes (app/archivo.py) con el mismo ID que
+    tenía la solicitud. Es de solo lectura y más compacta: sin versión
+    de puntuación ni respuestas tipadas (el cuestionario completo sigue
+    en cuestionario_json). Tiene la misma interfaz de lectura que
+    Solicitud para reutilizar plantillas y to_dict().
+
+    Attributes:
+        id (int): ID original de la solicitud
+        usuario_id (int): ID del usuario que solicitó
+        mascota_id (int): ID de la mascota solicitada
+        fecha_solicitud (datetime): Cuándo se creó
+        estado (str): 'aprobada' o 'rechazada'
+        cuestionario_json (dict): Respuestas en formato JSON
+        comentarios_admin (str): Feedback del administrador
+        fecha_revision (datetime): Cuándo fue revisada
+        revisado_por (int): ID del admin que revisó
+        puntuacion (float): Puntuación que tenía al archivarse
+        fecha_archivo (datetime): Cuándo se archivó
+    """
+
+    __tablename__ = 'solicitudes_archivadas'
+
+    archivada = True
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False, index=True)
+    mascota_id = db.Column(db.Integer, db.ForeignKey('mascotas.id', ondelete='CASCADE'), nullable=False, index=True)
+    fecha_solicitud = db.Column(db.DateTime, nullable=False)
+    estado = db.Column(db.String(20), nullable=False)
+    cuestionario_json = db.Column(db.JSON)
+    comentarios_admin = db.Column(db.Text)
+    fecha_revision = db.Column(db.DateTime)
+    revisado_por = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='SET NULL'))
+    puntuacion = db.Column(db.Float)
+    fecha_archivo = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    usuario = db.relationship('Usuario', foreign_keys=[usuario_id])
+    mascota = db.relationship('Mascota')
+    revisor = db.relationship('Usuario', foreign_keys=[revisado_por])
+
+    def esta_pendiente(self):
+        """Una solicitud archivada nunca está pendiente."""
+        return False
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<SolicitudArchivada #{self.id} - Usuario:{self.usuario_id} - Mascota:{self.mascota_id} - {self.estado}>'
+
+    def to_dict(self):
+        """Convierte la solicitud archivada a diccionario (mismo formato que Solicitud)."""
+        return {
+            'id': self.id,
+            'usuario_id': self.usuario_id,
+            'mascota_id': self.mascota_id,
+            'fecha_solicitud': self.fecha_solicitud.isoformat(),
+            'estado': self.estado,
+            'fecha_revision': self.fecha_revision.isoformat() if self.fecha_revision else None,
+            'comentarios_admin': self.comentarios_admin,
+            'puntuacion': self.puntuacion,
+            'cuestionario': self.cuestionario_json
+        }
+
+
+class EventoSolicitud(db.Model):
+    """
+    Cambio de estado de una solicitud, para los clientes conectados por SSE.
+
+    Se guarda en la misma transacción que la revisión (app/eventos.py).
+    El ID es el de los eventos SSE: un cliente que se reconecta con
+    Last-Event-ID recibe los posteriores. Se borran pasadas
+    EVENTOS_RETENCION_HORAS (`flask limpiar-eventos`).
+
+    Attributes:
+        id (int): ID del evento (creciente, no se reutiliza)
+        usuario_id (int): Dueño de la solicitud (destinatario del evento)
+        solicitud_id (int): Solicitud (sin FK: puede archivarse)
+        estado (str): Nuevo estado ('aprobada' o 'rechazada')
+        fecha (datetime): Cuándo se produjo el cambio
+    """
+
+    __tablename__ = 'eventos_solicitud'
+
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False)
+    solicitud_id = db.Column(db.Integer, nullable=False)
+    estado = db.Column(db.String(20), nullable=False)
+    fecha = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # Eventos de un usuario posteriores a Last-Event-ID
+    __table_args__ = (
+        db.Index('idx_eventos_solicitud_usuario', 'usuario_id', 'id'),
+        {'sqlite_autoincrement': True}
+    )
+
+    def to_dict(self):
+        """Convierte el evento a diccionario (datos del evento SSE)."""
+        return {
+            'id': self.id,
+            'solicitud_id': self.solicitud_id,
+            'estado': self.estado,
+            'fecha': self.fecha.isoformat()
+        }
+
+
+class TokenRefresco(db.Model):
+    """
+    Refresh token de la API.
+
+    Permite obtener nuevos access tokens sin volver a enviar la
+    contraseña. Solo se guarda el hash SHA-256 del token; al usarlo se
+    rota (se revoca y se emite uno nuevo).
+
+    Attributes:
+        id (int): Identificador único
+        usuario_id (int): ID del usuario propietario
+        token_hash (str): SHA-256 del token en hexadecimal
+        fecha_creacion (datetime): Cuándo se emitió
+        fecha_expiracion (datetime): Cuándo caduca
+        revocado (bool): Si ya se usó o se revocó
+        usuario (relationship): Usuario propietario
+    """
+
+    __tablename__ = 'tokens_refresco'
+
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False, index=True)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    fecha_creacion = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    fecha_expiracion = db.Column(db.DateTime, nullable=False)
+    revocado = db.Column(db.Boolean, nullable=False, default=False)
+
+    usuario = db.relationship('Usuario')
+
+    @staticmethod
+    def hashear(token):
+        """
+        Calcula el hash con el que se guarda un refresh token.
+
+        Los refresh tokens son aleatorios y largos, así que basta un
+        SHA-256 (no hace falta un hash lento como el de las contraseñas).
+
+        Args:
+            token (str): Refresh token en claro
+
+        Returns:
+            str: Hash SHA-256 en hexadecimal
+        """
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def emitir(cls, usuario_id, dias):
+        """
+        Crea un nuevo refresh token (sin hacer commit).
+
+        Args:
+            usuario_id (int): ID del usuario
+            dias (int): Días de validez
+
+        Returns:
+            str: Refresh token en claro (solo se conoce en este momento)
+        """
+        token = secrets.token_urlsafe(48)
+        db.session.add(cls(
+            usuario_id=usuario_id,
+            token_hash=cls.hashear(token),
+            fecha_expiracion=datetime.utcnow() + timedelta(days=dias)
+        ))
+        return token
+
+    def esta_vigente(self):
+        """
+        Verifica si el token puede usarse.
+
+        Returns:
+            bool: True si no está revocado ni caducado
+        """
+        return not self.revocado and self.fecha_expiracion > datetime.utcnow()
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<TokenRefresco #{self.id} - Usuario:{self.usuario_id}>'
+
+
+class TokenRevocado(db.Model):
+    """
+    Access token revocado antes de caducar (logout).
+
+    Attributes:
+        jti (str): Identificador único del JWT
+        fecha_expiracion (datetime): Cuándo caduca el JWT (después se puede borrar)
+    """
+
+    __tablename__ = 'tokens_revocados'
+
+    jti = db.Column(db.String(36), primary_key=True)
+    fecha_expiracion = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<TokenRevocado {self.jti}>'
+
+
+class LimiteTasa(db.Model):
+    """
+    Contador de peticiones por clave y ventana para el rate limiting.
+
+    Solo se usa con RATELIMIT_BACKEND='sql' (ver app/ratelimit.py),
+    para compartir los límites entre workers.
+
+    Attributes:
+        clave (str): Nombre del límite + identidad (IP, email, usuario)
+        ventana_inicio (int): Timestamp de inicio de la ventana
+        contador (int): Peticiones en la ventana
+    """
+
+    __tablename__ = 'limites_tasa'
+
+    clave = db.Column(db.String(255), primary_key=True)
+    ventana_inicio = db.Column(db.Integer, primary_key=True)
+    contador = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<LimiteTasa {self.clave} @{self.ventana_inicio}: {self.contador}>'
+
+
+class ClaveIdempotencia(db.Model):
+    """
+    Idempotency-Key de una petición a la API y su respuesta guardada.
+
+    Ver app/idempotencia.py. Las claves son por usuario; la reserva en
+    curso caduca a los IDEMPOTENCIA_RESERVA_SEGUNDOS y la respuesta
+    guardada a los IDEMPOTENCIA_TTL_SEGUNDOS.
+
+    Attributes:
+        usuario_id (int): Usuario que envió la petición
+        clave (str): Valor de la cabecera Idempotency-Key
+        hash_peticion (str): SHA-256 de método, ruta y cuerpo
+        estado (str): 'en_curso' o 'completada'
+        codigo (int): Código HTTP de la respuesta guardada
+        respuesta (dict): Cuerpo de la respuesta guardada
+        fecha_creacion (datetime): Cuándo se recibió la primera petición
+        expira (datetime): A partir de cuándo la clave se puede reutilizar
+    """
+
+    __tablename__ = 'claves_idempotencia'
+
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), primary_key=True)
+    clave = db.Column(db.String(255), primary_key=True)
+    hash_peticion = db.Column(db.String(64), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='en_curso')
+    codigo = db.Column(db.Integer)
+    respuesta = db.Column(db.JSON)
+    fecha_creacion = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expira = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<ClaveIdempotencia {self.usuario_id}:{self.clave} ({self.estado})>'
+
+
+class Notificacion(db.Model):
+    """
+    Email pendiente de envío (bandeja de salida).
+
+    Se crea en la misma transacción que el cambio que lo provoca y lo
+    envía en segundo plano app/notificaciones.py; al enviarse se borra.
+
+    Attributes:
+        id (int): Identificador único
+        destinatario (str): Email del destinatario
+        asunto (str): Asunto
+        cuerpo (str): Texto del email
+        fecha_creacion (datetime): Cuándo se encoló
+        intentos (int): Envíos fallidos hasta ahora
+        proximo_intento (datetime): No enviar antes de esta fecha
+    """
+
+    __tablename__ = 'notificaciones'
+
+    id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(120), nullable=False)
+    asunto = db.Column(db.String(255), nullable=False)
+    cuerpo = db.Column(db.Text, nullable=False)
+    fecha_creacion = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    proximo_intento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<Notificacion #{self.id} a {self.destinatario} ({self.intentos} intentos)>'
+
+
+class NotificacionFallida(db.Model):
+    """
+    Email descartado tras agotar los reintentos (dead letter).
+
+    Se guarda para poder revisarlo o reenviarlo a mano.
+
+    Attributes:
+        id (int): Identificador único
+        destinatario (str): Email del destinatario
+        asunto (str): Asunto
+        cuerpo (str): Texto del email
+        fecha_creacion (datetime): Cuándo se encoló
+        fecha_fallo (datetime): Cuándo se descartó
+        intentos (int): Envíos fallidos
+        error (str): Último error
+    """
+
+    __tablename__ = 'notificaciones_fallidas'
+
+    id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(120), nullable=False)
+    asunto = db.Column(db.String(255), nullable=False)
+    cuerpo = db.Column(db.Text, nullable=False)
+    fecha_creacion = db.Column(db.DateTime, nullable=False)
+    fecha_fallo = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    intentos = db.Column(db.Integer, nullable=False)
+    error = db.Column(db.Text)
+
+    @classmethod
+    def desde(cls, notificacion, error):
+        """
+        Crea la entrada de dead letter de una notificación.
+
+        Args:
+            notificacion (Notificacion): Email que no se pudo enviar
+            error (str): Último error
+
+        Returns:
+            NotificacionFallida: Entrada sin guardar
+        """
+        return cls(
+            destinatario=notificacion.destinatario,
+            asunto=notificacion.asunto,
+            cuerpo=notificacion.cuerpo,
+            fecha_creacion=notificacion.fecha_creacion,
+            intentos=notificacion.intentos,
+            error=error
+        )
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<NotificacionFallida #{self.id} a {self.destinatario}>'
+
+
+class ResumenEnviado(db.Model):
+    """
+    Marca de un resumen diario enviado a los administradores.
+
+    Hace idempotente `flask enviar-resumen` (uno por día) y guarda hasta
+    qué solicitud se incluyó, para marcar como nuevas las posteriores.
+
+    Attributes:
+        fecha (date): Día del resumen
+        fecha_envio (datetime): Cuándo se generó
+        ultima_solicitud_id (int): Mayor ID de solicitud incluido
+        solicitudes_pendientes (int): Pendientes en el resumen
+        destinatarios (int): Admins a los que se envió
+    """
+
+    __tablename__ = 'resumenes_enviados'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    fecha_envio = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ultima_solicitud_id = db.Column(db.Integer, nullable=False, default=0)
+    solicitudes_pendientes = db.Column(db.Integer, nullable=False, default=0)
+    destinatarios = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<ResumenEnviado {self.fecha} hasta #{self.ultima_solicitud_id}>'
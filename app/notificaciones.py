@@ -0,0 +1,386 @@
+"""
+Notificaciones por email con bandeja de salida (outbox) transaccional.
+
+Los emails no se envían durante la petición: se guardan en la tabla
+notificaciones dentro de la misma transacción que el cambio que los
+provoca (nueva solicitud, aprobación, rechazo). Si la transacción se
+deshace, el email tampoco sale; si se confirma, un hilo en segundo plano
+lo envía.
+
+- encolar: añade un email a la sesión actual (sin commit)
+- EnviadorNotificaciones: hilo que envía los emails pendientes en lotes,
+  con una sola conexión SMTP por lote. Los fallos se reintentan con
+  espera exponencial; tras NOTIFICACIONES_MAX_INTENTOS el email pasa a
+  notificaciones_fallidas (dead letter)
+
+Con NOTIFICACIONES_ASYNC=False (tests) no se arranca el hilo: los
+emails se envían con `flask enviar-notificaciones` o procesar_lote().
+
+Resumen diario para administradores (`flask enviar-resumen`, desde cron):
+una sola query agregada de las solicitudes pendientes agrupadas por
+mascota, un email por admin y una marca en resumenes_enviados que evita
+enviarlo dos veces el mismo día.
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app, has_app_context, render_template
+from flask_mail import Message
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+def encolar(destinatario, asunto, plantilla, **contexto):
+    """
+    Añade un email a la bandeja de salida en la transacción actual.
+
+    El email se envía después del commit; no hace commit por sí mismo.
+
+    Args:
+        destinatario (str): Email del destinatario
+        asunto (str): Asunto del email
+        plantilla (str): Plantilla de texto (templates/email/...)
+        **contexto: Variables para la plantilla
+    """
+    from app import db
+    from app.models import Notificacion
+
+    db.session.add(Notificacion(
+        destinatario=destinatario,
+        asunto=asunto,
+        cuerpo=render_template(plantilla, **contexto)
+    ))
+    db.session.info['notificaciones_pendientes'] = True
+
+
+def notificar_nueva_solicitud(solicitud, mascota, usuario):
+    """
+    Avisa a los administradores activos de una solicitud nueva.
+
+    Args:
+        solicitud (Solicitud): Solicitud creada
+        mascota (Mascota): Mascota solicitada
+        usuario (Usuario): Solicitante
+    """
+    from app import db
+    from app.models import Usuario
+
+    if not current_app.config['NOTIFICAR_ADMINS_NUEVA_SOLICITUD']:
+        return
+
+    admins = db.session.query(Usuario.email)\
+        .filter(Usuario.rol == 'admin', Usuario.activo.is_(True))\
+        .all()
+
+    for (email,) in admins:
+        encolar(
+            email,
+            f'Nueva solicitud de adopción para {mascota.nombre}',
+            'email/nueva_solicitud.txt',
+            solicitud=solicitud, mascota=mascota, usuario=usuario
+        )
+
+
+def notificar_revision(email, nombre, mascota, estado, comentario):
+    """
+    Avisa a un adoptante de que su solicitud ha sido revisada.
+
+    Args:
+        email (str): Email del adoptante
+        nombre (str): Nombre del adoptante
+        mascota (Mascota): Mascota solicitada
+        estado (str): 'aprobada' o 'rechazada'
+        comentario (str): Comentario del administrador
+    """
+    encolar(
+        email,
+        f'Tu solicitud para adoptar a {mascota.nombre} ha sido {estado}',
+        'email/solicitud_revisada.txt',
+        nombre=nombre, mascota=mascota, estado=estado, comentario=comentario
+    )
+
+
+def procesar_lote(limite=None):
+    """
+    Envía un lote de emails pendientes con una sola conexión SMTP.
+
+    En PostgreSQL las filas se bloquean con SKIP LOCKED, así que varios
+    workers pueden procesar la bandeja a la vez sin enviar dos veces.
+
+    Args:
+        limite (int): Tamaño máximo del lote (NOTIFICACIONES_LOTE)
+
+    Returns:
+        int: Número de emails procesados (enviados o fallidos)
+    """
+    from app import db, mail
+    from app.models import Notificacion, NotificacionFallida
+
+    config = current_app.config
+    ahora = datetime.utcnow()
+
+    pendientes = db.session.execute(
+        db.select(Notificacion)
+        .where(Notificacion.proximo_intento <= ahora)
+        .order_by(Notificacion.id)
+        .limit(limite or config['NOTIFICACIONES_LOTE'])
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    if not pendientes:
+        db.session.rollback()
+        return 0
+
+    errores = {}
+    enviados = set()
+    try:
+        with mail.connect() as conexion:
+            for notificacion in pendientes:
+                try:
+                    conexion.send(Message(
+                        subject=notificacion.asunto,
+                        recipients=[notificacion.destinatario],
+                        body=notificacion.cuerpo
+                    ))
+                    enviados.add(notificacion.id)
+                except Exception as e:
+                    errores[notificacion.id] = e
+    except Exception as e:
+        # Fallo al conectar (o al cerrar): se reintenta lo no intentado.
+        # Lo ya enviado no se repite aunque falle el QUIT
+        logger.warning('Error de conexión SMTP: %s', e)
+        for notificacion in pendientes:
+            if notificacion.id not in enviados:
+                errores.setdefault(notificacion.id, e)
+
+    for notificacion in pendientes:
+        error = errores.get(notificacion.id)
+        if error is None:
+            db.session.delete(notificacion)
+            continue
+
+        notificacion.intentos += 1
+        if notificacion.intentos >= config['NOTIFICACIONES_MAX_INTENTOS']:
+            logger.error('Email %s a %s descartado tras %d intentos: %s',
+                         notificacion.id, notificacion.destinatario, notificacion.intentos, error)
+            db.session.add(NotificacionFallida.desde(notificacion, str(error)))
+            db.session.delete(notificacion)
+        else:
+            espera = config['NOTIFICACIONES_REINTENTO_SEGUNDOS'] * 2 ** (notificacion.intentos - 1)
+            notificacion.proximo_intento = ahora + timedelta(seconds=espera)
+
+    db.session.commit()
+    return len(pendientes)
+
+
+class EnviadorNotificaciones:
+    """
+    Hilo en segundo plano que vacía la bandeja de salida.
+
+    Se despierta tras cada commit que encola emails y, además, cada
+    NOTIFICACIONES_INTERVALO_SEGUNDOS para recoger reintentos y emails
+    encolados por otros workers. El hilo se arranca la primera vez que
+    hace falta, así que cada worker de gunicorn tiene el suyo.
+
+    Attributes:
+        app: Instancia de Flask
+        intervalo (float): Segundos máximos entre pasadas
+    """
+
+    def __init__(self, app):
+        """
+        Constructor del enviador.
+
+        Args:
+            app: Instancia de Flask
+        """
+        self.app = app
+        self.intervalo = app.config['NOTIFICACIONES_INTERVALO_SEGUNDOS']
+        self._evento = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def despertar(self):
+        """Pide una pasada inmediata (arranca el hilo si no existe)."""
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name='notificaciones', daemon=True)
+                self._hilo.start()
+        self._evento.set()
+
+    def tras_fork(self):
+        """En un worker recién creado: sin el hilo ni los locks del maestro."""
+        self._evento = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def _bucle(self):
+        while True:
+            self._evento.wait(self.intervalo)
+            self._evento.clear()
+            with self.app.app_context():
+                try:
+                    while procesar_lote():
+                        pass
+                except Exception:
+                    logger.exception('Error procesando la bandeja de notificaciones')
+                finally:
+                    from app import db
+                    db.session.remove()
+
+
+@event.listens_for(Session, 'after_commit')
+def _despertar_enviador(session):
+    """Tras un commit que ha encolado emails, despierta al enviador."""
+    if not session.info.pop('notificaciones_pendientes', False) or not has_app_context():
+        return
+
+    enviador = current_app.extensions.get('notificaciones')
+    if enviador is not None:
+        enviador.despertar()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_aviso(session):
+    """Un rollback descarta también los emails encolados."""
+    session.info.pop('notificaciones_pendientes', None)
+
+
+def pendientes_por_mascota(desde_id):
+    """
+    Solicitudes pendientes agrupadas por mascota, en una query agregada.
+
+    Solo recorre las pendientes (índice por estado), no la tabla entera.
+
+    Args:
+        desde_id (int): Última solicitud incluida en el resumen anterior
+
+    Returns:
+        list: Dicts con mascota, especie, pendientes, nuevas, dias_en_cola
+              y ultima_id, de la más antigua a la más reciente
+    """
+    from app import db
+    from app.models import Mascota, Solicitud
+
+    filas = db.session.query(
+        Mascota.id,
+        Mascota.nombre,
+        Mascota.especie,
+        db.func.count(Solicitud.id),
+        db.func.sum(db.case((Solicitud.id > desde_id, 1), else_=0)),
+        db.func.min(Solicitud.fecha_solicitud),
+        db.func.max(Solicitud.id)
+    ).join(Solicitud, Solicitud.mascota_id == Mascota.id)\
+        .filter(Solicitud.estado == 'pendiente')\
+        .group_by(Mascota.id, Mascota.nombre, Mascota.especie)\
+        .order_by(db.func.min(Solicitud.fecha_solicitud))\
+        .all()
+
+    ahora = datetime.utcnow()
+    return [{
+        'mascota_id': mascota_id,
+        'mascota': nombre,
+        'especie': especie,
+        'pendientes': pendientes,
+        'nuevas': nuevas or 0,
+        'dias_en_cola': (ahora - mas_antigua).days,
+        'ultima_id': ultima_id
+    } for mascota_id, nombre, especie, pendientes, nuevas, mas_antigua, ultima_id in filas]
+
+
+def generar_resumen_diario(hoy=None, forzar=False):
+    """
+    Encola el resumen diario de solicitudes pendientes para cada admin.
+
+    Es idempotente: si ya se generó el resumen de `hoy` no hace nada.
+    Los emails y la marca del día se guardan en la misma transacción.
+
+    Args:
+        hoy (date): Día del resumen (por defecto, hoy)
+        forzar (bool): Generarlo aunque ya exista el de hoy
+
+    Returns:
+        int: Emails encolados (0 si ya estaba enviado o no hay pendientes)
+    """
+    from app import db
+    from app.models import ResumenEnviado, Usuario
+
+    hoy = hoy or date.today()
+
+    anterior = ResumenEnviado.query.order_by(ResumenEnviado.fecha.desc()).first()
+    if anterior and anterior.fecha >= hoy and not forzar:
+        return 0
+
+    desde_id = anterior.ultima_solicitud_id if anterior else 0
+    grupos = pendientes_por_mascota(desde_id)
+    if not grupos:
+        return 0
+
+    total = sum(g['pendientes'] for g in grupos)
+    nuevas = sum(g['nuevas'] for g in grupos)
+    admins = db.session.query(Usuario.email, Usuario.nombre)\
+        .filter(Usuario.rol == 'admin', Usuario.activo.is_(True))\
+        .all()
+
+    for email, nombre in admins:
+        encolar(
+            email,
+            f'Resumen diario: {total} solicitudes pendientes ({nuevas} nuevas)',
+            'email/resumen_diario.txt',
+            nombre=nombre, grupos=grupos, total=total, nuevas=nuevas, fecha=hoy
+        )
+
+    marca = db.session.get(ResumenEnviado, hoy) or ResumenEnviado(fecha=hoy)
+    marca.fecha_envio = datetime.utcnow()
+    marca.ultima_solicitud_id = max(desde_id, max(g['ultima_id'] for g in grupos))
+    marca.solicitudes_pendientes = total
+    marca.destinatarios = len(admins)
+    db.session.add(marca)
+    db.session.commit()
+
+    return len(admins)
+
+
+@click.command('enviar-resumen')
+@click.option('--forzar', is_flag=True, help='Enviarlo aunque ya se haya enviado hoy')
+def enviar_resumen_command(forzar):
+    """Envía el resumen diario de solicitudes pendientes a los admins."""
+    encolados = generar_resumen_diario(forzar=forzar)
+    if not encolados:
+        click.echo('Resumen ya enviado hoy o sin solicitudes pendientes')
+        return
+
+    # Enviar ya, con una conexión por lote (el proceso de cron termina al acabar)
+    while procesar_lote():
+        pass
+    click.echo(f'Resumen enviado a {encolados} administradores')
+
+
+@click.command('enviar-notificaciones')
+def enviar_notificaciones_command():
+    """Envía los emails pendientes de la bandeja de salida."""
+    total = 0
+    while True:
+        procesados = procesar_lote()
+        if not procesados:
+            break
+        total += procesados
+    click.echo(f'{total} notificaciones procesadas')
+
+
+def init_notificaciones(app):
+    """
+    Crea el enviador en segundo plano y registra sus comandos.
+
+    Args:
+        app: Instancia de Flask
+    """
+    if app.config['NOTIFICACIONES_ASYNC']:
+        app.extensions['notificaciones'] = EnviadorNotificaciones(app)
+    app.cli.add_command(enviar_notificaciones_command)
+    app.cli.add_command(enviar_resumen_command)
@@ -0,0 +1,315 @@
+"""
+Cliente OpenID Connect (Google) con caché de discovery y JWKS.
+
+Authlib descarga el documento de discovery y las claves públicas (JWKS)
+de Google durante el login, lo que añade latencia a la petición y hace
+que el arranque y los tests dependan de la red. Este módulo:
+
+- Cachea ambos documentos en memoria y en disco, con TTL
+- Los refresca en segundo plano antes de que caduquen
+  (mientras tanto se sigue sirviendo la copia cacheada)
+- Reutiliza un pool de conexiones HTTP para discovery, JWKS y token
+
+Con OIDC_LOCAL_PROVIDER=True se usa el proveedor local de
+app/oidc_local.py en lugar de Google (tests y benchmarks sin red).
+
+Authlib solo se importa con el primer login con Google (cliente_google),
+no al arrancar el worker.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptadorCompartido(HTTPAdapter):
+    """
+    HTTPAdapter compartido entre sesiones.
+
+    Authlib crea una sesión nueva para cada llamada y la cierra al
+    terminar. Al montar este adaptador en ellas, todas reutilizan el
+    mismo pool de conexiones; close() no hace nada para que cerrar una
+    sesión no vacíe el pool.
+    """
+
+    def close(self):
+        pass
+
+    def cerrar(self):
+        """Cierra de verdad el pool de conexiones."""
+        super().close()
+
+
+class DocumentoCacheado:
+    """
+    Documento JSON remoto cacheado en memoria y en disco.
+
+    - Si la copia tiene menos del 80% del TTL, se sirve directamente
+    - Entre el 80% y el 100% se sirve y se refresca en segundo plano
+    - Si ha caducado se descarga; si la descarga falla se sirve la copia
+
+    Attributes:
+        url (str): URL del documento
+        ttl (float): Segundos de validez de la copia
+    """
+
+    def __init__(self, url, ttl, descargar, directorio=None):
+        """
+        Constructor del documento cacheado.
+
+        Args:
+            url (str): URL del documento
+            ttl (float): Segundos de validez de la copia
+            descargar (callable): Función url -> dict
+            directorio (str): Carpeta de la caché en disco (None: solo memoria)
+        """
+        self.url = url
+        self.ttl = ttl
+        self._descargar = descargar
+        self._ruta = None
+        if directorio:
+            nombre = hashlib.sha1(url.encode()).hexdigest() + '.json'
+            self._ruta = os.path.join(directorio, nombre)
+
+        self._datos = None
+        self._guardado = 0
+        self._lock = threading.Lock()
+        self._refrescando = False
+
+    def obtener(self, forzar=False):
+        """
+        Devuelve el documento, descargándolo solo si hace falta.
+
+        Args:
+            forzar (bool): Descargar aunque la copia sea válida
+
+        Returns:
+            dict: Documento JSON
+        """
+        if self._datos is None:
+            self._leer_disco()
+
+        if forzar or self._datos is None:
+            return self._actualizar()
+
+        edad = time.time() - self._guardado
+        if edad > self.ttl:
+            try:
+                return self._actualizar()
+            except requests.RequestException as e:
+                logger.warning('No se pudo refrescar %s, usando copia cacheada: %s', self.url, e)
+        elif edad > self.ttl * 0.8:
+            self._refrescar_en_segundo_plano()
+
+        return self._datos
+
+    def tras_fork(self):
+        """En un worker recién creado: la copia se conserva, el lock no."""
+        self._lock = threading.Lock()
+        self._refrescando = False
+
+    def _actualizar(self):
+        """Descarga el documento y lo guarda en memoria y disco."""
+        datos = self._descargar(self.url)
+        with self._lock:
+            self._datos = datos
+            self._guardado = time.time()
+        self._escribir_disco()
+        return datos
+
+    def _refrescar_en_segundo_plano(self):
+        """Lanza una descarga en un hilo si no hay otra en curso."""
+        with self._lock:
+            if self._refrescando:
+                return
+            self._refrescando = True
+
+        def refrescar():
+            try:
+                self._actualizar()
+            except requests.RequestException as e:
+                logger.warning('Fallo al refrescar %s en segundo plano: %s', self.url, e)
+            finally:
+                self._refrescando = False
+
+        threading.Thread(target=refrescar, daemon=True).start()
+
+    def _leer_disco(self):
+        """Carga la copia de disco (si existe y es legible)."""
+        if not self._ruta:
+            return
+        try:
+            with open(self._ruta, encoding='utf-8') as f:
+                contenido = json.load(f)
+            self._datos = contenido['datos']
+            self._guardado = contenido['guardado']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _escribir_disco(self):
+        """Guarda la copia en disco de forma atómica."""
+        if not self._ruta:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._ruta), exist_ok=True)
+            temporal = f'{self._ruta}.{os.getpid()}.tmp'
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump({'guardado': self._guardado, 'datos': self._datos}, f)
+            os.replace(temporal, self._ruta)
+        except OSError as e:
+            logger.warning('No se pudo escribir la caché OIDC en disco: %s', e)
+
+
+class ClienteOIDC:
+    """
+    Discovery, JWKS y conexiones HTTP del proveedor OpenID.
+
+    Se guarda en app.extensions['oidc'].
+
+    Attributes:
+        adaptador (AdaptadorCompartido): Pool de conexiones HTTP
+        sesion (requests.Session): Sesión para discovery y JWKS
+    """
+
+    def __init__(self, app):
+        """
+        Constructor del cliente.
+
+        Args:
+            app: Instancia de Flask
+        """
+        self.timeout = app.config['OIDC_HTTP_TIMEOUT']
+        self.jwks_ttl = app.config['OIDC_JWKS_TTL_SECONDS']
+        self.directorio = app.config['OIDC_CACHE_DIR']
+
+        self.adaptadores_extra = {}
+
+        discovery_url = app.config['GOOGLE_DISCOVERY_URL']
+        if app.config['OIDC_LOCAL_PROVIDER']:
+            from app.oidc_local import init_proveedor_local
+            proveedor = init_proveedor_local(app)
+            discovery_url = proveedor.discovery_url
+            self.adaptadores_extra[proveedor.issuer + '/'] = proveedor.adaptador
+            # Las claves locales cambian en cada arranque: nada de disco
+            self.directorio = None
+
+        self._crear_sesion(app.config['OIDC_HTTP_POOL_SIZE'])
+
+        self._metadata = DocumentoCacheado(
+            discovery_url, app.config['OIDC_CACHE_TTL_SECONDS'], self._descargar_json, self.directorio
+        )
+        self._jwks = None
+
+    def _crear_sesion(self, tamano_pool):
+        """Crea el pool de conexiones y la sesión de discovery y JWKS."""
+        self.tamano_pool = tamano_pool
+        self.adaptador = AdaptadorCompartido(pool_connections=tamano_pool, pool_maxsize=tamano_pool)
+        self.sesion = requests.Session()
+        self.montar(self.sesion)
+
+    def tras_fork(self):
+        """
+        En un worker recién creado: pool de conexiones propio.
+
+        Los sockets del pool heredado son los del maestro (no se cierran
+        aquí). Discovery y JWKS ya descargados se conservan.
+        """
+        self._crear_sesion(self.tamano_pool)
+        for documento in (self._metadata, self._jwks):
+            if documento is not None:
+                documento.tras_fork()
+
+    def montar(self, sesion):
+        """
+        Monta el pool compartido (y el proveedor local) en una sesión.
+
+        Args:
+            sesion (requests.Session): Sesión a configurar
+        """
+        sesion.mount('https://', self.adaptador)
+        sesion.mount('http://', self.adaptador)
+        for prefijo, adaptador in self.adaptadores_extra.items():
+            sesion.mount(prefijo, adaptador)
+
+    def _descargar_json(self, url):
+        """Descarga un documento JSON con la sesión compartida."""
+        respuesta = self.sesion.get(url, timeout=self.timeout)
+        respuesta.raise_for_status()
+        return respuesta.json()
+
+    def metadata(self):
+        """
+        Documento de discovery (openid-configuration) cacheado.
+
+        Returns:
+            dict: Metadata del proveedor
+        """
+        return self._metadata.obtener()
+
+    def jwks(self, forzar=False):
+        """
+        Claves públicas (JWKS) del proveedor, cacheadas.
+
+        Args:
+            forzar (bool): Descargar aunque la copia sea válida
+                           (p.ej. si aparece un 'kid' desconocido)
+
+        Returns:
+            dict: JWK set
+        """
+        jwks_uri = self.metadata()['jwks_uri']
+        if self._jwks is None or self._jwks.url != jwks_uri:
+            self._jwks = DocumentoCacheado(jwks_uri, self.jwks_ttl, self._descargar_json, self.directorio)
+        return self._jwks.obtener(forzar=forzar)
+
+    def cerrar(self):
+        """Cierra el pool de conexiones."""
+        self.adaptador.cerrar()
+
+
+def cliente_google():
+    """
+    Cliente OAuth de Google de la app, creado en el primer login.
+
+    Se guarda en app.extensions['oauth_google'].
+
+    Returns:
+        GoogleOAuth2App: Cliente registrado con las credenciales de Google
+    """
+    cliente = current_app.extensions.get('oauth_google')
+    if cliente is None:
+        from authlib.integrations.flask_client import OAuth
+        from app.oidc_google import GoogleOAuth2App
+
+        config = current_app.config
+        cliente = OAuth(current_app._get_current_object()).register(
+            name='google',
+            client_cls=GoogleOAuth2App,
+            client_id=config['GOOGLE_CLIENT_ID'],
+            client_secret=config['GOOGLE_CLIENT_SECRET'],
+            client_kwargs={
+                'scope': 'openid email profile',
+                'default_timeout': config['OIDC_HTTP_TIMEOUT']
+            }
+        )
+        current_app.extensions['oauth_google'] = cliente
+    return cliente
+
+
+def init_oidc(app):
+    """
+    Crea el cliente OIDC de la app.
+
+    Args:
+        app: Instancia de Flask
+    """
+    app.extensions['oidc'] = ClienteOIDC(app)
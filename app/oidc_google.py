@@ -0,0 +1,34 @@
+"""
+Cliente OAuth de Authlib para el login con Google.
+
+Está separado de app/oidc.py para que Authlib se importe con el primer
+login (ver cliente_google) y no al arrancar la app.
+"""
+
+from flask import current_app
+from authlib.integrations.flask_client import FlaskOAuth2App
+
+
+class GoogleOAuth2App(FlaskOAuth2App):
+    """
+    Cliente OAuth de Authlib que usa ClienteOIDC.
+
+    Obtiene discovery y JWKS de la caché y reutiliza el pool de
+    conexiones en las llamadas al token endpoint.
+    """
+
+    OAUTH_APP_CONFIG = None
+
+    def load_server_metadata(self):
+        metadata = dict(self.server_metadata)
+        metadata.pop('jwks', None)
+        metadata.update(current_app.extensions['oidc'].metadata())
+        return metadata
+
+    def fetch_jwk_set(self, force=False):
+        return current_app.extensions['oidc'].jwks(forzar=force)
+
+    def _get_oauth_client(self, **metadata):
+        sesion = super()._get_oauth_client(**metadata)
+        current_app.extensions['oidc'].montar(sesion)
+        return sesion
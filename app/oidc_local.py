@@ -0,0 +1,237 @@
+"""
+Proveedor OpenID Connect local, sustituto de Google sin red.
+
+Se activa con OIDC_LOCAL_PROVIDER=True (por defecto en testing; solo
+se admite con TESTING o DEBUG: autentica cualquier email). Permite
+ejecutar y medir el flujo completo de login con Google sin salir a
+internet:
+
+- /oidc-local/authorize: blueprint que acepta el login sin pantalla de
+  consentimiento y redirige al callback con un código
+- Discovery, JWKS y token endpoint: los sirve un adaptador de requests
+  montado en https://oidc.local/, así que las llamadas servidor a
+  servidor de Authlib nunca abren un socket
+
+El usuario autenticado es el del parámetro login_hint o, si no se
+indica, OIDC_LOCAL_EMAIL.
+"""
+
+import hashlib
+import json
+import secrets
+import time
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from flask import Blueprint, abort, current_app, request, redirect
+from authlib.jose import JsonWebKey, jwt
+from authlib.common.urls import add_params_to_uri
+
+from app.cache import TTLCache
+
+
+bp = Blueprint('oidc_local', __name__, url_prefix='/oidc-local')
+
+# Clave RSA del proveedor, generada una sola vez por proceso
+_clave = None
+
+
+def _clave_proveedor():
+    """Genera (la primera vez) y devuelve la clave RSA del proveedor."""
+    global _clave
+    if _clave is None:
+        _clave = JsonWebKey.generate_key('RSA', 2048, is_private=True, options={'kid': 'oidc-local'})
+    return _clave
+
+
+class ProveedorOIDCLocal:
+    """
+    Proveedor OpenID en memoria.
+
+    Usa una clave RSA generada al arrancar el proceso y emite id_tokens firmados
+    para los códigos que entrega /oidc-local/authorize.
+
+    Attributes:
+        issuer (str): Identificador del proveedor
+        clave: Clave RSA privada (JWK)
+        codigos (TTLCache): Códigos de autorización pendientes
+        adaptador (AdaptadorProveedorLocal): Adaptador para requests
+    """
+
+    issuer = 'https://oidc.local'
+
+    def __init__(self, email_por_defecto):
+        """
+        Constructor del proveedor.
+
+        Args:
+            email_por_defecto (str): Email del usuario si no hay login_hint
+        """
+        self.email_por_defecto = email_por_defecto
+        self.clave = _clave_proveedor()
+        self.codigos = TTLCache(maxsize=1024, ttl=300)
+        self.adaptador = AdaptadorProveedorLocal(self)
+
+    @property
+    def discovery_url(self):
+        return f'{self.issuer}/.well-known/openid-configuration'
+
+    def metadata(self):
+        """Documento de discovery del proveedor."""
+        return {
+            'issuer': self.issuer,
+            'authorization_endpoint': '/oidc-local/authorize',
+            'token_endpoint': f'{self.issuer}/token',
+            'jwks_uri': f'{self.issuer}/jwks',
+            'response_types_supported': ['code'],
+            'subject_types_supported': ['public'],
+            'id_token_signing_alg_values_supported': ['RS256'],
+            'scopes_supported': ['openid', 'email', 'profile']
+        }
+
+    def jwks(self):
+        """Claves públicas del proveedor."""
+        return {'keys': [self.clave.as_dict(is_private=False)]}
+
+    def autorizar(self, client_id, nonce, email):
+        """
+        Emite un código de autorización para un usuario.
+
+        Args:
+            client_id (str): Cliente que pide el login
+            nonce (str): Nonce del flujo OpenID
+            email (str): Email del usuario autenticado
+
+        Returns:
+            str: Código de autorización
+        """
+        codigo = secrets.token_urlsafe(24)
+        self.codigos.set(codigo, {'client_id': client_id, 'nonce': nonce, 'email': email})
+        return codigo
+
+    def canjear(self, codigo):
+        """
+        Canjea un código por tokens (una sola vez).
+
+        Args:
+            codigo (str): Código de autorización
+
+        Returns:
+            dict: Respuesta del token endpoint o None si el código no vale
+        """
+        datos = self.codigos.get(codigo)
+        if datos is None:
+            return None
+        self.codigos.delete(codigo)
+
+        ahora = int(time.time())
+        nombre = datos['email'].split('@')[0]
+        claims = {
+            'iss': self.issuer,
+            'sub': hashlib.sha1(datos['email'].encode()).hexdigest(),
+            'aud': datos['client_id'],
+            'iat': ahora,
+            'exp': ahora + 3600,
+            'email': datos['email'],
+            'email_verified': True,
+            'given_name': nombre.capitalize(),
+            'family_name': 'Local'
+        }
+        if datos['nonce']:
+            claims['nonce'] = datos['nonce']
+
+        id_token = jwt.encode({'alg': 'RS256', 'kid': 'oidc-local'}, claims, self.clave)
+        return {
+            'access_token': secrets.token_urlsafe(24),
+            'token_type': 'Bearer',
+            'expires_in': 3600,
+            'scope': 'openid email profile',
+            'id_token': id_token.decode()
+        }
+
+
+class AdaptadorProveedorLocal(BaseAdapter):
+    """
+    Adaptador de requests que responde como el proveedor local.
+
+    Sirve discovery, JWKS y token endpoint sin abrir conexiones.
+    """
+
+    def __init__(self, proveedor):
+        super().__init__()
+        self.proveedor = proveedor
+
+    def send(self, peticion, **kwargs):
+        ruta = urlparse(peticion.url).path
+
+        if ruta == '/.well-known/openid-configuration':
+            estado, cuerpo = 200, self.proveedor.metadata()
+        elif ruta == '/jwks':
+            estado, cuerpo = 200, self.proveedor.jwks()
+        elif ruta == '/token' and peticion.method == 'POST':
+            datos = parse_qs(peticion.body if isinstance(peticion.body, str) else (peticion.body or b'').decode())
+            tokens = self.proveedor.canjear(datos.get('code', [''])[0])
+            if tokens:
+                estado, cuerpo = 200, tokens
+            else:
+                estado, cuerpo = 400, {'error': 'invalid_grant'}
+        else:
+            estado, cuerpo = 404, {'error': 'not_found'}
+
+        respuesta = requests.Response()
+        respuesta.status_code = estado
+        respuesta._content = json.dumps(cuerpo).encode()
+        respuesta.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        respuesta.encoding = 'utf-8'
+        respuesta.url = peticion.url
+        respuesta.request = peticion
+        return respuesta
+
+    def close(self):
+        pass
+
+
+@bp.route('/authorize')
+def authorize():
+    """Acepta el login sin consentimiento y vuelve al callback con un código."""
+    proveedor = current_app.extensions['oidc_local']
+
+    # Solo se vuelve a la propia app (nada de redirecciones abiertas)
+    redirect_uri = request.args.get('redirect_uri', '')
+    if urlparse(redirect_uri).netloc != request.host:
+        abort(400)
+
+    codigo = proveedor.autorizar(
+        client_id=request.args.get('client_id') or 'oidc-local',
+        nonce=request.args.get('nonce'),
+        email=request.args.get('login_hint') or proveedor.email_por_defecto
+    )
+
+    return redirect(add_params_to_uri(redirect_uri, [
+        ('code', codigo),
+        ('state', request.args.get('state', ''))
+    ]))
+
+
+def init_proveedor_local(app):
+    """
+    Crea el proveedor local y registra su blueprint.
+
+    Args:
+        app: Instancia de Flask
+
+    Returns:
+        ProveedorOIDCLocal: Proveedor creado
+
+    Raises:
+        RuntimeError: Si la app no está en modo testing ni debug
+    """
+    if not (app.testing or app.debug):
+        raise RuntimeError('OIDC_LOCAL_PROVIDER solo se admite en desarrollo y tests')
+
+    proveedor = ProveedorOIDCLocal(app.config['OIDC_LOCAL_EMAIL'])
+    app.extensions['oidc_local'] = proveedor
+    app.register_blueprint(bp)
+    return proveedor
@@ -0,0 +1,103 @@
+"""
+Contador de queries SQL y detector de patrones N+1.
+
+- ContadorConsultas: cuenta las queries ejecutadas dentro de un bloque
+  `with`. En los tests se usa con la fixture `query_budget` para fijar
+  un máximo de queries por endpoint.
+- init_detector_n1: en desarrollo (SQL_N1_DETECTION) registra en el log
+  las peticiones que repiten la misma query muchas veces, el síntoma
+  típico de un N+1 (una query por fila de una lista).
+
+Uso en tests:
+    def test_lista(client, query_budget):
+        with query_budget(3):
+            client.get('/solicitudes/admin')
+"""
+
+import logging
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+class ContadorConsultas:
+    """
+    Cuenta las queries ejecutadas en un engine dentro de un bloque `with`.
+
+    Attributes:
+        engine: Engine de SQLAlchemy a observar
+        consultas (list): SQL de cada query ejecutada
+    """
+
+    def __init__(self, engine):
+        """
+        Constructor del contador.
+
+        Args:
+            engine: Engine de SQLAlchemy (db.engine)
+        """
+        self.engine = engine
+        self.consultas = []
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        self.consultas.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._registrar)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._registrar)
+        return False
+
+    @property
+    def total(self):
+        """Número de queries ejecutadas."""
+        return len(self.consultas)
+
+    def repetidas(self, minimo=2):
+        """
+        Queries que se han ejecutado al menos `minimo` veces.
+
+        Args:
+            minimo (int): Repeticiones mínimas
+
+        Returns:
+            list: Pares (sql, repeticiones), de más a menos repetida
+        """
+        return [(sql, n) for sql, n in Counter(self.consultas).most_common() if n >= minimo]
+
+
+def init_detector_n1(app, engine):
+    """
+    Activa el log de patrones N+1 por petición.
+
+    Cada petición guarda en `g` el SQL de sus queries; al terminar, si
+    alguna se repite SQL_N1_THRESHOLD veces o más se emite un warning
+    con el endpoint y la query.
+
+    Args:
+        app: Instancia de Flask
+        engine: Engine de SQLAlchemy (db.engine)
+    """
+    umbral = app.config['SQL_N1_THRESHOLD']
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.setdefault('_consultas_sql', []).append(statement)
+
+    @app.after_request
+    def avisar_n1(response):
+        consultas = g.pop('_consultas_sql', [])
+        for sql, repeticiones in Counter(consultas).most_common():
+            if repeticiones < umbral:
+                break
+            logger.warning(
+                'Posible N+1 en %s (%s): query repetida %d veces de %d:\n%s',
+                request.endpoint, request.path, repeticiones, len(consultas), sql
+            )
+        return response
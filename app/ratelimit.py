@@ -0,0 +1,321 @@
+"""
+Rate limiting (límite de peticiones) para login y API.
+
+Implementa un límite por ventana deslizante (sliding window counter):
+se cuentan las peticiones de la ventana actual y de la anterior, y la
+anterior se pondera por la parte que aún solapa con la ventana deslizante.
+
+Backends disponibles (config RATELIMIT_BACKEND):
+- 'memoria': contadores en memoria del worker (por defecto)
+- 'sql': contadores compartidos entre workers en la tabla limites_tasa
+- 'paquete.modulo.Clase': cualquier clase con el método golpear()
+
+Los límites se definen en config.py como 'N/unidad' (p.ej. '5/minute').
+Al superarse se responde 429 con la cabecera Retry-After.
+
+Uso:
+    @limitar('login_cuenta', clave=lambda: request.form.get('email'))
+    def login(): ...
+"""
+
+import importlib
+import math
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from flask import current_app, request, render_template, flash
+
+from app.cache import TTLCache
+
+
+UNIDADES = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400
+}
+
+
+def parsear_limite(texto):
+    """
+    Convierte un límite 'N/unidad' en (peticiones, segundos).
+
+    Args:
+        texto (str): Límite, p.ej. '10/minute'
+
+    Returns:
+        tuple: (peticiones, segundos de la ventana)
+
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    try:
+        peticiones, unidad = texto.split('/')
+        return int(peticiones), UNIDADES[unidad.strip().rstrip('s')]
+    except (ValueError, KeyError):
+        raise ValueError(f'Límite no válido: {texto!r} (formato: N/second|minute|hour|day)')
+
+
+class MemoriaBackend:
+    """
+    Contadores de peticiones en memoria del worker.
+
+    Cada clave guarda (inicio de ventana, contador anterior, contador
+    actual) en una TTLCache acotada, así que las claves inactivas se
+    descartan solas.
+    """
+
+    def __init__(self, app):
+        self._ventanas = TTLCache(
+            maxsize=app.config['RATELIMIT_MEMORY_MAX_KEYS'],
+            ttl=2 * UNIDADES['day']
+        )
+        self._lock = threading.Lock()
+
+    def golpear(self, clave, inicio, ventana):
+        """
+        Suma una petición a la ventana actual de la clave.
+
+        Args:
+            clave (str): Clave del límite (nombre + identidad)
+            inicio (int): Timestamp de inicio de la ventana actual
+            ventana (int): Duración de la ventana en segundos
+
+        Returns:
+            tuple: (peticiones ventana anterior, peticiones ventana actual)
+        """
+        with self._lock:
+            estado = self._ventanas.get(clave)
+
+            if estado is None or estado[0] < inicio - ventana:
+                anterior, actual = 0, 0
+            elif estado[0] == inicio - ventana:
+                anterior, actual = estado[2], 0
+            else:
+                anterior, actual = estado[1], estado[2]
+
+            actual += 1
+            self._ventanas.set(clave, (inicio, anterior, actual))
+
+        return anterior, actual
+
+
+class SQLBackend:
+    """
+    Contadores de peticiones compartidos entre workers en la BD.
+
+    Usa la tabla limites_tasa (una fila por clave y ventana) con un
+    UPDATE atómico contador = contador + 1. Va en su propia conexión
+    para no mezclarse con la transacción de la petición.
+    """
+
+    def __init__(self, app):
+        pass
+
+    def golpear(self, clave, inicio, ventana):
+        """
+        Suma una petición a la ventana actual de la clave.
+
+        Args:
+            clave (str): Clave del límite (nombre + identidad)
+            inicio (int): Timestamp de inicio de la ventana actual
+            ventana (int): Duración de la ventana en segundos
+
+        Returns:
+            tuple: (peticiones ventana anterior, peticiones ventana actual)
+        """
+        from sqlalchemy.exc import IntegrityError
+        from app import db
+        from app.models import LimiteTasa
+
+        tabla = LimiteTasa.__table__
+
+        with db.engine.begin() as conn:
+            resultado = conn.execute(
+                tabla.update()
+                .where(tabla.c.clave == clave, tabla.c.ventana_inicio == inicio)
+                .values(contador=tabla.c.contador + 1)
+            )
+
+            if resultado.rowcount == 0:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(tabla.insert().values(clave=clave, ventana_inicio=inicio, contador=1))
+                except IntegrityError:
+                    # Otro worker creó la fila a la vez
+                    conn.execute(
+                        tabla.update()
+                        .where(tabla.c.clave == clave, tabla.c.ventana_inicio == inicio)
+                        .values(contador=tabla.c.contador + 1)
+                    )
+
+                # Ventana nueva: borrar las que ya no se usan
+                conn.execute(
+                    tabla.delete()
+                    .where(tabla.c.clave == clave, tabla.c.ventana_inicio < inicio - ventana)
+                )
+
+            filas = dict(conn.execute(
+                db.select(tabla.c.ventana_inicio, tabla.c.contador)
+                .where(tabla.c.clave == clave, tabla.c.ventana_inicio >= inicio - ventana)
+            ).all())
+
+        return filas.get(inicio - ventana, 0), filas.get(inicio, 0)
+
+
+BACKENDS = {
+    'memoria': MemoriaBackend,
+    'sql': SQLBackend
+}
+
+
+class LimitadorTasa:
+    """
+    Aplica los límites de peticiones y lleva contadores para ajustarlos.
+
+    Se guarda en app.extensions['ratelimit'].
+
+    Attributes:
+        backend: Almacén de contadores (MemoriaBackend, SQLBackend...)
+        contadores (dict): Peticiones permitidas/rechazadas por límite
+    """
+
+    def __init__(self, app):
+        """
+        Constructor del limitador.
+
+        Args:
+            app: Instancia de Flask
+        """
+        nombre = app.config['RATELIMIT_BACKEND']
+        if nombre in BACKENDS:
+            clase = BACKENDS[nombre]
+        else:
+            modulo, _, clase = nombre.rpartition('.')
+            clase = getattr(importlib.import_module(modulo), clase)
+
+        self.backend = clase(app)
+        self.contadores = defaultdict(lambda: {'permitidas': 0, 'rechazadas': 0})
+        self._lock = threading.Lock()
+
+    def comprobar(self, nombre, identidad):
+        """
+        Registra una petición y comprueba si supera el límite.
+
+        Args:
+            nombre (str): Nombre del límite (RATELIMIT_<NOMBRE> en config)
+            identidad (str): IP, email o ID de usuario
+
+        Returns:
+            tuple: (permitida, límite, restantes, segundos hasta reintentar)
+        """
+        limite, ventana = parsear_limite(current_app.config[f'RATELIMIT_{nombre.upper()}'])
+
+        ahora = time.time()
+        inicio = int(ahora // ventana) * ventana
+        anterior, actual = self.backend.golpear(f'{nombre}:{identidad}', inicio, ventana)
+
+        # Peso de la ventana anterior según lo que aún solapa
+        estimado = anterior * (1 - (ahora - inicio) / ventana) + actual
+        permitida = estimado <= limite
+
+        with self._lock:
+            self.contadores[nombre]['permitidas' if permitida else 'rechazadas'] += 1
+
+        restantes = max(0, int(limite - estimado))
+        retry_after = max(1, math.ceil(inicio + ventana - ahora))
+        return permitida, limite, restantes, retry_after
+
+    def estadisticas(self):
+        """
+        Devuelve una copia de los contadores por límite.
+
+        Returns:
+            dict: {nombre: {'permitidas': n, 'rechazadas': n}}
+        """
+        with self._lock:
+            return {nombre: dict(valores) for nombre, valores in self.contadores.items()}
+
+
+def init_ratelimit(app):
+    """
+    Crea el limitador de peticiones para la app.
+
+    Args:
+        app: Instancia de Flask
+    """
+    app.extensions['ratelimit'] = LimitadorTasa(app)
+
+
+def clave_ip():
+    """Identidad por IP del cliente."""
+    return request.remote_addr or 'desconocida'
+
+
+def respuesta_limite(retry_after):
+    """
+    Respuesta 429 con Retry-After.
+
+    JSON en la API; en la web, la página de login con un mensaje.
+
+    Args:
+        retry_after (int): Segundos hasta poder reintentar
+
+    Returns:
+        tuple: (cuerpo, 429, cabeceras)
+    """
+    cabeceras = {'Retry-After': str(retry_after)}
+
+    if request.blueprint == 'api':
+        return {'error': 'Demasiadas peticiones, inténtalo más tarde'}, 429, cabeceras
+
+    flash(f'Demasiados intentos. Inténtalo de nuevo en {retry_after} segundos.', 'danger')
+    return render_template('auth/login.html'), 429, cabeceras
+
+
+def comprobar_limite(nombre, identidad):
+    """
+    Aplica un límite y devuelve la respuesta 429 si se supera.
+
+    Args:
+        nombre (str): Nombre del límite (RATELIMIT_<NOMBRE> en config)
+        identidad (str): IP, email o ID de usuario
+
+    Returns:
+        Respuesta 429 si se supera el límite, None si no
+    """
+    if not current_app.config['RATELIMIT_ENABLED'] or not identidad:
+        return None
+
+    permitida, _, _, retry_after = current_app.extensions['ratelimit'].comprobar(nombre, identidad)
+    if not permitida:
+        return respuesta_limite(retry_after)
+    return None
+
+
+def limitar(nombre, clave=clave_ip, metodos=('POST',)):
+    """
+    Decorador que aplica un límite de peticiones a una vista.
+
+    Args:
+        nombre (str): Nombre del límite (RATELIMIT_<NOMBRE> en config)
+        clave (callable): Función que devuelve la identidad a limitar
+        metodos (tuple): Métodos HTTP a los que se aplica
+    """
+    def decorador(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method in metodos:
+                identidad = clave()
+                if isinstance(identidad, str):
+                    identidad = identidad.strip().lower()
+
+                respuesta = comprobar_limite(nombre, identidad)
+                if respuesta is not None:
+                    return respuesta
+
+            return f(*args, **kwargs)
+        return decorated
+    return decorador
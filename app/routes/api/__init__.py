@@ -6,8 +6,17 @@ Configura Flask-RESTX con Swagger automático.
 from flask import Blueprint
 from flask_restx import Api
 
+from app.ratelimit import comprobar_limite, clave_ip
+
 # Crear blueprint
-bp = Blueprint('api', __name__, url_prefix='/api')
+# cli_group=None: los comandos del blueprint son `flask <comando>`
+bp = Blueprint('api', __name__, url_prefix='/api', cli_group=None)
+
+
+@bp.before_request
+def limitar_por_ip():
+    """Límite de peticiones por IP para toda la API."""
+    return comprobar_limite('api_ip', clave_ip())
 
 # Configurar Flask-RESTX (Swagger)
 api = Api(
@@ -34,5 +43,8 @@ api.add_namespace(auth.ns)
 api.add_namespace(mascotas.ns)
 api.add_namespace(solicitudes.ns)
 
+# flask limpiar-tokens
+bp.cli.add_command(auth.limpiar_tokens_command)
+
 # Desactivar X-Fields header en Swagger
 api.mask_header = None
\ No newline at end of file
@@ -1,16 +1,20 @@
 """
 Endpoints de autenticación para la API.
-Login y decorador JWT.
+Login, refresco y revocación de tokens, y decorador JWT.
 """
 
+import uuid
 from functools import wraps
 from datetime import datetime, timedelta
 
+import click
 import jwt
 from flask import request, current_app, g
 from flask_restx import Namespace, Resource, fields
 
-from app.models import Usuario
+from app import db
+from app.models import Usuario, TokenRefresco, TokenRevocado
+from app.ratelimit import limitar, comprobar_limite
 
 # Namespace para auth
 ns = Namespace('auth', description='Autenticación')
@@ -22,27 +26,156 @@ login_model = ns.model('Login', {
 })
 
 token_response = ns.model('TokenResponse', {
-    'token': fields.String(description='JWT token'),
+    'token': fields.String(description='JWT access token (corta duración)'),
+    'refresh_token': fields.String(description='Refresh token (se rota en cada uso)'),
+    'expires_in': fields.Integer(description='Segundos de validez del access token'),
     'user': fields.Raw(description='Datos del usuario')
 })
 
+refresh_model = ns.model('Refresh', {
+    'refresh_token': fields.String(required=True, description='Refresh token')
+})
+
+logout_model = ns.model('Logout', {
+    'refresh_token': fields.String(description='Refresh token a revocar (opcional)')
+})
+
 error_response = ns.model('ErrorResponse', {
     'error': fields.String(description='Mensaje de error')
 })
 
 
-def generate_token(user_id):
-    """Genera un JWT token para el usuario."""
+class UsuarioJWT:
+    """
+    Identidad del usuario construida a partir de los claims del JWT.
+
+    Sustituye a la consulta Usuario.query.get() en cada llamada a la API:
+    contiene solo lo que viaja en el token.
+
+    Attributes:
+        id (int): ID del usuario
+        rol (str): 'adoptante' o 'admin'
+        activo (bool): Si la cuenta estaba activa al emitir el token
+        token_version (int): Versión de token del usuario
+        jti (str): Identificador único del token
+        exp (int): Timestamp de expiración del token
+    """
+
+    def __init__(self, payload):
+        self.id = payload['user_id']
+        self.rol = payload['rol']
+        self.activo = payload['activo']
+        self.token_version = payload['tv']
+        self.jti = payload['jti']
+        self.exp = payload['exp']
+
+    def is_admin(self):
+        """Comprueba si el usuario es administrador."""
+        return self.rol == 'admin'
+
+    def __repr__(self):
+        """Representación en string del objeto."""
+        return f'<UsuarioJWT {self.id} ({self.rol})>'
+
+
+def _es_asimetrico():
+    """Indica si los tokens se firman con clave pública/privada."""
+    return current_app.config['JWT_ALGORITHM'] != 'HS256'
+
+
+def _clave_firma():
+    """Clave para firmar: la privada en modo asimétrico, el secreto si no."""
+    if _es_asimetrico():
+        return current_app.config['JWT_PRIVATE_KEY']
+    return current_app.config['JWT_SECRET_KEY']
+
+
+def _clave_verificacion():
+    """Clave para verificar: la pública en modo asimétrico, el secreto si no."""
+    if _es_asimetrico():
+        return current_app.config['JWT_PUBLIC_KEY']
+    return current_app.config['JWT_SECRET_KEY']
+
+
+def generate_token(usuario):
+    """
+    Genera un JWT access token de corta duración para el usuario.
+
+    El token incluye el rol, si la cuenta está activa y la versión de
+    token, para que @jwt_required no tenga que consultar la BD, y un
+    jti para poder revocarlo en el logout.
+
+    Args:
+        usuario (Usuario): Usuario autenticado
+
+    Returns:
+        str: Token JWT firmado
+    """
     payload = {
-        'user_id': user_id,
-        'exp': datetime.utcnow() + timedelta(hours=current_app.config['JWT_EXPIRATION_HOURS']),
+        'user_id': usuario.id,
+        'rol': usuario.rol,
+        'activo': usuario.activo,
+        'tv': usuario.token_version or 0,
+        'jti': str(uuid.uuid4()),
+        'exp': datetime.utcnow() + timedelta(minutes=current_app.config['JWT_ACCESS_EXPIRATION_MINUTES']),
         'iat': datetime.utcnow()
     }
-    return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+    return jwt.encode(payload, _clave_firma(), algorithm=current_app.config['JWT_ALGORITHM'])
+
+
+def _respuesta_tokens(usuario):
+    """
+    Emite un access token y un refresh token nuevos y hace commit.
+
+    Args:
+        usuario (Usuario): Usuario autenticado
+
+    Returns:
+        dict: Cuerpo de la respuesta con ambos tokens
+    """
+    refresh_token = TokenRefresco.emitir(usuario.id, current_app.config['JWT_REFRESH_EXPIRATION_DAYS'])
+    db.session.commit()
+
+    return {
+        'token': generate_token(usuario),
+        'refresh_token': refresh_token,
+        'expires_in': current_app.config['JWT_ACCESS_EXPIRATION_MINUTES'] * 60,
+        'user': usuario.to_dict()
+    }
+
+
+def _token_en_denylist(jti):
+    """
+    Comprueba si un access token se revocó con un logout.
+
+    El resultado (positivo o negativo) se guarda en una caché LRU con
+    TTL corto, así que solo la primera petición con cada token consulta
+    la BD. El TTL limita el retraso con el que otro worker ve un logout.
+
+    Args:
+        jti (str): Identificador del token
+
+    Returns:
+        bool: True si el token está revocado
+    """
+    denylist = current_app.extensions['jwt_denylist']
+    revocado = denylist.get(jti)
+
+    if revocado is None:
+        revocado = db.session.get(TokenRevocado, jti) is not None
+        denylist.set(jti, revocado)
+
+    return revocado
 
 
 def jwt_required(f):
-    """Decorador que requiere un JWT válido."""
+    """
+    Decorador que requiere un JWT válido.
+
+    La validación es una comprobación de firma más una consulta al
+    conjunto en memoria de usuarios revocados (app/cache.py), sin
+    acceder a la BD en cada petición.
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         token = None
@@ -58,26 +191,56 @@ def jwt_required(f):
         try:
             payload = jwt.decode(
                 token,
-                current_app.config['JWT_SECRET_KEY'],
-                algorithms=['HS256']
+                _clave_verificacion(),
+                algorithms=[current_app.config['JWT_ALGORITHM']],
+                options={'require': ['exp', 'jti', 'user_id', 'rol', 'activo', 'tv']}
             )
-            g.current_user = Usuario.query.get(payload['user_id'])
-            if not g.current_user:
-                return {'error': 'Usuario no encontrado'}, 401
         except jwt.ExpiredSignatureError:
             return {'error': 'Token expirado'}, 401
         except jwt.InvalidTokenError:
             return {'error': 'Token inválido'}, 401
+
+        revocaciones = current_app.extensions['jwt_revocaciones']
+        if not payload['activo'] or revocaciones.esta_revocado(payload['user_id'], payload['tv']):
+            return {'error': 'Token revocado'}, 401
+
+        if _token_en_denylist(payload['jti']):
+            return {'error': 'Token revocado'}, 401
+
+        g.current_user = UsuarioJWT(payload)
+
+        # Límite de peticiones por usuario autenticado
+        respuesta = comprobar_limite('api_usuario', g.current_user.id)
+        if respuesta is not None:
+            return respuesta
         
         return f(*args, **kwargs)
     return decorated
 
 
+def admin_jwt_required(f):
+    """
+    Decorador que requiere un JWT válido con rol de administrador.
+
+    El rol se lee de los claims del token (UsuarioJWT); sin token o con
+    token inválido responde 401 como jwt_required, y 403 si no es admin.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not g.current_user.is_admin():
+            return {'error': 'Solo administradores'}, 403
+        return f(*args, **kwargs)
+    return jwt_required(decorated)
+
+
 @ns.route('/login')
 class Login(Resource):
     @ns.expect(login_model)
     @ns.response(200, 'Login exitoso', token_response)
     @ns.response(401, 'Credenciales inválidas', error_response)
+    @ns.response(429, 'Demasiados intentos', error_response)
+    @limitar('login_ip')
+    @limitar('login_cuenta', clave=lambda: (request.get_json(silent=True) or {}).get('email'))
     def post(self):
         """Autenticación de usuario, devuelve JWT."""
         data = request.get_json()
@@ -96,9 +259,149 @@ class Login(Resource):
         if not usuario.activo:
             return {'error': 'Cuenta desactivada'}, 401
         
-        token = generate_token(usuario.id)
-        
+        return _respuesta_tokens(usuario), 200
+
+
+@ns.route('/refresh')
+class Refresh(Resource):
+    @ns.expect(refresh_model)
+    @ns.response(200, 'Tokens renovados', token_response)
+    @ns.response(401, 'Refresh token inválido', error_response)
+    def post(self):
+        """Renueva el access token con un refresh token (sin contraseña)."""
+        data = request.get_json(silent=True)
+
+        if not data or not data.get('refresh_token'):
+            return {'error': 'refresh_token es requerido'}, 400
+
+        refresco = TokenRefresco.query.filter_by(
+            token_hash=TokenRefresco.hashear(data['refresh_token'])
+        ).first()
+
+        if not refresco:
+            return {'error': 'Refresh token inválido'}, 401
+
+        if refresco.revocado:
+            return _reutilizacion(refresco.usuario_id)
+
+        if not refresco.esta_vigente():
+            return {'error': 'Refresh token expirado'}, 401
+
+        usuario = refresco.usuario
+        if not usuario.activo:
+            return {'error': 'Cuenta desactivada'}, 401
+
+        # Rotación: el token usado deja de valer. UPDATE condicional: de
+        # dos refrescos simultáneos con el mismo token solo uno lo revoca
+        rotados = db.session.execute(
+            db.update(TokenRefresco)
+            .where(TokenRefresco.id == refresco.id, TokenRefresco.revocado.is_(False))
+            .values(revocado=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if rotados != 1:
+            db.session.rollback()
+            return _reutilizacion(refresco.usuario_id)
+
+        return _respuesta_tokens(usuario), 200
+
+
+def _reutilizacion(usuario_id):
+    """
+    Reutilización de un refresh token ya rotado: posible robo.
+
+    Se revocan todos los refresh tokens del usuario.
+
+    Args:
+        usuario_id (int): Dueño del token
+
+    Returns:
+        tuple: Respuesta 401
+    """
+    TokenRefresco.query.filter_by(usuario_id=usuario_id, revocado=False)\
+        .update({'revocado': True})
+    db.session.commit()
+    return {'error': 'Refresh token inválido'}, 401
+
+
+@ns.route('/logout')
+class Logout(Resource):
+    @jwt_required
+    @ns.expect(logout_model)
+    @ns.response(204, 'Tokens revocados')
+    def post(self):
+        """Revoca el access token actual y, opcionalmente, el refresh token."""
+        data = request.get_json(silent=True) or {}
+
+        jti = g.current_user.jti
+        db.session.add(TokenRevocado(
+            jti=jti,
+            fecha_expiracion=datetime.utcfromtimestamp(g.current_user.exp)
+        ))
+
+        if data.get('refresh_token'):
+            TokenRefresco.query.filter_by(
+                token_hash=TokenRefresco.hashear(data['refresh_token']),
+                usuario_id=g.current_user.id
+            ).update({'revocado': True})
+
+        db.session.commit()
+        current_app.extensions['jwt_denylist'].set(jti, True)
+
+        return '', 204
+
+
+@ns.route('/limites')
+class Limites(Resource):
+    @jwt_required
+    @ns.response(200, 'Contadores del rate limiting de este worker')
+    @ns.response(403, 'Solo administradores', error_response)
+    def get(self):
+        """Contadores de peticiones permitidas/rechazadas por límite (solo admin)."""
+        if not g.current_user.is_admin():
+            return {'error': 'Solo administradores'}, 403
+
+        return current_app.extensions['ratelimit'].estadisticas(), 200
+
+
+@ns.route('/clave-publica')
+class ClavePublica(Resource):
+    @ns.response(200, 'Clave pública para verificar tokens')
+    @ns.response(404, 'Los tokens se firman con clave simétrica', error_response)
+    def get(self):
+        """Clave pública (PEM) para que otros servicios verifiquen los JWT."""
+        if not _es_asimetrico():
+            return {'error': 'Los tokens se firman con clave simétrica'}, 404
+
         return {
-            'token': token,
-            'user': usuario.to_dict()
+            'algorithm': current_app.config['JWT_ALGORITHM'],
+            'public_key': current_app.config['JWT_PUBLIC_KEY']
         }, 200
+
+
+def limpiar_tokens():
+    """
+    Borra los refresh tokens y las revocaciones de access tokens caducados.
+
+    Los refresh tokens revocados se conservan hasta que caducan: hacen
+    falta para detectar su reutilización.
+
+    Returns:
+        tuple: (refresh tokens borrados, revocaciones borradas)
+    """
+    ahora = datetime.utcnow()
+    refrescos = db.session.execute(
+        db.delete(TokenRefresco).where(TokenRefresco.fecha_expiracion < ahora)
+    ).rowcount
+    revocados = db.session.execute(
+        db.delete(TokenRevocado).where(TokenRevocado.fecha_expiracion < ahora)
+    ).rowcount
+    db.session.commit()
+    return refrescos, revocados
+
+
+@click.command('limpiar-tokens')
+def limpiar_tokens_command():
+    """Borra los refresh tokens y los access tokens revocados ya caducados."""
+    refrescos, revocados = limpiar_tokens()
+    click.echo(f'{refrescos} refresh tokens y {revocados} tokens revocados borrados')
@@ -1,11 +1,24 @@
 """
 Endpoints públicos de mascotas para la API.
+
+Admiten ?fields=id,nombre,... (sparse fieldsets): solo se seleccionan
+en SQL y se serializan los campos pedidos. Las filas se serializan en
+una pasada con app/serializacion.py; mascota_model documenta la
+respuesta en Swagger.
+
+/batch?ids=... devuelve varias mascotas (p.ej. la pantalla de favoritos)
+con una sola query IN en lugar de una petición por mascota, y
+/cambios?desde=... las modificadas y eliminadas tras una marca (ver
+app/cambios.py).
 """
 
-from flask import request
+from flask import current_app, request
 from flask_restx import Namespace, Resource, fields
 
+from app import db
+from app.cambios import cambios_mascotas
 from app.models import Mascota
+from app.serializacion import serializador, respuesta_json
 
 ns = Namespace("mascotas", description="Mascotas")
 
@@ -26,46 +39,222 @@ mascota_model = ns.model('Mascotas', {
     'esterilizado': fields.Boolean(required=True, description='Estado esterilización')
 })
 
+cambios_mascotas_model = ns.model('CambiosMascotas', {
+    'mascotas': fields.List(fields.Nested(mascota_model), description='Mascotas nuevas o modificadas'),
+    'eliminadas': fields.List(fields.Integer, description='IDs de las mascotas eliminadas'),
+    'siguiente': fields.String(description='Marca para la próxima llamada (desde=)'),
+    'hay_mas': fields.Boolean(description='Si quedan cambios: volver a llamar con siguiente')
+})
+
+PARAMS_CAMBIOS = {
+    'desde': 'Marca devuelta en "siguiente" por la llamada anterior (sin ella, desde el principio)',
+    'limite': 'Cambios por página (por defecto CAMBIOS_POR_PAGINA, máximo CAMBIOS_LIMITE_MAX)'
+}
+
+# Campos que se pueden pedir con ?fields= (en el orden del modelo)
+CAMPOS_MASCOTA = tuple(mascota_model.keys())
+
+# Filtros de la lista (?especie=Perro...)
+FILTROS_LISTA = ('especie', 'raza', 'edad_aprox', 'tamano')
+
+PARAM_FIELDS = 'Campos a devolver separados por comas (p.ej. id,nombre,foto_url,especie); por defecto todos'
+
+
+def parsear_campos(texto):
+    """
+    Convierte el parámetro fields en la lista de campos a devolver.
+
+    El id se incluye siempre.
+
+    Args:
+        texto (str): Valor de ?fields= (None o vacío = todos)
+
+    Returns:
+        tuple: Campos de CAMPOS_MASCOTA, en el orden del modelo
+
+    Raises:
+        ValueError: Si se pide algún campo que no existe
+    """
+    if not texto:
+        return CAMPOS_MASCOTA
+
+    pedidos = {campo.strip() for campo in texto.split(',') if campo.strip()}
+    desconocidos = pedidos - set(CAMPOS_MASCOTA)
+    if desconocidos:
+        raise ValueError(f'Campos no válidos: {", ".join(sorted(desconocidos))}')
+
+    return tuple(campo for campo in CAMPOS_MASCOTA if campo in pedidos or campo == 'id')
+
+
+def parsear_ids(texto, maximo):
+    """
+    Convierte el parámetro ids en la lista de ids pedidos.
+
+    Los repetidos se devuelven una sola vez, en la posición en que
+    aparecen por primera vez.
+
+    Args:
+        texto (str): Valor de ?ids= (enteros separados por comas)
+        maximo (int): Número máximo de ids distintos
+
+    Returns:
+        list: Ids en el orden de la petición
+
+    Raises:
+        ValueError: Si falta, no son enteros positivos o hay demasiados
+    """
+    if not texto:
+        raise ValueError('Falta el parámetro ids')
+
+    ids = []
+    vistos = set()
+    for valor in texto.split(','):
+        valor = valor.strip()
+        if not valor.isdigit() or int(valor) == 0:
+            raise ValueError(f'Id no válido: {valor!r}')
+        mascota_id = int(valor)
+        if mascota_id in vistos:
+            continue
+        vistos.add(mascota_id)
+        ids.append(mascota_id)
+        # Se corta en cuanto se pasa del máximo, sin leer el resto
+        if len(ids) > maximo:
+            raise ValueError(f'Máximo {maximo} ids por llamada')
+
+    return ids
+
+
+def columnas(campos):
+    """Columnas de Mascota de los campos pedidos."""
+    return [getattr(Mascota, campo) for campo in campos]
+
+
+def proyectar(query, campos):
+    """Selecciona en SQL solo las columnas de los campos pedidos."""
+    return query.with_entities(*columnas(campos))
+
+
+def consulta_lista(args, campos):
+    """
+    SELECT de la lista de mascotas disponibles con los filtros opcionales.
+
+    Es una sentencia (no una Query) para que la ejecuten igual la vista
+    síncrona y la ruta async (app/asincrono.py).
+
+    Args:
+        args: Parámetros de la petición (especie, raza, edad_aprox, tamano)
+        campos (tuple): Campos a seleccionar (parsear_campos)
+
+    Returns:
+        Select
+    """
+    consulta = db.select(*columnas(campos)).where(Mascota.estado == 'disponible')
+
+    # Filtros opcionales desde query params
+    for filtro in FILTROS_LISTA:
+        valor = args.get(filtro)
+        if valor:
+            consulta = consulta.where(getattr(Mascota, filtro) == valor)
+
+    return consulta.order_by(Mascota.fecha_ingreso.desc())
+
+
+def consulta_detalle(id, campos):
+    """SELECT del detalle de una mascota (vista síncrona y ruta async)."""
+    return db.select(*columnas(campos)).where(Mascota.id == id)
+
+
 @ns.route("/")
 class MascotaList(Resource):
-    @ns.marshal_list_with(mascota_model)
+    @ns.response(200, 'Lista de mascotas', [mascota_model])
+    @ns.response(400, 'Campos no válidos')
     @ns.doc(params={
         'especie': 'Filtrar por especie (Perro, Gato...)',
         'raza': 'Filtrar por raza (Golden Retriever, Siamés...)',
         'edad_aprox': 'Filtrar por años (1, 3...)',
-        'tamano': 'Filtrar por tamaño (Pequeño, Mediano, Grande)'
+        'tamano': 'Filtrar por tamaño (Pequeño, Mediano, Grande)',
+        'fields': PARAM_FIELDS
     })
 
     def get(self):
         """Lista todas las mascotas disponibles para adopción."""
-        query = Mascota.query.filter_by(estado='disponible')
+        try:
+            campos = parsear_campos(request.args.get('fields'))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        filas = db.session.execute(consulta_lista(request.args, campos)).all()
+        return respuesta_json(serializador(Mascota, campos).filas(filas))
+
+
+@ns.route("/batch")
+class MascotaBatch(Resource):
+    @ns.response(200, 'Mascotas en el orden pedido; las que no existen como {id, error}', [mascota_model])
+    @ns.response(400, 'Ids o campos no válidos')
+    @ns.doc(params={
+        'ids': 'Ids separados por comas (máximo MASCOTAS_BATCH_MAX), p.ej. 3,1,7',
+        'fields': PARAM_FIELDS
+    })
+    def get(self):
+        """Obtiene varias mascotas por ID en una sola consulta."""
+        try:
+            campos = parsear_campos(request.args.get('fields'))
+            ids = parsear_ids(request.args.get('ids'), current_app.config['MASCOTAS_BATCH_MAX'])
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        filas = proyectar(Mascota.query.filter(Mascota.id.in_(ids)), campos).all()
+        por_id = {m['id']: m for m in serializador(Mascota, campos).filas(filas)}
+
+        response = respuesta_json([
+            por_id.get(id, {'id': id, 'error': 'Mascota no encontrada'}) for id in ids
+        ])
+        # Cacheable por clientes y proxies; el ETag permite revalidar con 304
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['MASCOTAS_BATCH_MAX_AGE']
+        response.add_etag()
+        return response.make_conditional(request)
 
-        # Filtros opcionales desde query params
-        especie = request.args.get("especie")
-        if especie:
-            query = query.filter_by(especie=especie)
 
-        raza = request.args.get("raza")
-        if raza:
-            query = query.filter_by(raza=raza)
+@ns.route("/cambios")
+class MascotaCambios(Resource):
+    @ns.response(200, 'Cambios posteriores a la marca', cambios_mascotas_model)
+    @ns.response(400, 'Marca o campos no válidos')
+    @ns.doc(params={**PARAMS_CAMBIOS, 'fields': PARAM_FIELDS})
+    def get(self):
+        """Mascotas creadas, modificadas o eliminadas desde la última sincronización."""
+        config = current_app.config
+        limite = request.args.get('limite', config['CAMBIOS_POR_PAGINA'], type=int)
+
+        try:
+            campos = parsear_campos(request.args.get('fields'))
+        except ValueError as e:
+            return {'error': str(e)}, 400
 
-        edad_aprox = request.args.get("edad_aprox")
-        if edad_aprox:
-            query = query.filter_by(edad_aprox=edad_aprox)
+        try:
+            cambios = cambios_mascotas(
+                campos, request.args.get('desde'), max(1, min(limite, config['CAMBIOS_LIMITE_MAX']))
+            )
+        except ValueError:
+            return {'error': 'Marca "desde" no válida'}, 400
 
-        tamano = request.args.get('tamano')
-        if tamano:
-            query = query.filter_by(tamano=tamano)
-        
-        mascotas = query.order_by(Mascota.fecha_ingreso.desc()).all()
-        return [m.to_dict() for m in mascotas]
+        return respuesta_json(cambios)
 
 
 @ns.route("/<int:id>")
 class MascotaDetail(Resource):
-    @ns.marshal_with(mascota_model)
+    @ns.response(200, 'Detalle de la mascota', mascota_model)
+    @ns.response(400, 'Campos no válidos')
     @ns.response(404, 'Mascota no encontrada')
+    @ns.doc(params={'fields': PARAM_FIELDS})
     def get(self, id):
         """Obtiene el detalle de una mascota por ID."""
-        mascota = Mascota.query.get_or_404(id)
-        return mascota.to_dict()
\ No newline at end of file
+        try:
+            campos = parsear_campos(request.args.get('fields'))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+
+        fila = db.session.execute(consulta_detalle(id, campos)).first()
+        if fila is None:
+            ns.abort(404, 'Mascota no encontrada')
+        return respuesta_json(serializador(Mascota, campos).fila(fila))
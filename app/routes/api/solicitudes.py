@@ -1,13 +1,26 @@
 """
 Endpoints de solicitudes para la API.
+
+- /mias, /mias/cambios, /mias/eventos (SSE) y / (crear): usuario
+  autenticado
+- /ranking y /admin/...: solo administradores (rol del JWT). La revisión
+  en lote aplica todas las decisiones en una transacción y devuelve un
+  resultado por decisión
 """
 
-from flask import request, g
+from flask import request, g, current_app
 from flask_restx import Namespace, Resource, fields
 
 from app import db
-from app.models import Solicitud, Mascota
-from app.routes.api.auth import jwt_required
+from app.archivo import obtener_solicitud
+from app.cambios import cambios_solicitudes
+from app.eventos import flujo_eventos
+from app.idempotencia import idempotente
+from app.models import Solicitud, Mascota, ConflictoSolicitud, RespuestasCuestionario
+from app.routes.api.auth import jwt_required, admin_jwt_required
+from app.routes.api.mascotas import mascota_model, PARAMS_CAMBIOS
+from app.routes.solicitudes import consultar_cola, PUNTUACION_ORDEN
+from app.serializacion import respuesta_json
 
 ns = Namespace("solicitudes", description="Solicitudes")
 
@@ -20,9 +33,57 @@ solicitud_model = ns.model('Solicitudes', {
     'estado': fields.String(required=True, description='pendiente/aprobada/rechazada'),
     'fecha_revision': fields.String(required=True, description='Fecha ISO de la revisión'),
     'comentarios_admin': fields.String(required=True, description='Comentarios del administrador'),
+    'puntuacion': fields.Float(description='Puntuación 0-100 del cuestionario'),
     'cuestionario': fields.Raw(required=True, description='Cuestionario')
 })
 
+solicitante_model = ns.model('Solicitante', {
+    'id': fields.Integer(description='ID del usuario'),
+    'email': fields.String(description='Email'),
+    'nombre': fields.String(description='Nombre'),
+    'apellidos': fields.String(description='Apellidos'),
+    'telefono': fields.String(description='Teléfono'),
+    'direccion': fields.String(description='Dirección')
+})
+
+solicitud_admin_model = ns.inherit('SolicitudAdmin', solicitud_model, {
+    'mascota': fields.Nested(mascota_model, description='Mascota solicitada'),
+    'usuario': fields.Nested(solicitante_model, description='Solicitante')
+})
+
+pagina_admin_model = ns.model('PaginaSolicitudesAdmin', {
+    'solicitudes': fields.List(fields.Nested(solicitud_admin_model)),
+    'siguiente': fields.String(description='Cursor de la página siguiente (null si no hay más)')
+})
+
+decision_model = ns.model('DecisionSolicitud', {
+    'id': fields.Integer(required=True, description='ID de la solicitud'),
+    'accion': fields.String(required=True, description='aprobar o rechazar'),
+    'comentario': fields.String(description='Comentario para el solicitante')
+})
+
+revision_lote_model = ns.model('RevisionLote', {
+    'decisiones': fields.List(fields.Nested(decision_model), required=True)
+})
+
+resultado_decision_model = ns.model('ResultadoDecision', {
+    'id': fields.Integer(description='ID de la solicitud'),
+    'ok': fields.Boolean(description='Si la decisión se aplicó'),
+    'estado': fields.String(description='Nuevo estado (si se aplicó)'),
+    'rechazadas_automaticamente': fields.Integer(description='Otras solicitudes rechazadas al aprobar'),
+    'error': fields.String(description='Motivo (si no se aplicó)')
+})
+
+resultado_lote_model = ns.model('ResultadoRevisionLote', {
+    'resultados': fields.List(fields.Nested(resultado_decision_model))
+})
+
+cambios_solicitudes_model = ns.model('CambiosSolicitudes', {
+    'solicitudes': fields.List(fields.Nested(solicitud_model), description='Solicitudes nuevas o modificadas'),
+    'siguiente': fields.String(description='Marca para la próxima llamada (desde=)'),
+    'hay_mas': fields.Boolean(description='Si quedan cambios: volver a llamar con siguiente')
+})
+
 create_solicitud_model = ns.model('CrearSolicitud', {
     'mascota_id': fields.Integer(required=True, description='ID de la mascota'),
     'cuestionario': fields.Raw(description='Respuestas del cuestionario')
@@ -31,40 +92,178 @@ create_solicitud_model = ns.model('CrearSolicitud', {
 @ns.route("/mias")
 class MisSolicitudes(Resource):
     @jwt_required
-    @ns.marshal_list_with(solicitud_model)
+    @ns.response(200, 'Solicitudes del usuario', [solicitud_model])
     def get(self):
         """Devuelve las solicitudes del usuario actual"""
         query = Solicitud.query.filter_by(usuario_id=g.current_user.id)
 
         solicitudes = query.order_by(Solicitud.fecha_solicitud).all()
-        return [s.to_dict() for s in solicitudes]
+        # to_dict() ya tiene los campos de solicitud_model: sin marshal()
+        return respuesta_json([s.to_dict() for s in solicitudes])
+
+
+
+@ns.route("/mias/cambios")
+class MisSolicitudesCambios(Resource):
+    @jwt_required
+    @ns.doc(params=PARAMS_CAMBIOS)
+    @ns.response(200, 'Cambios posteriores a la marca', cambios_solicitudes_model)
+    @ns.response(400, 'Marca no válida')
+    def get(self):
+        """Solicitudes del usuario creadas o modificadas desde la última sincronización"""
+        config = current_app.config
+        limite = request.args.get('limite', config['CAMBIOS_POR_PAGINA'], type=int)
+
+        try:
+            cambios = cambios_solicitudes(
+                g.current_user.id, request.args.get('desde'),
+                max(1, min(limite, config['CAMBIOS_LIMITE_MAX']))
+            )
+        except ValueError:
+            return {'error': 'Marca "desde" no válida'}, 400
+
+        return respuesta_json(cambios)
+
+
+@ns.route("/mias/eventos")
+class MisSolicitudesEventos(Resource):
+    @jwt_required
+    @ns.doc(params={
+        'Last-Event-ID': {'in': 'header', 'description': 'Último evento recibido (reconexión)'},
+        'ultimo': 'Como Last-Event-ID, para la primera conexión'
+    })
+    @ns.response(200, 'Flujo text/event-stream: eventos "solicitud" con id, solicitud_id, estado y fecha')
+    def get(self):
+        """Cambios de estado de las solicitudes del usuario en tiempo real (Server-Sent Events)"""
+        return flujo_eventos(g.current_user.id)
+
 
-    
 @ns.route("/")
 class CrearSolicitud (Resource):
     @jwt_required
     @ns.expect(create_solicitud_model)
     @ns.response(201, 'Solicitud creada exitosamente', solicitud_model)
+    @ns.response(409, 'Mascota no disponible o solicitud duplicada')
+    @ns.response(422, 'Idempotency-Key ya usada con otra petición')
+    @ns.doc(params={'Idempotency-Key': {
+        'in': 'header',
+        'description': 'Clave única por intento; los reintentos con la misma clave devuelven la respuesta original'
+    }})
+    @idempotente
     def post(self):
         data = request.get_json()
 
         if not data or not data.get('mascota_id') or not data.get('cuestionario'):
             return {'error': 'Datos inválidos'}, 400
         
-        mascota = Mascota.query.get(data['mascota_id'])
+        mascota = db.session.get(Mascota, data['mascota_id'])
         if not mascota:
             return {'error': 'Mascota no encontrada'}, 404
-        
-        if mascota.estado != 'disponible':
-            return {'error': 'Mascota no disponible'}, 400
-        
-        solicitud = Solicitud(
-            usuario_id=g.current_user.id,
-            mascota_id=data['mascota_id'],
-            cuestionario=data['cuestionario']
-        )
-        db.session.add(solicitud)
-        db.session.commit()
+
+        # Reserva la mascota y crea la solicitud en un solo commit
+        try:
+            solicitud = Solicitud.crear(g.current_user.id, mascota.id, data['cuestionario'])
+        except ConflictoSolicitud as e:
+            return {'error': str(e)}, 409
+
         return solicitud.to_dict(), 201
         
     
+
+
+def con_relaciones(solicitud):
+    """Solicitud serializada con su mascota y su solicitante."""
+    datos = solicitud.to_dict()
+    datos['mascota'] = solicitud.mascota.to_dict()
+    datos['usuario'] = solicitud.usuario.to_dict()
+    return datos
+
+
+@ns.route("/ranking")
+class RankingSolicitudes(Resource):
+    @admin_jwt_required
+    @ns.doc(params={
+        'limite': 'Número de solicitudes (por defecto 20, máximo 100)',
+        'vivienda_tipo': 'casa, apartamento o finca',
+        'tiene_jardin': 'si/no',
+        'horas_solo': '0-4, 4-8, 8+ (varios separados por comas)',
+        'compromiso_gastos': 'si/no'
+    })
+    @ns.response(200, 'Solicitudes pendientes', [solicitud_model])
+    @ns.response(403, 'Solo administradores')
+    def get(self):
+        """Solicitudes pendientes ordenadas por puntuación, con filtros de cuestionario (solo admin)"""
+        limite = max(1, min(request.args.get('limite', 20, type=int), 100))
+
+        query = Solicitud.query.filter_by(estado='pendiente')
+        query, _ = RespuestasCuestionario.filtrar(query, request.args)
+
+        solicitudes = query\
+            .order_by(PUNTUACION_ORDEN.desc(), Solicitud.id.desc())\
+            .limit(limite)\
+            .all()
+        return respuesta_json([s.to_dict() for s in solicitudes])
+
+
+@ns.route("/admin")
+class SolicitudesAdmin(Resource):
+    @admin_jwt_required
+    @ns.doc(params={
+        'estado': 'pendiente (por defecto), aprobada, rechazada o todas',
+        'orden': 'fecha (por defecto) o puntuacion; siempre descendente',
+        'desde': 'Cursor devuelto en "siguiente" por la página anterior',
+        'limite': 'Tamaño de página (por defecto SOLICITUDES_POR_PAGINA, máximo 100)',
+        'vivienda_tipo': 'casa, apartamento o finca',
+        'tiene_jardin': 'si/no',
+        'horas_solo': '0-4, 4-8, 8+ (varios separados por comas)',
+        'compromiso_gastos': 'si/no'
+    })
+    @ns.response(403, 'Solo administradores')
+    @ns.marshal_with(pagina_admin_model)
+    def get(self):
+        """Cola de solicitudes paginada por cursor, con mascota y solicitante (solo admin)"""
+        limite = request.args.get('limite', current_app.config['SOLICITUDES_POR_PAGINA'], type=int)
+        cola = consultar_cola(request.args, max(1, min(limite, 100)))
+
+        return {
+            'solicitudes': [con_relaciones(s) for s in cola['solicitudes']],
+            'siguiente': cola['siguiente']
+        }
+
+
+@ns.route("/admin/<int:id>")
+class SolicitudAdmin(Resource):
+    @admin_jwt_required
+    @ns.response(403, 'Solo administradores')
+    @ns.response(404, 'Solicitud no encontrada')
+    @ns.marshal_with(solicitud_admin_model)
+    def get(self, id):
+        """Detalle de una solicitud con su mascota y su solicitante, también archivada (solo admin)"""
+        solicitud = obtener_solicitud(id)
+        if not solicitud:
+            ns.abort(404, 'Solicitud no encontrada')
+        return con_relaciones(solicitud)
+
+
+@ns.route("/admin/revisar")
+class RevisarSolicitudes(Resource):
+    @admin_jwt_required
+    @ns.expect(revision_lote_model)
+    @ns.response(200, 'Resultado de cada decisión', resultado_lote_model)
+    @ns.response(400, 'Datos inválidos')
+    @ns.response(403, 'Solo administradores')
+    def post(self):
+        """Aprueba o rechaza varias solicitudes en una transacción (solo admin)"""
+        data = request.get_json(silent=True) or {}
+        decisiones = data.get('decisiones')
+
+        if not isinstance(decisiones, list) or not decisiones \
+                or not all(isinstance(d, dict) for d in decisiones):
+            return {'error': 'Datos inválidos'}, 400
+
+        maximo = current_app.config['SOLICITUDES_REVISION_LOTE_MAX']
+        if len(decisiones) > maximo:
+            return {'error': f'Máximo {maximo} decisiones por llamada'}, 400
+
+        resultados = Solicitud.revisar_lote(g.current_user.id, decisiones)
+        return {'resultados': resultados}, 200
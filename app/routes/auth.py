@@ -8,8 +8,10 @@ de usuarios en el sistema.
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
-from app import db, oauth
+from app import db
+from app.oidc import cliente_google
 from app.models import Usuario
+from app.ratelimit import limitar
 
 
 # Crear blueprint
@@ -87,6 +89,8 @@ def registro():
 
 
 @bp.route('/login', methods=['GET', 'POST'])
+@limitar('login_ip')
+@limitar('login_cuenta', clave=lambda: request.form.get('email'))
 def login():
     """
     Ruta de inicio de sesión.
@@ -159,12 +163,12 @@ def logout():
 def google_login():
     """Inicia el flujo OAuth con Google"""
     redirect_uri = url_for('auth.google_callback', _external=True)
-    return oauth.google.authorize_redirect(redirect_uri)
+    return cliente_google().authorize_redirect(redirect_uri)
 
 @bp.route('/google/callback')
 def google_callback():
     """Callback de Google OAuth"""
-    token = oauth.google.authorize_access_token()
+    token = cliente_google().authorize_access_token()
     user_info = token.get('userinfo')
 
     if not user_info:
@@ -10,7 +10,7 @@ Este módulo maneja:
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app import db
-from app.models import Mascota
+from app.models import Mascota, SolicitudArchivada
 from app.decorators import admin_required
 from app.s3 import upload_to_s3, delete_from_s3
 
@@ -345,8 +345,11 @@ def admin_eliminar(mascota_id):
     # Obtener la mascota
     mascota = Mascota.query.get_or_404(mascota_id)
 
-    # Verificar si tiene solicitudes asociadas
-    if mascota.solicitudes.count() > 0:
+    # Verificar si tiene solicitudes asociadas (también archivadas)
+    archivadas = db.session.query(
+        SolicitudArchivada.query.filter_by(mascota_id=mascota_id).exists()
+    ).scalar()
+    if mascota.solicitudes.count() > 0 or archivadas:
         flash(f'No se puede eliminar "{mascota.nombre}" porque tiene solicitudes de adopción asociadas.', 'danger')
         return redirect(url_for('mascotas.admin_lista'))
 
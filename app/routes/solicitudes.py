@@ -3,19 +3,47 @@ Blueprint de rutas para la gestión de solicitudes de adopción.
 
 Este módulo maneja:
 - Creación de solicitudes con cuestionario (usuarios autenticados)
-- Visualización de solicitudes del usuario
+- Visualización de solicitudes del usuario (con avisos en tiempo real
+  por SSE, ver app/eventos.py)
 - Panel de administración para revisar solicitudes
 - Aprobación/rechazo de solicitudes (solo admin)
 """
 
+import click
 from app.decorators import admin_required
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from datetime import datetime
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort
 from flask_login import login_required, current_user
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Solicitud, Mascota
+from app.archivo import obtener_solicitud
+from app.cache import conteos_solicitudes
+from app.eventos import flujo_eventos, ultimo_evento
+from app.models import Solicitud, Mascota, ConflictoSolicitud, RespuestasCuestionario
 
-# Crear blueprint
-bp = Blueprint('solicitudes', __name__, url_prefix='/solicitudes')
+ESTADOS_SOLICITUD = ('pendiente', 'aprobada', 'rechazada')
+
+# Puntuación para ordenar: las solicitudes sin puntuar (-1) van al final
+# también en PostgreSQL, que en orden descendente pone los NULL primero
+PUNTUACION_ORDEN = db.func.coalesce(Solicitud.puntuacion, -1)
+
+# Columnas por las que se puede ordenar la cola del panel admin
+ORDENES_COLA = {
+    'fecha': Solicitud.fecha_solicitud,
+    'puntuacion': PUNTUACION_ORDEN
+}
+
+# Crear blueprint (cli_group=None: los comandos son `flask <comando>`)
+bp = Blueprint('solicitudes', __name__, url_prefix='/solicitudes', cli_group=None)
+
+
+@bp.cli.command('rellenar-respuestas')
+@click.option('--lote', default=1000, help='Solicitudes por INSERT')
+def rellenar_respuestas_command(lote):
+    """Crea las respuestas tipadas de las solicitudes que no las tienen."""
+    total = RespuestasCuestionario.rellenar(lote=lote)
+    click.echo(f'{total} solicitudes con respuestas tipadas nuevas')
 
 
 @bp.route('/nueva/<int:mascota_id>', methods=['GET', 'POST'])
@@ -65,19 +93,12 @@ def nueva(mascota_id):
             'referencias': request.form.get('referencias', '')
         }
 
-        # Crear la solicitud
-        solicitud = Solicitud(
-            usuario_id=current_user.id,
-            mascota_id=mascota_id,
-            cuestionario=cuestionario
-        )
-
-        db.session.add(solicitud)
-
-        # Marcar la mascota como "en proceso"
-        mascota.marcar_en_proceso()
-
-        db.session.commit()
+        # Crear la solicitud y marcar la mascota "en proceso" (atómico)
+        try:
+            Solicitud.crear(current_user.id, mascota_id, cuestionario)
+        except ConflictoSolicitud as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('mascotas.detalle', mascota_id=mascota_id))
 
         flash(f'¡Solicitud enviada con éxito para {mascota.nombre}! Revisaremos tu solicitud pronto.', 'success')
         return redirect(url_for('solicitudes.mis_solicitudes'))
@@ -93,12 +114,32 @@ def mis_solicitudes():
 
     Muestra todas las solicitudes creadas por el usuario
     con su estado actual (pendiente, aprobada, rechazada).
+    Solo con alguna pendiente se abre el flujo SSE (las revisadas ya no
+    cambian), desde el último evento que refleja la página.
     """
+    # joinedload: la plantilla muestra datos de la mascota de cada fila
     solicitudes = Solicitud.query.filter_by(usuario_id=current_user.id)\
+        .options(joinedload(Solicitud.mascota))\
         .order_by(Solicitud.fecha_solicitud.desc())\
         .all()
 
-    return render_template('solicitudes/mis_solicitudes.html', solicitudes=solicitudes)
+    ultimo = None
+    if any(s.estado == 'pendiente' for s in solicitudes):
+        ultimo = ultimo_evento(current_user.id)
+
+    return render_template('solicitudes/mis_solicitudes.html', solicitudes=solicitudes, ultimo_evento=ultimo)
+
+
+@bp.route('/mis-solicitudes/eventos')
+@login_required
+def mis_solicitudes_eventos():
+    """
+    Flujo SSE con los cambios de estado de las solicitudes del usuario.
+
+    Lo abre mis_solicitudes.html con EventSource para recargar la página
+    cuando se revisa una solicitud, sin sondeos periódicos.
+    """
+    return flujo_eventos(current_user.id)
 
 
 @bp.route('/detalle/<int:solicitud_id>')
@@ -107,13 +148,17 @@ def detalle(solicitud_id):
     """
     Ver detalle de una solicitud específica.
 
-    Muestra el cuestionario completo y el estado.
+    Muestra el cuestionario completo y el estado, también de las
+    solicitudes ya archivadas (ver app/archivo.py).
     Solo el usuario que creó la solicitud o admin pueden verla.
 
     Args:
         solicitud_id (int): ID de la solicitud
     """
-    solicitud = Solicitud.query.get_or_404(solicitud_id)
+    # Si ya no está en solicitudes, se busca en el archivo
+    solicitud = obtener_solicitud(solicitud_id)
+    if solicitud is None:
+        abort(404)
 
     # Verificar permisos: solo el dueño o admin pueden ver
     if not current_user.is_admin() and solicitud.usuario_id != current_user.id:
@@ -131,28 +176,131 @@ def detalle(solicitud_id):
 @admin_required
 def admin_lista():
     """
-    Panel de administración: lista de todas las solicitudes.
-
-    Muestra todas las solicitudes con filtro por estado.
+    Panel de administración: cola de solicitudes paginada.
+
+    Por defecto muestra las pendientes; ?estado=todas muestra todas.
+    Admite filtros por respuestas del cuestionario (tiene_jardin=si,
+    horas_solo=0-4...), resueltos con los índices de RespuestasCuestionario.
+    Se ordena por fecha o, con ?orden=puntuacion, por la puntuación del
+    cuestionario (mejores candidatos primero).
+    Usa paginación por cursor (keyset) sobre (fecha_solicitud, id) o
+    (puntuacion, id): cada página continúa desde la última fila de la
+    anterior, así que el coste no crece con el número de página como
+    con OFFSET.
     Solo accesible para administradores.
     """
 
-    # Obtener filtro de estado si existe
-    estado_filtro = request.args.get('estado', '')
+    cola = consultar_cola(request.args, current_app.config['SOLICITUDES_POR_PAGINA'])
+
+    return render_template('solicitudes/admin/lista.html',
+                         conteos=conteos_solicitudes(),
+                         **cola)
+
+
+def consultar_cola(args, por_pagina):
+    """
+    Página de la cola de solicitudes (panel admin y API de revisión).
 
-    # Query base
-    query = Solicitud.query
+    Args:
+        args: Parámetros de la petición (estado, orden, desde y filtros
+              de cuestionario)
+        por_pagina (int): Tamaño de la página
+
+    Returns:
+        dict: solicitudes (con mascota y usuario cargados), estado_filtro,
+              orden, filtros, cursor (el recibido, si es válido) y
+              siguiente (cursor de la página siguiente o None)
+    """
 
-    # Aplicar filtro de estado si existe
-    if estado_filtro:
-        query = query.filter_by(estado=estado_filtro)
+    # Filtro de estado: pendientes por defecto
+    estado_filtro = args.get('estado', 'pendiente')
+    if estado_filtro not in ESTADOS_SOLICITUD and estado_filtro != 'todas':
+        estado_filtro = 'pendiente'
 
-    # Ordenar por fecha (más recientes primero)
-    solicitudes = query.order_by(Solicitud.fecha_solicitud.desc()).all()
+    orden = args.get('orden', 'fecha')
+    if orden not in ORDENES_COLA:
+        orden = 'fecha'
 
-    return render_template('solicitudes/admin/lista.html',
-                         solicitudes=solicitudes,
-                         estado_filtro=estado_filtro)
+    cursor = decodificar_cursor(args.get('desde'), orden)
+
+    # Query base: mascota y solicitante en la misma query (evita N+1)
+    query = Solicitud.query.options(
+        joinedload(Solicitud.mascota),
+        joinedload(Solicitud.usuario)
+    )
+
+    if estado_filtro != 'todas':
+        query = query.filter(Solicitud.estado == estado_filtro)
+
+    query, filtros = RespuestasCuestionario.filtrar(query, args)
+
+    # Continuar tras la última solicitud de la página anterior
+    columna = ORDENES_COLA[orden]
+    if cursor:
+        valor, ultimo_id = cursor
+        query = query.filter(or_(
+            columna < valor,
+            and_(columna == valor, Solicitud.id < ultimo_id)
+        ))
+
+    # Más recientes (o mejor puntuadas) primero; una fila extra indica si hay más
+    solicitudes = query.order_by(columna.desc(), Solicitud.id.desc())\
+        .limit(por_pagina + 1)\
+        .all()
+
+    siguiente = None
+    if len(solicitudes) > por_pagina:
+        solicitudes = solicitudes[:por_pagina]
+        siguiente = codificar_cursor(solicitudes[-1], orden)
+
+    return {
+        'solicitudes': solicitudes,
+        'estado_filtro': estado_filtro,
+        'orden': orden,
+        'filtros': filtros,
+        'cursor': args.get('desde') if cursor else None,
+        'siguiente': siguiente
+    }
+
+
+def codificar_cursor(solicitud, orden='fecha'):
+    """
+    Cursor de paginación que apunta a una solicitud.
+
+    Args:
+        solicitud (Solicitud): Última solicitud de la página
+        orden (str): 'fecha' o 'puntuacion'
+
+    Returns:
+        str: Cursor 'valor_id' (fecha ISO o puntuación; -1 sin puntuar)
+    """
+    if orden == 'puntuacion':
+        puntuacion = -1.0 if solicitud.puntuacion is None else solicitud.puntuacion
+        return f'{puntuacion!r}_{solicitud.id}'
+    return f'{solicitud.fecha_solicitud.isoformat()}_{solicitud.id}'
+
+
+def decodificar_cursor(cursor, orden='fecha'):
+    """
+    Convierte un cursor de paginación en (valor, id).
+
+    Args:
+        cursor (str): Cursor generado por codificar_cursor
+        orden (str): 'fecha' o 'puntuacion'
+
+    Returns:
+        tuple: (fecha o puntuación, id) o None si falta o no es válido
+    """
+    if not cursor:
+        return None
+
+    valor, _, solicitud_id = cursor.rpartition('_')
+    try:
+        if orden == 'puntuacion':
+            return float(valor), int(solicitud_id)
+        return datetime.fromisoformat(valor), int(solicitud_id)
+    except ValueError:
+        return None
 
 
 @bp.route('/admin/revisar/<int:solicitud_id>', methods=['GET', 'POST'])
@@ -170,15 +318,25 @@ def admin_revisar(solicitud_id):
         solicitud_id (int): ID de la solicitud
     """
 
-    solicitud = Solicitud.query.get_or_404(solicitud_id)
+    solicitud = Solicitud.query.options(
+        joinedload(Solicitud.mascota),
+        joinedload(Solicitud.usuario)
+    ).filter_by(id=solicitud_id).first_or_404()
 
     if request.method == 'POST':
         accion = request.form.get('accion')
         comentarios = request.form.get('comentarios', '')
 
         if accion == 'aprobar':
-            solicitud.aprobar(current_user.id, comentarios)
+            try:
+                rechazadas = solicitud.aprobar(current_user.id, comentarios)
+            except ValueError as e:
+                flash(str(e), 'warning')
+                return redirect(url_for('solicitudes.admin_lista'))
+
             flash(f'Solicitud aprobada. {solicitud.usuario.nombre} ha adoptado a {solicitud.mascota.nombre}.', 'success')
+            if rechazadas:
+                flash(f'Se han rechazado automáticamente {rechazadas} solicitudes pendientes de la misma mascota.', 'info')
         elif accion == 'rechazar':
             solicitud.rechazar(current_user.id, comentarios)
             flash(f'Solicitud rechazada.', 'info')
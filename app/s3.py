@@ -1,7 +1,27 @@
-import boto3
 import uuid
 from flask import current_app
 
+def cliente_s3():
+    """
+    Cliente de S3 de la app, creado en el primer uso.
+
+    boto3 tarda en importarse más que el resto de la app: solo se carga
+    cuando se sube o borra una foto. El cliente se reutiliza (es seguro
+    entre hilos) y se guarda en app.extensions['s3'].
+    """
+    cliente = current_app.extensions.get('s3')
+    if cliente is None:
+        import boto3
+
+        cliente = boto3.client(
+            's3',
+            aws_access_key_id=current_app.config['AWS_ACCESS_KEY_ID'],
+            aws_secret_access_key=current_app.config['AWS_SECRET_ACCESS_KEY'],
+            region_name=current_app.config['AWS_S3_REGION']
+        )
+        current_app.extensions['s3'] = cliente
+    return cliente
+
 def allowed_file(filename):
     """Verifica si la extensión del archivo está permitida."""
     return "." in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
@@ -15,12 +35,7 @@ def upload_to_s3(file):
     ext = file.filename.rsplit('.', 1)[1].lower()
     filename = f"mascotas/{uuid.uuid4().hex}.{ext}"
 
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=current_app.config['AWS_ACCESS_KEY_ID'],
-        aws_secret_access_key=current_app.config['AWS_SECRET_ACCESS_KEY'],
-        region_name=current_app.config['AWS_S3_REGION']
-    )
+    s3 = cliente_s3()
 
     s3.upload_fileobj(
         file,
@@ -40,12 +55,7 @@ def delete_from_s3(url):
 
     key = url.split('.amazonaws.com/')[1]
 
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=current_app.config['AWS_ACCESS_KEY_ID'],
-        aws_secret_access_key=current_app.config['AWS_SECRET_ACCESS_KEY'],
-        region_name=current_app.config['AWS_S3_REGION']
-    )
+    s3 = cliente_s3()
 
     s3.delete_object(
         Bucket=current_app.config['AWS_S3_BUCKET'],
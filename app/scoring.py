@@ -0,0 +1,177 @@
+"""
+Puntuación de solicitudes según el cuestionario de adopción.
+
+Las reglas se configuran en SCORING_REGLAS (config.py) como
+{campo: {respuesta: puntos}}. La puntuación de una solicitud es la suma
+de los puntos de sus respuestas, normalizada a 0-100 sobre el máximo
+posible con las reglas actuales.
+
+- puntuar: calcula las puntuaciones de muchos cuestionarios a la vez,
+  con operaciones vectorizadas de NumPy (una pasada por regla, no por
+  solicitud)
+- puntuar_solicitud: puntúa una solicitud nueva al insertarla (listener
+  en app/models.py), así que la puntuación queda cacheada en la fila
+- actualizar_puntuaciones: recalcula en una pasada las solicitudes sin
+  puntuar o puntuadas con otras reglas (versión distinta). Si las reglas
+  no cambian, no hay nada que recalcular
+
+Uso:
+    flask puntuar-solicitudes           # solo las desactualizadas
+    flask puntuar-solicitudes --todas   # recalcular todas
+"""
+
+import hashlib
+import json
+
+import click
+from flask import current_app
+
+# Respuestas de texto equivalentes a sí/no (formulario web y API)
+RESPUESTAS_SI = {'si', 'sí', 'true', '1'}
+RESPUESTAS_NO = {'no', 'false', '0'}
+
+
+def normalizar_respuesta(valor):
+    """
+    Normaliza una respuesta del cuestionario para compararla con las reglas.
+
+    Args:
+        valor: Respuesta tal como está en cuestionario_json
+
+    Returns:
+        bool para respuestas sí/no, str en minúsculas para el resto
+    """
+    if isinstance(valor, str):
+        texto = valor.strip().lower()
+        if texto in RESPUESTAS_SI:
+            return True
+        if texto in RESPUESTAS_NO:
+            return False
+        return texto
+    return valor
+
+
+def reglas_actuales():
+    """Reglas de puntuación de la app (SCORING_REGLAS)."""
+    return current_app.config['SCORING_REGLAS']
+
+
+def version_reglas(reglas):
+    """
+    Huella corta de unas reglas, para saber si una puntuación está al día.
+
+    Args:
+        reglas (dict): {campo: {respuesta: puntos}}
+
+    Returns:
+        str: 16 caracteres hexadecimales
+    """
+    canonicas = {
+        campo: sorted((str(respuesta), puntos) for respuesta, puntos in valores.items())
+        for campo, valores in reglas.items()
+    }
+    texto = json.dumps(canonicas, sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()[:16]
+
+
+def puntuar(cuestionarios, reglas):
+    """
+    Puntúa una lista de cuestionarios en una sola pasada vectorizada.
+
+    Args:
+        cuestionarios (list): Diccionarios de respuestas
+        reglas (dict): {campo: {respuesta: puntos}}
+
+    Returns:
+        numpy.ndarray: Puntuación 0-100 de cada cuestionario (mismo orden)
+    """
+    # NumPy se carga con la primera puntuación, no al arrancar el worker
+    import numpy as np
+
+    total = np.zeros(len(cuestionarios))
+    maximo = 0
+
+    for campo, valores in reglas.items():
+        columna = np.array(
+            [normalizar_respuesta((c or {}).get(campo)) for c in cuestionarios],
+            dtype=object
+        )
+        for respuesta, puntos in valores.items():
+            total += np.where(columna == normalizar_respuesta(respuesta), puntos, 0)
+        maximo += max(valores.values(), default=0)
+
+    if maximo <= 0:
+        return total
+    return np.round(total * 100 / maximo, 1)
+
+
+def puntuar_solicitud(solicitud):
+    """
+    Asigna puntuación y versión de reglas a una solicitud (sin guardar).
+
+    Args:
+        solicitud (Solicitud): Solicitud a puntuar
+    """
+    reglas = reglas_actuales()
+    solicitud.puntuacion = float(puntuar([solicitud.cuestionario_json], reglas)[0])
+    solicitud.puntuacion_version = version_reglas(reglas)
+
+
+def actualizar_puntuaciones(todas=False):
+    """
+    Puntúa las solicitudes que lo necesitan y guarda el resultado.
+
+    Se recalculan las pendientes puntuadas con otras reglas y cualquier
+    solicitud sin puntuar. Las ya revisadas conservan la puntuación que
+    tenían al revisarse aunque cambien las reglas.
+
+    Args:
+        todas (bool): Recalcular todas las solicitudes
+
+    Returns:
+        int: Número de solicitudes puntuadas
+    """
+    from app import db
+    from app.models import Solicitud
+
+    reglas = reglas_actuales()
+    version = version_reglas(reglas)
+
+    query = db.session.query(Solicitud.id, Solicitud.cuestionario_json)
+    if not todas:
+        query = query.filter(db.or_(
+            Solicitud.puntuacion.is_(None),
+            db.and_(Solicitud.estado == 'pendiente', Solicitud.puntuacion_version != version)
+        ))
+
+    filas = query.all()
+    if not filas:
+        return 0
+
+    puntuaciones = puntuar([cuestionario for _, cuestionario in filas], reglas)
+
+    # UPDATE por clave primaria en lote (executemany)
+    db.session.execute(db.update(Solicitud), [
+        {'id': solicitud_id, 'puntuacion': float(puntuacion), 'puntuacion_version': version}
+        for (solicitud_id, _), puntuacion in zip(filas, puntuaciones)
+    ])
+    db.session.commit()
+    return len(filas)
+
+
+@click.command('puntuar-solicitudes')
+@click.option('--todas', is_flag=True, help='Recalcular también las que están al día')
+def puntuar_solicitudes_command(todas):
+    """Puntúa las solicitudes según SCORING_REGLAS."""
+    total = actualizar_puntuaciones(todas=todas)
+    click.echo(f'{total} solicitudes puntuadas (reglas {version_reglas(reglas_actuales())})')
+
+
+def init_scoring(app):
+    """
+    Registra el comando `flask puntuar-solicitudes`.
+
+    Args:
+        app: Instancia de Flask
+    """
+    app.cli.add_command(puntuar_solicitudes_command)
@@ -0,0 +1,204 @@
+"""
+Serialización rápida de respuestas de la API.
+
+La ruta habitual construye cada fila dos veces: to_dict() y después
+marshal() de flask-restx, que vuelve a recorrer todos los campos. Aquí
+cada modelo y conjunto de campos tiene un serializador precalculado
+(qué columnas son fechas) que convierte las filas de una query
+proyectada en dicts en una sola pasada, y la respuesta se codifica con
+orjson si está instalado (si no, con el JSON de Flask).
+
+Los modelos de flask-restx se siguen usando para documentar las
+respuestas en Swagger (@ns.response).
+
+- serializador: serializador cacheado por modelo y campos
+- respuesta_json: Response JSON con el codificador más rápido disponible
+
+Uso:
+    flask benchmark-serializacion --filas 500 --repeticiones 20
+"""
+
+import json
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import click
+from flask import current_app
+from sqlalchemy import Date, DateTime
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa el JSON de Flask
+    orjson = None
+
+
+class SerializadorFilas:
+    """
+    Convierte filas (tuplas en el orden de los campos) en dicts.
+
+    Attributes:
+        campos (tuple): Nombres de los campos, en el orden de la fila
+    """
+
+    def __init__(self, campos, columnas):
+        """
+        Constructor del serializador.
+
+        Args:
+            campos (tuple): Nombres de los campos
+            columnas (list): Columnas SQLAlchemy de esos campos (mismo orden)
+        """
+        self.campos = tuple(campos)
+        # Posiciones que hay que pasar a ISO 8601 (como hace to_dict)
+        self._fechas = tuple(
+            i for i, columna in enumerate(columnas)
+            if isinstance(columna.type, (Date, DateTime))
+        )
+
+    def fila(self, fila):
+        """
+        Serializa una fila.
+
+        Args:
+            fila: Row de SQLAlchemy o tupla con los valores de los campos
+
+        Returns:
+            dict: {campo: valor}
+        """
+        if not self._fechas:
+            return dict(zip(self.campos, fila))
+
+        valores = list(fila)
+        for i in self._fechas:
+            if valores[i] is not None:
+                valores[i] = valores[i].isoformat()
+        return dict(zip(self.campos, valores))
+
+    def filas(self, filas):
+        """Serializa una lista de filas."""
+        return [self.fila(f) for f in filas]
+
+
+@lru_cache(maxsize=64)
+def serializador(modelo, campos):
+    """
+    Serializador precalculado para unos campos de un modelo.
+
+    Args:
+        modelo: Clase del modelo SQLAlchemy (p.ej. Mascota)
+        campos (tuple): Campos a serializar (columnas del modelo)
+
+    Returns:
+        SerializadorFilas
+    """
+    tabla = modelo.__table__
+    return SerializadorFilas(campos, [tabla.c[campo] for campo in campos])
+
+
+def codificar(datos):
+    """
+    Codifica datos a JSON (bytes) con orjson o, si no está, con Flask.
+
+    Args:
+        datos: dict o list serializable
+
+    Returns:
+        bytes: Documento JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(datos)
+    return current_app.json.dumps(datos).encode()
+
+
+def respuesta_json(datos, codigo=200):
+    """
+    Response JSON sin pasar por marshal() de flask-restx.
+
+    Args:
+        datos: dict o list serializable
+        codigo (int): Código HTTP
+
+    Returns:
+        flask.Response
+    """
+    return current_app.response_class(codificar(datos), status=codigo, mimetype='application/json')
+
+
+def _tiempo(funcion, repeticiones):
+    """Mejor tiempo (segundos) de varias ejecuciones de funcion()."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def comparar_serializacion(filas=500, repeticiones=20):
+    """
+    Microbenchmark: to_dict() + marshal() + json frente al serializador.
+
+    Usa mascotas en memoria (sin BD) para medir solo la serialización
+    de una respuesta de /api/mascotas/ con todos los campos.
+
+    Args:
+        filas (int): Mascotas por respuesta
+        repeticiones (int): Repeticiones (se toma la mejor)
+
+    Returns:
+        dict: Segundos por respuesta de cada ruta y codificador usado
+    """
+    from flask_restx import marshal
+
+    from app.models import Mascota
+    from app.routes.api.mascotas import CAMPOS_MASCOTA, mascota_model
+
+    ahora = datetime.utcnow()
+    mascotas = []
+    for i in range(filas):
+        mascota = Mascota(
+            nombre=f'Mascota {i}', especie='Perro', descripcion='Descripción de prueba ' * 10,
+            raza='Mestizo', edad_aprox=i % 15, sexo='Macho', tamano='Mediano',
+            foto_url=f'https://example.com/{i}.jpg', vacunado=True, esterilizado=False
+        )
+        mascota.id = i + 1
+        mascota.estado = 'disponible'
+        mascota.fecha_ingreso = ahora
+        mascotas.append(mascota)
+
+    tuplas = [tuple(getattr(m, campo) for campo in CAMPOS_MASCOTA) for m in mascotas]
+    rapido = serializador(Mascota, CAMPOS_MASCOTA)
+
+    def actual():
+        return json.dumps(marshal([m.to_dict() for m in mascotas], mascota_model))
+
+    def nuevo():
+        return codificar(rapido.filas(tuplas))
+
+    return {
+        'actual': _tiempo(actual, repeticiones),
+        'rapido': _tiempo(nuevo, repeticiones),
+        'codificador': 'orjson' if orjson is not None else 'json'
+    }
+
+
+@click.command('benchmark-serializacion')
+@click.option('--filas', default=500, help='Mascotas por respuesta')
+@click.option('--repeticiones', default=20, help='Repeticiones (se toma la mejor)')
+def benchmark_serializacion_command(filas, repeticiones):
+    """Compara la serialización actual de la API con el serializador rápido."""
+    resultado = comparar_serializacion(filas, repeticiones)
+    click.echo(f"to_dict + marshal + json: {resultado['actual'] * 1000:.2f} ms")
+    click.echo(f"serializador + {resultado['codificador']}: {resultado['rapido'] * 1000:.2f} ms")
+    click.echo(f"{resultado['actual'] / resultado['rapido']:.1f}x más rápido")
+
+
+def init_serializacion(app):
+    """
+    Registra el comando `flask benchmark-serializacion`.
+
+    Args:
+        app: Instancia de Flask
+    """
+    app.cli.add_command(benchmark_serializacion_command)
@@ -0,0 +1,21 @@
+"""
+Punto de entrada ASGI de la aplicación.
+
+La lista y el detalle de mascotas de la API se atienden con vistas async
+y el resto de rutas con la app Flask en un pool de hilos (ver
+app/asincrono.py).
+
+Uso:
+    GUNICORN_WORKER_CLASS=uvicorn gunicorn --config gunicorn.conf.py
+    gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+    uvicorn asgi:app --port 5000
+"""
+
+import os
+from app import create_app
+from app.asincrono import AppASGI
+
+# Obtener el entorno desde variable de entorno (development por defecto)
+config_name = os.environ.get("FLASK_ENV") or "development"
+
+app = AppASGI(create_app(config_name))
@@ -12,6 +12,7 @@ Uso:
 """
 
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Cargar variables de entorno desde .env
@@ -33,6 +34,19 @@ class Config:
     # Google OAuth
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
+    GOOGLE_DISCOVERY_URL = 'https://accounts.google.com/.well-known/openid-configuration'
+
+    # OpenID: Caché de discovery y JWKS (memoria + disco) y pool HTTP
+    OIDC_CACHE_DIR = os.environ.get('OIDC_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'adopciones_oidc')
+    OIDC_CACHE_TTL_SECONDS = 24 * 3600
+    OIDC_JWKS_TTL_SECONDS = 3600
+    OIDC_HTTP_POOL_SIZE = 10
+    OIDC_HTTP_TIMEOUT = 5
+
+    # OpenID: Proveedor local sin red en lugar de Google (tests, benchmarks).
+    # Firma un ID token para cualquier email: solo en desarrollo y tests
+    OIDC_LOCAL_PROVIDER = False
+    OIDC_LOCAL_EMAIL = 'oidc.local@example.com'
 
     # AWS S3
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
@@ -42,7 +56,122 @@ class Config:
 
     # JWT (API REST)
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'dev-jwt-secret-key-cambiar-en-prod'
-    JWT_EXPIRATION_HOURS = 24
+    # JWT: Los access tokens duran poco; se renuevan con el refresh token
+    # en /api/auth/refresh sin volver a enviar la contraseña
+    JWT_ACCESS_EXPIRATION_MINUTES = int(os.environ.get('JWT_ACCESS_EXPIRATION_MINUTES') or 15)
+    JWT_REFRESH_EXPIRATION_DAYS = int(os.environ.get('JWT_REFRESH_EXPIRATION_DAYS') or 30)
+
+    # JWT: Caché LRU de la lista de tokens revocados (logout)
+    JWT_DENYLIST_CACHE_SIZE = 4096
+    JWT_DENYLIST_CACHE_SECONDS = 30
+
+    # JWT: Algoritmo de firma. 'HS256' usa JWT_SECRET_KEY; con 'RS256' o
+    # 'ES256' se firma con la clave privada y otros servicios pueden
+    # verificar los tokens solo con la clave pública (PEM)
+    JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM') or 'HS256'
+    JWT_PRIVATE_KEY = os.environ.get('JWT_PRIVATE_KEY')
+    JWT_PUBLIC_KEY = os.environ.get('JWT_PUBLIC_KEY')
+
+    # JWT: Cada cuántos segundos se refrescan los usuarios revocados desde la BD
+    JWT_REVOCATION_REFRESH_SECONDS = int(os.environ.get('JWT_REVOCATION_REFRESH_SECONDS') or 30)
+
+    # Caché de usuarios de sesión (Flask-Login), por worker
+    USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS') or 300)
+    USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE') or 1024)
+
+    # Panel admin de solicitudes: tamaño de página y caché de conteos por estado
+    SOLICITUDES_POR_PAGINA = 20
+    SOLICITUDES_CONTEOS_TTL_SECONDS = 30
+    # Máximo de decisiones por llamada a POST /api/solicitudes/admin/revisar
+    SOLICITUDES_REVISION_LOTE_MAX = 100
+
+    # GET /api/mascotas/batch: máximo de ids por llamada y max-age (segundos)
+    MASCOTAS_BATCH_MAX = 100
+    MASCOTAS_BATCH_MAX_AGE = 60
+
+    # Feed de cambios /cambios (ver app/cambios.py): solo se entregan las
+    # filas con más de CAMBIOS_MARGEN_SEGUNDOS (ya confirmadas). Es también
+    # la duración máxima de una transacción que escriba mascotas o solicitudes
+    CAMBIOS_MARGEN_SEGUNDOS = 5
+    CAMBIOS_POR_PAGINA = 100
+    CAMBIOS_LIMITE_MAX = 1000
+
+    # Puntuación de solicitudes (ver app/scoring.py): {campo: {respuesta: puntos}}
+    SCORING_REGLAS = {
+        'vivienda_tipo': {'casa': 10, 'finca': 10, 'apartamento': 5},
+        'vivienda_propia': {'propia': 10, 'alquilada': 5},
+        'tiene_jardin': {True: 10},
+        'horas_solo': {'0-4': 20, '4-8': 10, '8+': 0},
+        'emergencia_veterinaria': {'veterinario': 15, 'consulta': 5},
+        'compromiso_gastos': {True: 20},
+        'compromiso_tiempo': {True: 15}
+    }
+
+    # Notificaciones por email (ver app/notificaciones.py)
+    NOTIFICACIONES_ASYNC = True
+    NOTIFICACIONES_LOTE = 50
+    NOTIFICACIONES_INTERVALO_SEGUNDOS = 30
+    NOTIFICACIONES_MAX_INTENTOS = 5
+    NOTIFICACIONES_REINTENTO_SEGUNDOS = 60
+    # Los admins reciben el resumen diario (flask enviar-resumen) en lugar
+    # de un email por solicitud; True para recibir también el aviso inmediato
+    NOTIFICAR_ADMINS_NUEVA_SOLICITUD = os.environ.get('NOTIFICAR_ADMINS_NUEVA_SOLICITUD', 'false').lower() in ['true', 'on', '1']
+
+    # Eventos SSE del estado de las solicitudes (ver app/eventos.py)
+    # Backend 'memoria' (por worker) o 'postgres' (LISTEN/NOTIFY entre
+    # workers); sin valor, 'postgres' si la BD es PostgreSQL
+    EVENTOS_BACKEND = os.environ.get('EVENTOS_BACKEND')
+    EVENTOS_CANAL = 'eventos_solicitud'
+    EVENTOS_LATIDO_SEGUNDOS = 15
+    EVENTOS_DURACION_MAXIMA_SEGUNDOS = 300
+    EVENTOS_REINTENTO_MS = 3000
+    EVENTOS_RETENCION_HORAS = 24
+    # Flujos abiertos por worker: cada uno ocupa un hilo (GUNICORN_THREADS
+    # o ASGI_HILOS_WSGI) mientras dura. Por encima, 503 con Retry-After
+    EVENTOS_MAX_FLUJOS = int(os.environ.get('EVENTOS_MAX_FLUJOS') or 4)
+
+    # Ruta async de lectura de la API al desplegar como ASGI (ver
+    # app/asincrono.py). Sin URI async se deriva de SQLALCHEMY_DATABASE_URI
+    SQLALCHEMY_ASYNC_DATABASE_URI = os.environ.get('SQLALCHEMY_ASYNC_DATABASE_URI')
+    ASYNC_POOL_SIZE = 20
+    ASYNC_MAX_OVERFLOW = 10
+    # Hilos por worker para las rutas que siguen siendo WSGI
+    ASGI_HILOS_WSGI = int(os.environ.get('ASGI_HILOS_WSGI') or 8)
+
+    # Archivado de solicitudes resueltas (ver app/archivo.py)
+    ARCHIVO_SOLICITUDES_DIAS = 365
+    ARCHIVO_SOLICITUDES_LOTE = 1000
+
+    # Idempotency-Key en la API (ver app/idempotencia.py)
+    IDEMPOTENCIA_TTL_SEGUNDOS = 24 * 3600
+    IDEMPOTENCIA_RESERVA_SEGUNDOS = 120   # reserva 'en_curso': 4x el timeout de gunicorn
+    IDEMPOTENCIA_REINTENTO_SEGUNDOS = 1   # Retry-After del 409 con la clave en curso
+
+    # Compresión de respuestas (ver app/compresion.py)
+    COMPRESION_ACTIVA = True
+    COMPRESION_MINIMO_BYTES = 500
+    COMPRESION_NIVEL_GZIP = 6
+    COMPRESION_NIVEL_BROTLI = 5
+    COMPRESION_TIPOS = (
+        'text/html', 'text/css', 'text/plain', 'text/csv', 'application/json',
+        'application/javascript', 'text/javascript', 'image/svg+xml'
+    )
+    COMPRESION_CACHE_ENTRADAS = 256
+    COMPRESION_CACHE_TTL_SECONDS = 3600
+
+    # Rate limiting (ver app/ratelimit.py). Formato: 'N/second|minute|hour|day'
+    # Backend 'memoria' (por worker) o 'sql' (compartido entre workers)
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() in ['true', 'on', '1']
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND') or 'memoria'
+    RATELIMIT_MEMORY_MAX_KEYS = 100000
+    RATELIMIT_LOGIN_IP = '20/minute'
+    RATELIMIT_LOGIN_CUENTA = '5/minute'
+    RATELIMIT_API_IP = '300/minute'
+    RATELIMIT_API_USUARIO = '120/minute'
+
+    # Proxies de confianza delante de la app (X-Forwarded-For/-Proto).
+    # 0: se usa la IP de la conexión (desarrollo y tests)
+    PROXY_SALTOS = 0
 
     # SQLAlchemy: Desactivar tracking de modificaciones (ahorra memoria)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -50,6 +179,16 @@ class Config:
     # SQLAlchemy: Mostrar SQL queries en logs (útil para debugging)
     SQLALCHEMY_ECHO = False
 
+    # db.create_all() al arrancar (desarrollo y tests). En producción el
+    # esquema se crea con scripts_bd/ (las bases existentes se actualizan
+    # con 04_migracion.sql) y cada worker arranca antes sin él
+    CREAR_TABLAS = False
+
+    # Detector de N+1: avisa en el log si una petición repite la misma
+    # query SQL_N1_THRESHOLD veces o más (ver app/query_counter.py)
+    SQL_N1_DETECTION = False
+    SQL_N1_THRESHOLD = 5
+
     # Flask-Mail: Configuración de email
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
@@ -85,6 +224,15 @@ class DevelopmentConfig(Config):
     # Mostrar queries SQL en desarrollo para debugging
     SQLALCHEMY_ECHO = True
 
+    # Avisar de patrones N+1 en desarrollo
+    SQL_N1_DETECTION = True
+
+    # Crear las tablas que falten al arrancar
+    CREAR_TABLAS = True
+
+    # Login con Google contra el proveedor local (benchmarks sin red)
+    OIDC_LOCAL_PROVIDER = os.environ.get('OIDC_LOCAL_PROVIDER', 'false').lower() in ['true', 'on', '1']
+
 
 class ProductionConfig(Config):
     """
@@ -107,6 +255,9 @@ class ProductionConfig(Config):
     # En producción no mostrar queries SQL
     SQLALCHEMY_ECHO = False
 
+    # El proxy de Railway añade un salto a X-Forwarded-For
+    PROXY_SALTOS = int(os.environ.get('PROXY_SALTOS') or 1)
+
     # Validación: SECRET_KEY es obligatoria en producción
     @classmethod
     def init_app(cls, app):
@@ -148,6 +299,18 @@ class TestingConfig(Config):
     # Desactivar CSRF para tests
     WTF_CSRF_ENABLED = False
 
+    # Login con Google contra el proveedor local (sin red)
+    OIDC_LOCAL_PROVIDER = True
+
+    # Emails: sin hilo en segundo plano (se envían con procesar_lote)
+    NOTIFICACIONES_ASYNC = False
+
+    # Eventos SSE: broker en el propio proceso
+    EVENTOS_BACKEND = 'memoria'
+
+    # Crear las tablas al arrancar
+    CREAR_TABLAS = True
+
     # No mostrar queries SQL en tests (ruido en output)
     SQLALCHEMY_ECHO = False
 
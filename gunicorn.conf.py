@@ -0,0 +1,100 @@
+"""
+Configuración de gunicorn para producción.
+
+- preload_app: el maestro importa y crea la app una vez y los workers la
+  heredan con fork. El código y los datos que no cambian (módulos,
+  modelos, rutas, Swagger) se comparten en memoria (copy-on-write) y un
+  worker nuevo (max_requests) arranca sin volver a importar nada
+- post_fork: cada worker suelta las conexiones, clientes e hilos
+  heredados del maestro (reiniciar_tras_fork en app/arranque.py)
+- Workers según las CPUs: por defecto 2 * CPUs + 1 workers gthread con
+  run.py y GUNICORN_THREADS hilos cada uno (cada flujo SSE abierto ocupa
+  un hilo). Con GUNICORN_WORKER_CLASS=uvicorn, uno async (asgi.py) por
+  CPU: la lista y el detalle de mascotas no bloquean el worker, pero
+  todas las demás rutas comparten sus ASGI_HILOS_WSGI hilos (a2wsgi),
+  así que solo compensa si la mayoría del tráfico son esas lecturas
+- max_requests con jitter: los workers se reciclan poco a poco, no
+  todos a la vez
+
+Variables de entorno: PORT, WEB_CONCURRENCY (workers), GUNICORN_THREADS,
+GUNICORN_WORKER_CLASS ('uvicorn' o 'gthread'), GUNICORN_PRELOAD,
+GUNICORN_MAX_REQUESTS, GUNICORN_MAX_REQUESTS_JITTER.
+
+Uso:
+    gunicorn --config gunicorn.conf.py
+"""
+
+import os
+
+
+def cpus_disponibles():
+    """CPUs que puede usar el proceso (respeta los límites del contenedor)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def aplicacion_flask(server):
+    """
+    App Flask precargada por el maestro (None sin preload_app).
+
+    Args:
+        server: Arbiter de gunicorn
+
+    Returns:
+        Flask: La app (también cuando se sirve envuelta en AppASGI)
+    """
+    if not server.cfg.preload_app:
+        return None
+
+    from flask import Flask
+
+    aplicacion = server.app.wsgi()
+    return aplicacion if isinstance(aplicacion, Flask) else aplicacion.app
+
+
+CPUS = cpus_disponibles()
+
+# gthread salvo que se pida uvicorn: aunque esté instalado (requirements),
+# con uvicorn las rutas WSGI solo tienen ASGI_HILOS_WSGI hilos por worker
+tipo = os.environ.get('GUNICORN_WORKER_CLASS') or 'gthread'
+if tipo == 'uvicorn':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Un bucle de eventos por CPU; las rutas WSGI usan ASGI_HILOS_WSGI hilos
+    workers = CPUS
+else:
+    wsgi_app = 'run:app'
+    worker_class = 'gthread'
+    workers = 2 * CPUS + 1
+    threads = int(os.environ.get('GUNICORN_THREADS') or 8)
+
+workers = int(os.environ.get('WEB_CONCURRENCY') or workers)
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ['true', 'on', '1']
+
+# Reciclar workers (fugas de memoria) sin reiniciarlos todos a la vez
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 1000)
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER') or 100)
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    """Antes de crear los workers: el maestro cierra sus conexiones a la BD."""
+    app = aplicacion_flask(server)
+    if app is not None:
+        from app.arranque import liberar_conexiones
+        liberar_conexiones(app)
+
+
+def post_fork(server, worker):
+    """En cada worker nuevo: nada de conexiones, clientes ni hilos del maestro."""
+    app = aplicacion_flask(server)
+    if app is not None:
+        from app.arranque import reiniciar_tras_fork
+        reiniciar_tras_fork(app)
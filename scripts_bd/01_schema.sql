@@ -3,7 +3,18 @@
 -- ==================================================
 
 -- Eliminar tablas si existen (para desarrollo)
+DROP TABLE IF EXISTS eventos_solicitud CASCADE;
+DROP TABLE IF EXISTS resumenes_enviados CASCADE;
+DROP TABLE IF EXISTS notificaciones_fallidas CASCADE;
+DROP TABLE IF EXISTS notificaciones CASCADE;
+DROP TABLE IF EXISTS claves_idempotencia CASCADE;
+DROP TABLE IF EXISTS limites_tasa CASCADE;
+DROP TABLE IF EXISTS tokens_revocados CASCADE;
+DROP TABLE IF EXISTS tokens_refresco CASCADE;
+DROP TABLE IF EXISTS solicitudes_archivadas CASCADE;
+DROP TABLE IF EXISTS respuestas_cuestionario CASCADE;
 DROP TABLE IF EXISTS solicitudes CASCADE;
+DROP TABLE IF EXISTS mascotas_eliminadas CASCADE;
 DROP TABLE IF EXISTS mascotas CASCADE;
 DROP TABLE IF EXISTS usuarios CASCADE;
 
@@ -21,7 +32,8 @@ CREATE TABLE usuarios (
     fecha_registro TIMESTAMP NOT NULL DEFAULT NOW(),
     activo BOOLEAN NOT NULL DEFAULT TRUE,
     oauth_provider VARCHAR(20),
-    oauth_id VARCHAR(100) UNIQUE
+    oauth_id VARCHAR(100) UNIQUE,
+    token_version INTEGER NOT NULL DEFAULT 0
 );
 
 -- Índices para mejorar rendimiento
@@ -43,12 +55,24 @@ CREATE TABLE mascotas (
     foto_url VARCHAR(255),
     fecha_ingreso TIMESTAMP NOT NULL DEFAULT NOW(),
     vacunado BOOLEAN NOT NULL DEFAULT FALSE,
-    esterilizado BOOLEAN NOT NULL DEFAULT FALSE
+    esterilizado BOOLEAN NOT NULL DEFAULT FALSE,
+    -- Último cambio (feed /api/mascotas/cambios; la app la actualiza en cada UPDATE)
+    fecha_actualizacion TIMESTAMP NOT NULL DEFAULT NOW()
 );
 
 -- Índices
 CREATE INDEX idx_mascotas_estado ON mascotas(estado);
 CREATE INDEX idx_mascotas_especie ON mascotas(especie);
+-- Feed de cambios: filas posteriores a una marca (fecha_actualizacion, id)
+CREATE INDEX idx_mascotas_actualizacion ON mascotas(fecha_actualizacion, id);
+
+-- TABLA: mascotas_eliminadas (marcas de borrado para el feed de cambios)
+CREATE TABLE mascotas_eliminadas (
+    id INTEGER PRIMARY KEY,
+    fecha_eliminacion TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_mascotas_eliminadas_fecha ON mascotas_eliminadas(fecha_eliminacion, id);
 
 -- TABLA: solicitudes
 CREATE TABLE solicitudes (
@@ -62,6 +86,11 @@ CREATE TABLE solicitudes (
     comentarios_admin TEXT,
     fecha_revision TIMESTAMP,
     revisado_por INTEGER REFERENCES usuarios(id),
+    -- Puntuación del cuestionario (0-100) y versión de las reglas usadas
+    puntuacion DOUBLE PRECISION,
+    puntuacion_version VARCHAR(16),
+    -- Último cambio (feed /api/solicitudes/mias/cambios)
+    fecha_actualizacion TIMESTAMP NOT NULL DEFAULT NOW(),
 
     -- Un usuario no puede solicitar la misma mascota dos veces
     CONSTRAINT unique_usuario_mascota UNIQUE (usuario_id, mascota_id)
@@ -71,10 +100,148 @@ CREATE TABLE solicitudes (
 CREATE INDEX idx_solicitudes_usuario ON solicitudes(usuario_id);
 CREATE INDEX idx_solicitudes_mascota ON solicitudes(mascota_id);
 CREATE INDEX idx_solicitudes_estado ON solicitudes(estado);
+-- Cola del panel admin: filtro por estado + paginación por (fecha, id)
+CREATE INDEX idx_solicitudes_estado_fecha ON solicitudes(estado, fecha_solicitud, id);
+-- Cola del panel admin ordenada por puntuación
+CREATE INDEX idx_solicitudes_estado_puntuacion ON solicitudes(estado, COALESCE(puntuacion, -1), id);
+-- Feed de cambios de /mias: solicitudes de un usuario tras una marca
+CREATE INDEX idx_solicitudes_usuario_actualizacion ON solicitudes(usuario_id, fecha_actualizacion, id);
+-- Búsquedas por cualquier clave del cuestionario (@>, ?)
+CREATE INDEX idx_solicitudes_cuestionario ON solicitudes USING GIN (cuestionario_json jsonb_path_ops);
+
+-- TABLA: respuestas_cuestionario (respuestas conocidas del cuestionario, tipadas)
+CREATE TABLE respuestas_cuestionario (
+    solicitud_id INTEGER PRIMARY KEY REFERENCES solicitudes(id) ON DELETE CASCADE,
+    vivienda_tipo VARCHAR(20),
+    vivienda_propia VARCHAR(20),
+    tiene_jardin BOOLEAN,
+    tiene_mascotas BOOLEAN,
+    horas_solo VARCHAR(3) CHECK (horas_solo IN ('0-4', '4-8', '8+')),
+    compromiso_gastos BOOLEAN,
+    compromiso_tiempo BOOLEAN,
+    emergencia_veterinaria VARCHAR(20)
+);
+
+CREATE INDEX idx_respuestas_vivienda_tipo ON respuestas_cuestionario(vivienda_tipo);
+CREATE INDEX idx_respuestas_compromiso_gastos ON respuestas_cuestionario(compromiso_gastos);
+CREATE INDEX idx_respuestas_jardin_horas ON respuestas_cuestionario(tiene_jardin, horas_solo);
+
+-- TABLA: solicitudes_archivadas (resueltas antiguas, ver app/archivo.py)
+-- Mismo ID que tenían en solicitudes; sin puntuacion_version ni respuestas tipadas
+CREATE TABLE solicitudes_archivadas (
+    id INTEGER PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    mascota_id INTEGER NOT NULL REFERENCES mascotas(id) ON DELETE CASCADE,
+    fecha_solicitud TIMESTAMP NOT NULL,
+    estado VARCHAR(20) NOT NULL CHECK (estado IN ('aprobada', 'rechazada')),
+    cuestionario_json JSONB,
+    comentarios_admin TEXT,
+    fecha_revision TIMESTAMP,
+    revisado_por INTEGER REFERENCES usuarios(id) ON DELETE SET NULL,
+    puntuacion DOUBLE PRECISION,
+    fecha_archivo TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_solicitudes_archivadas_usuario ON solicitudes_archivadas(usuario_id);
+CREATE INDEX idx_solicitudes_archivadas_mascota ON solicitudes_archivadas(mascota_id);
+
+-- TABLA: eventos_solicitud (cambios de estado para los flujos SSE, ver app/eventos.py)
+-- Sin FK a solicitudes: el evento sobrevive al archivado de la solicitud
+CREATE TABLE eventos_solicitud (
+    id SERIAL PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    solicitud_id INTEGER NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    fecha TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Reconexión: eventos de un usuario posteriores a Last-Event-ID
+CREATE INDEX idx_eventos_solicitud_usuario ON eventos_solicitud(usuario_id, id);
+CREATE INDEX idx_eventos_solicitud_fecha ON eventos_solicitud(fecha);
+
+-- TABLA: tokens_refresco (refresh tokens de la API, solo el hash)
+CREATE TABLE tokens_refresco (
+    id SERIAL PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    token_hash VARCHAR(64) NOT NULL UNIQUE,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT NOW(),
+    fecha_expiracion TIMESTAMP NOT NULL,
+    revocado BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE INDEX idx_tokens_refresco_usuario ON tokens_refresco(usuario_id);
+
+-- TABLA: tokens_revocados (access tokens revocados con logout)
+CREATE TABLE tokens_revocados (
+    jti VARCHAR(36) PRIMARY KEY,
+    fecha_expiracion TIMESTAMP NOT NULL
+);
+
+CREATE INDEX idx_tokens_revocados_expiracion ON tokens_revocados(fecha_expiracion);
+
+-- TABLA: limites_tasa (contadores del rate limiting con RATELIMIT_BACKEND=sql)
+CREATE TABLE limites_tasa (
+    clave VARCHAR(255) NOT NULL,
+    ventana_inicio INTEGER NOT NULL,
+    contador INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (clave, ventana_inicio)
+);
+
+-- TABLA: claves_idempotencia (Idempotency-Key de la API, ver app/idempotencia.py)
+CREATE TABLE claves_idempotencia (
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    clave VARCHAR(255) NOT NULL,
+    hash_peticion VARCHAR(64) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'en_curso',
+    codigo INTEGER,
+    respuesta JSON,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT NOW(),
+    expira TIMESTAMP NOT NULL,
+    PRIMARY KEY (usuario_id, clave)
+);
+
+CREATE INDEX idx_claves_idempotencia_expira ON claves_idempotencia(expira);
+
+-- TABLA: notificaciones (bandeja de salida de emails, ver app/notificaciones.py)
+CREATE TABLE notificaciones (
+    id SERIAL PRIMARY KEY,
+    destinatario VARCHAR(120) NOT NULL,
+    asunto VARCHAR(255) NOT NULL,
+    cuerpo TEXT NOT NULL,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT NOW(),
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_notificaciones_proximo_intento ON notificaciones(proximo_intento);
+
+-- TABLA: notificaciones_fallidas (emails descartados tras agotar reintentos)
+CREATE TABLE notificaciones_fallidas (
+    id SERIAL PRIMARY KEY,
+    destinatario VARCHAR(120) NOT NULL,
+    asunto VARCHAR(255) NOT NULL,
+    cuerpo TEXT NOT NULL,
+    fecha_creacion TIMESTAMP NOT NULL,
+    fecha_fallo TIMESTAMP NOT NULL DEFAULT NOW(),
+    intentos INTEGER NOT NULL,
+    error TEXT
+);
+
+-- TABLA: resumenes_enviados (un resumen diario a los admins por día)
+CREATE TABLE resumenes_enviados (
+    fecha DATE PRIMARY KEY,
+    fecha_envio TIMESTAMP NOT NULL DEFAULT NOW(),
+    ultima_solicitud_id INTEGER NOT NULL DEFAULT 0,
+    solicitudes_pendientes INTEGER NOT NULL DEFAULT 0,
+    destinatarios INTEGER NOT NULL DEFAULT 0
+);
 
 -- Comentarios en tablas (documentación)
 COMMENT ON TABLE usuarios IS 'Usuarios del sistema (adoptantes y administradores)';
 COMMENT ON TABLE mascotas IS 'Mascotas disponibles para adopción';
 COMMENT ON TABLE solicitudes IS 'Solicitudes de adopción realizadas por usuarios';
 
-COMMENT ON COLUMN solicitudes.cuestionario_json IS 'Respuestas del formulario de adopción en formato JSON';
\ No newline at end of file
+COMMENT ON TABLE respuestas_cuestionario IS 'Respuestas conocidas del cuestionario en columnas tipadas (filtros del panel admin)';
+
+COMMENT ON COLUMN solicitudes.cuestionario_json IS 'Respuestas del formulario de adopción en formato JSON';
+COMMENT ON TABLE solicitudes_archivadas IS 'Solicitudes resueltas antiguas movidas por flask archivar-solicitudes';
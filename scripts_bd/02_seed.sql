@@ -26,3 +26,17 @@ INSERT INTO solicitudes (usuario_id, mascota_id, estado, cuestionario_json, fech
 (2, 3, 'aprobada', '{"experiencia": "Si, Beagle antes", "vivienda": "Casa con jardin"}', '2024-03-10 10:30:00', 'Perfil excelente.', '2024-03-11 14:20:00', 1),
 (3, 1, 'pendiente', '{"experiencia": "No", "vivienda": "Piso con terraza"}', '2024-03-15 16:45:00', NULL, NULL, NULL),
 (4, 2, 'rechazada', '{"experiencia": "No", "vivienda": "Piso pequeño"}', '2024-03-08 09:15:00', 'Espacio insuficiente.', '2024-03-09 11:30:00', 1);
+
+-- RESPUESTAS TIPADAS (las solicitudes insertadas por SQL no pasan por el ORM)
+INSERT INTO respuestas_cuestionario (solicitud_id, vivienda_tipo, vivienda_propia, tiene_jardin, tiene_mascotas,
+                                     horas_solo, compromiso_gastos, compromiso_tiempo, emergencia_veterinaria)
+SELECT id,
+       lower(cuestionario_json->>'vivienda_tipo'),
+       lower(cuestionario_json->>'vivienda_propia'),
+       CASE lower(cuestionario_json->>'tiene_jardin') WHEN 'true' THEN TRUE WHEN 'si' THEN TRUE WHEN 'false' THEN FALSE WHEN 'no' THEN FALSE END,
+       CASE lower(cuestionario_json->>'tiene_mascotas') WHEN 'true' THEN TRUE WHEN 'si' THEN TRUE WHEN 'false' THEN FALSE WHEN 'no' THEN FALSE END,
+       CASE WHEN cuestionario_json->>'horas_solo' IN ('0-4', '4-8', '8+') THEN cuestionario_json->>'horas_solo' END,
+       CASE lower(cuestionario_json->>'compromiso_gastos') WHEN 'true' THEN TRUE WHEN 'si' THEN TRUE WHEN 'false' THEN FALSE WHEN 'no' THEN FALSE END,
+       CASE lower(cuestionario_json->>'compromiso_tiempo') WHEN 'true' THEN TRUE WHEN 'si' THEN TRUE WHEN 'false' THEN FALSE WHEN 'no' THEN FALSE END,
+       lower(cuestionario_json->>'emergencia_veterinaria')
+FROM solicitudes;
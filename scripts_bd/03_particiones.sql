@@ -0,0 +1,123 @@
+-- ==================================================
+-- Portal de Adopción de Mascotas
+-- Particionado de solicitudes por fecha_solicitud (PostgreSQL 12+)
+-- ==================================================
+--
+-- Convierte solicitudes en una tabla particionada por rango, con una
+-- partición por año (solicitudes_2024, solicitudes_2025...) y una
+-- partición por defecto. Ejecutar una vez, después de 01_schema.sql y
+-- con la aplicación parada:
+--
+--     psql $DATABASE_URL -f scripts_bd/03_particiones.sql
+--
+-- Cada año hay que crear la partición siguiente antes de que empiece
+-- (p.ej. desde el mismo cron que `flask archivar-solicitudes`):
+--
+--     SELECT crear_particion_solicitudes(EXTRACT(YEAR FROM NOW())::INT + 1);
+--
+-- Las consultas con filtro por fecha_solicitud (paginación de la cola,
+-- archivado) solo leen las particiones del rango. El resto usa los
+-- índices de cada partición, que son pequeños porque
+-- `flask archivar-solicitudes` vacía las particiones antiguas; una
+-- partición vacía se puede eliminar con
+--
+--     ALTER TABLE solicitudes DETACH PARTITION solicitudes_2021;
+--     DROP TABLE solicitudes_2021;
+--
+-- Limitaciones de PostgreSQL en tablas particionadas:
+-- - La clave primaria y los UNIQUE deben incluir fecha_solicitud: la PK
+--   pasa a ser (id, fecha_solicitud) y unique_usuario_mascota se
+--   sustituye por un índice normal. Las solicitudes duplicadas las
+--   impide Solicitud.crear: reserva la mascota con un UPDATE condicional
+--   (que bloquea su fila hasta el commit) y, antes de insertar, busca una
+--   solicitud del mismo usuario para ella
+-- - Una FOREIGN KEY no puede apuntar a solicitudes(id) sola: se quita la
+--   de respuestas_cuestionario; el ORM borra las respuestas en cascada
+--   y el archivado las borra junto con su solicitud
+
+BEGIN;
+
+-- Función para crear la partición de un año
+CREATE OR REPLACE FUNCTION crear_particion_solicitudes(anio INTEGER) RETURNS VOID AS $$
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF solicitudes FOR VALUES FROM (%L) TO (%L)',
+        'solicitudes_' || anio,
+        make_date(anio, 1, 1),
+        make_date(anio + 1, 1, 1)
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Apartar la tabla actual (los nombres de índices y restricciones son
+-- únicos por esquema, así que se renombran o eliminan)
+ALTER TABLE respuestas_cuestionario DROP CONSTRAINT IF EXISTS respuestas_cuestionario_solicitud_id_fkey;
+ALTER TABLE solicitudes RENAME TO solicitudes_sin_particionar;
+ALTER TABLE solicitudes_sin_particionar RENAME CONSTRAINT solicitudes_pkey TO solicitudes_sin_particionar_pkey;
+ALTER TABLE solicitudes_sin_particionar DROP CONSTRAINT unique_usuario_mascota;
+DROP INDEX IF EXISTS idx_solicitudes_usuario;
+DROP INDEX IF EXISTS idx_solicitudes_mascota;
+DROP INDEX IF EXISTS idx_solicitudes_estado;
+DROP INDEX IF EXISTS idx_solicitudes_estado_fecha;
+DROP INDEX IF EXISTS idx_solicitudes_estado_puntuacion;
+DROP INDEX IF EXISTS idx_solicitudes_usuario_actualizacion;
+DROP INDEX IF EXISTS idx_solicitudes_cuestionario;
+
+-- TABLA: solicitudes (particionada por fecha_solicitud)
+CREATE TABLE solicitudes (
+    id INTEGER NOT NULL DEFAULT nextval('solicitudes_id_seq'),
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    mascota_id INTEGER NOT NULL REFERENCES mascotas(id) ON DELETE CASCADE,
+    fecha_solicitud TIMESTAMP NOT NULL DEFAULT NOW(),
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente'
+        CHECK (estado IN ('pendiente', 'aprobada', 'rechazada')),
+    cuestionario_json JSONB,
+    comentarios_admin TEXT,
+    fecha_revision TIMESTAMP,
+    revisado_por INTEGER REFERENCES usuarios(id),
+    puntuacion DOUBLE PRECISION,
+    puntuacion_version VARCHAR(16),
+    fecha_actualizacion TIMESTAMP NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (id, fecha_solicitud)
+) PARTITION BY RANGE (fecha_solicitud);
+
+ALTER SEQUENCE solicitudes_id_seq OWNED BY solicitudes.id;
+
+-- Particiones: de la solicitud más antigua al año que viene
+DO $$
+DECLARE
+    anio INTEGER;
+BEGIN
+    FOR anio IN
+        SELECT generate_series(
+            COALESCE(EXTRACT(YEAR FROM MIN(fecha_solicitud))::INT, EXTRACT(YEAR FROM NOW())::INT),
+            EXTRACT(YEAR FROM NOW())::INT + 1
+        ) FROM solicitudes_sin_particionar
+    LOOP
+        PERFORM crear_particion_solicitudes(anio);
+    END LOOP;
+END;
+$$;
+
+CREATE TABLE solicitudes_default PARTITION OF solicitudes DEFAULT;
+
+-- Índices (se crean en cada partición)
+CREATE INDEX idx_solicitudes_usuario_mascota ON solicitudes(usuario_id, mascota_id);
+CREATE INDEX idx_solicitudes_mascota ON solicitudes(mascota_id);
+CREATE INDEX idx_solicitudes_estado ON solicitudes(estado);
+CREATE INDEX idx_solicitudes_estado_fecha ON solicitudes(estado, fecha_solicitud, id);
+CREATE INDEX idx_solicitudes_estado_puntuacion ON solicitudes(estado, COALESCE(puntuacion, -1), id);
+CREATE INDEX idx_solicitudes_usuario_actualizacion ON solicitudes(usuario_id, fecha_actualizacion, id);
+CREATE INDEX idx_solicitudes_cuestionario ON solicitudes USING GIN (cuestionario_json jsonb_path_ops);
+
+-- Copiar los datos y eliminar la tabla antigua
+INSERT INTO solicitudes SELECT * FROM solicitudes_sin_particionar;
+DROP TABLE solicitudes_sin_particionar;
+
+COMMENT ON TABLE solicitudes IS 'Solicitudes de adopción realizadas por usuarios (particionada por año de fecha_solicitud)';
+COMMENT ON COLUMN solicitudes.cuestionario_json IS 'Respuestas del formulario de adopción en formato JSON';
+
+COMMIT;
+
+ANALYZE solicitudes;
@@ -0,0 +1,173 @@
+-- ==================================================
+-- Portal de Adopción de Mascotas
+-- Migración incremental de una base de datos existente
+-- ==================================================
+--
+-- Para bases de datos creadas con la versión inicial de 01_schema.sql
+-- (usuarios, mascotas y solicitudes): añade las tablas, columnas e
+-- índices nuevos sin tocar los datos. En producción create_app ya no
+-- crea tablas (CREAR_TABLAS=False), así que hay que ejecutarla antes de
+-- desplegar la nueva versión:
+--
+--     psql $DATABASE_URL -f scripts_bd/04_migracion.sql
+--     flask rellenar-respuestas     # respuestas tipadas de las solicitudes existentes
+--     flask puntuar-solicitudes     # puntuación de las solicitudes existentes
+--
+-- Se puede ejecutar más de una vez (IF NOT EXISTS). Si se quiere
+-- particionar solicitudes, ejecutar después 03_particiones.sql.
+
+BEGIN;
+
+-- Columnas nuevas
+ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
+
+-- Las filas existentes toman NOW(): el primer feed de cambios las incluye todas
+ALTER TABLE mascotas ADD COLUMN IF NOT EXISTS fecha_actualizacion TIMESTAMP NOT NULL DEFAULT NOW();
+
+ALTER TABLE solicitudes ADD COLUMN IF NOT EXISTS puntuacion DOUBLE PRECISION;
+ALTER TABLE solicitudes ADD COLUMN IF NOT EXISTS puntuacion_version VARCHAR(16);
+ALTER TABLE solicitudes ADD COLUMN IF NOT EXISTS fecha_actualizacion TIMESTAMP NOT NULL DEFAULT NOW();
+
+-- Índices nuevos de las tablas existentes
+CREATE INDEX IF NOT EXISTS idx_mascotas_actualizacion ON mascotas(fecha_actualizacion, id);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_estado_fecha ON solicitudes(estado, fecha_solicitud, id);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_estado_puntuacion ON solicitudes(estado, COALESCE(puntuacion, -1), id);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_usuario_actualizacion ON solicitudes(usuario_id, fecha_actualizacion, id);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_cuestionario ON solicitudes USING GIN (cuestionario_json jsonb_path_ops);
+
+-- TABLA: mascotas_eliminadas
+CREATE TABLE IF NOT EXISTS mascotas_eliminadas (
+    id INTEGER PRIMARY KEY,
+    fecha_eliminacion TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_mascotas_eliminadas_fecha ON mascotas_eliminadas(fecha_eliminacion, id);
+
+-- TABLA: respuestas_cuestionario (se rellena con `flask rellenar-respuestas`)
+CREATE TABLE IF NOT EXISTS respuestas_cuestionario (
+    solicitud_id INTEGER PRIMARY KEY REFERENCES solicitudes(id) ON DELETE CASCADE,
+    vivienda_tipo VARCHAR(20),
+    vivienda_propia VARCHAR(20),
+    tiene_jardin BOOLEAN,
+    tiene_mascotas BOOLEAN,
+    horas_solo VARCHAR(3) CHECK (horas_solo IN ('0-4', '4-8', '8+')),
+    compromiso_gastos BOOLEAN,
+    compromiso_tiempo BOOLEAN,
+    emergencia_veterinaria VARCHAR(20)
+);
+
+CREATE INDEX IF NOT EXISTS idx_respuestas_vivienda_tipo ON respuestas_cuestionario(vivienda_tipo);
+CREATE INDEX IF NOT EXISTS idx_respuestas_compromiso_gastos ON respuestas_cuestionario(compromiso_gastos);
+CREATE INDEX IF NOT EXISTS idx_respuestas_jardin_horas ON respuestas_cuestionario(tiene_jardin, horas_solo);
+
+-- TABLA: solicitudes_archivadas
+CREATE TABLE IF NOT EXISTS solicitudes_archivadas (
+    id INTEGER PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    mascota_id INTEGER NOT NULL REFERENCES mascotas(id) ON DELETE CASCADE,
+    fecha_solicitud TIMESTAMP NOT NULL,
+    estado VARCHAR(20) NOT NULL CHECK (estado IN ('aprobada', 'rechazada')),
+    cuestionario_json JSONB,
+    comentarios_admin TEXT,
+    fecha_revision TIMESTAMP,
+    revisado_por INTEGER REFERENCES usuarios(id) ON DELETE SET NULL,
+    puntuacion DOUBLE PRECISION,
+    fecha_archivo TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_solicitudes_archivadas_usuario ON solicitudes_archivadas(usuario_id);
+CREATE INDEX IF NOT EXISTS idx_solicitudes_archivadas_mascota ON solicitudes_archivadas(mascota_id);
+
+-- TABLA: eventos_solicitud
+CREATE TABLE IF NOT EXISTS eventos_solicitud (
+    id SERIAL PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    solicitud_id INTEGER NOT NULL,
+    estado VARCHAR(20) NOT NULL,
+    fecha TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_eventos_solicitud_usuario ON eventos_solicitud(usuario_id, id);
+CREATE INDEX IF NOT EXISTS idx_eventos_solicitud_fecha ON eventos_solicitud(fecha);
+
+-- TABLA: tokens_refresco
+CREATE TABLE IF NOT EXISTS tokens_refresco (
+    id SERIAL PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    token_hash VARCHAR(64) NOT NULL UNIQUE,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT NOW(),
+    fecha_expiracion TIMESTAMP NOT NULL,
+    revocado BOOLEAN NOT NULL DEFAULT FALSE
+);
+
+CREATE INDEX IF NOT EXISTS idx_tokens_refresco_usuario ON tokens_refresco(usuario_id);
+
+-- TABLA: tokens_revocados
+CREATE TABLE IF NOT EXISTS tokens_revocados (
+    jti VARCHAR(36) PRIMARY KEY,
+    fecha_expiracion TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_tokens_revocados_expiracion ON tokens_revocados(fecha_expiracion);
+
+-- TABLA: limites_tasa
+CREATE TABLE IF NOT EXISTS limites_tasa (
+    clave VARCHAR(255) NOT NULL,
+    ventana_inicio INTEGER NOT NULL,
+    contador INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (clave, ventana_inicio)
+);
+
+-- TABLA: claves_idempotencia
+CREATE TABLE IF NOT EXISTS claves_idempotencia (
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    clave VARCHAR(255) NOT NULL,
+    hash_peticion VARCHAR(64) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'en_curso',
+    codigo INTEGER,
+    respuesta JSON,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT NOW(),
+    expira TIMESTAMP NOT NULL,
+    PRIMARY KEY (usuario_id, clave)
+);
+
+CREATE INDEX IF NOT EXISTS idx_claves_idempotencia_expira ON claves_idempotencia(expira);
+
+-- TABLA: notificaciones
+CREATE TABLE IF NOT EXISTS notificaciones (
+    id SERIAL PRIMARY KEY,
+    destinatario VARCHAR(120) NOT NULL,
+    asunto VARCHAR(255) NOT NULL,
+    cuerpo TEXT NOT NULL,
+    fecha_creacion TIMESTAMP NOT NULL DEFAULT NOW(),
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_notificaciones_proximo_intento ON notificaciones(proximo_intento);
+
+-- TABLA: notificaciones_fallidas
+CREATE TABLE IF NOT EXISTS notificaciones_fallidas (
+    id SERIAL PRIMARY KEY,
+    destinatario VARCHAR(120) NOT NULL,
+    asunto VARCHAR(255) NOT NULL,
+    cuerpo TEXT NOT NULL,
+    fecha_creacion TIMESTAMP NOT NULL,
+    fecha_fallo TIMESTAMP NOT NULL DEFAULT NOW(),
+    intentos INTEGER NOT NULL,
+    error TEXT
+);
+
+-- TABLA: resumenes_enviados
+CREATE TABLE IF NOT EXISTS resumenes_enviados (
+    fecha DATE PRIMARY KEY,
+    fecha_envio TIMESTAMP NOT NULL DEFAULT NOW(),
+    ultima_solicitud_id INTEGER NOT NULL DEFAULT 0,
+    solicitudes_pendientes INTEGER NOT NULL DEFAULT 0,
+    destinatarios INTEGER NOT NULL DEFAULT 0
+);
+
+COMMENT ON TABLE respuestas_cuestionario IS 'Respuestas conocidas del cuestionario en columnas tipadas (filtros del panel admin)';
+COMMENT ON TABLE solicitudes_archivadas IS 'Solicitudes resueltas antiguas movidas por flask archivar-solicitudes';
+
+COMMIT;
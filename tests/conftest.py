@@ -5,9 +5,14 @@ Este archivo contiene las fixtures reutilizables para todos los tests.
 Las fixtures proporcionan datos de prueba y configuración del entorno de testing.
 """
 
+import socketserver
+import threading
+
 import pytest
+from contextlib import contextmanager
 from app import create_app, db
 from app.models import Usuario, Mascota, Solicitud
+from app.query_counter import ContadorConsultas
 
 
 @pytest.fixture(scope='function')
@@ -68,6 +73,32 @@ def runner(app):
     return app.test_cli_runner()
 
 
+@pytest.fixture(scope='function')
+def query_budget(app):
+    """
+    Fixture para fijar un máximo de queries SQL en un bloque.
+
+    Uso:
+        with query_budget(3) as contador:
+            client.get('/solicitudes/admin')
+
+    Args:
+        app: Fixture de aplicación Flask
+
+    Returns:
+        callable: Context manager que falla si se supera el máximo
+    """
+    @contextmanager
+    def presupuesto(maximo):
+        with ContadorConsultas(db.engine) as contador:
+            yield contador
+        assert contador.total <= maximo, (
+            f'{contador.total} queries (máximo {maximo}): {contador.consultas}'
+        )
+
+    return presupuesto
+
+
 @pytest.fixture(scope='function')
 def usuario_adoptante(app):
     """
@@ -266,3 +297,100 @@ def auth_headers_admin(client, usuario_admin):
     }, follow_redirects=True)
 
     return {}
+
+
+class ServidorSMTPLocal(socketserver.ThreadingTCPServer):
+    """
+    Servidor SMTP mínimo en localhost para tests (sin red ni TLS).
+
+    Guarda los mensajes recibidos y cuenta las conexiones. Con
+    `rechazar` se responde 550 a los destinatarios indicados.
+
+    Attributes:
+        mensajes (list): Pares (destinatarios, texto del mensaje)
+        conexiones (int): Conexiones SMTP abiertas
+        rechazar (set): Destinatarios a rechazar
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ManejadorSMTP)
+        self.mensajes = []
+        self.conexiones = 0
+        self.rechazar = set()
+
+    @property
+    def puerto(self):
+        return self.server_address[1]
+
+
+class ManejadorSMTP(socketserver.StreamRequestHandler):
+    """Atiende una conexión SMTP (EHLO, MAIL, RCPT, DATA, RSET, QUIT)."""
+
+    def responder(self, linea):
+        self.wfile.write(f'{linea}\r\n'.encode())
+
+    def handle(self):
+        self.server.conexiones += 1
+        self.responder('220 smtp.local')
+        destinatarios = []
+
+        for linea in self.rfile:
+            comando = linea.decode().strip()
+            verbo = comando.split(' ')[0].upper()
+
+            if verbo in ('EHLO', 'HELO', 'NOOP', 'MAIL'):
+                self.responder('250 OK')
+            elif verbo == 'RSET':
+                destinatarios = []
+                self.responder('250 OK')
+            elif verbo == 'RCPT':
+                direccion = comando.split(':', 1)[1].strip().strip('<>')
+                if direccion in self.server.rechazar:
+                    self.responder('550 Buzón no disponible')
+                else:
+                    destinatarios.append(direccion)
+                    self.responder('250 OK')
+            elif verbo == 'DATA':
+                self.responder('354 Fin con <CRLF>.<CRLF>')
+                datos = []
+                for parte in self.rfile:
+                    if parte in (b'.\r\n', b'.\n'):
+                        break
+                    datos.append(parte.decode())
+                self.server.mensajes.append((destinatarios, ''.join(datos)))
+                destinatarios = []
+                self.responder('250 OK')
+            elif verbo == 'QUIT':
+                self.responder('221 Adiós')
+                break
+            else:
+                self.responder('502 No implementado')
+
+
+@pytest.fixture(scope='function')
+def servidor_smtp(app):
+    """
+    Fixture con un servidor SMTP local y Flask-Mail apuntando a él.
+
+    Yields:
+        ServidorSMTPLocal: Servidor con los mensajes recibidos
+    """
+    servidor = ServidorSMTPLocal()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+
+    estado_mail = app.extensions['mail']
+    estado_mail.server = '127.0.0.1'
+    estado_mail.port = servidor.puerto
+    estado_mail.use_tls = False
+    estado_mail.use_ssl = False
+    estado_mail.username = None
+    estado_mail.suppress = False
+
+    yield servidor
+
+    servidor.shutdown()
+    servidor.server_close()
@@ -5,10 +5,12 @@ Tests incluidos:
 - Autenticación JWT (login)
 - Endpoints de mascotas (listar, detalle, filtros)
 - Endpoints de solicitudes (crear, listar)
+- Revisión de solicitudes (admin) e Idempotency-Key
 """
 
 import pytest
 import json
+from app import db
 from app.models import Usuario, Mascota, Solicitud
 
 
@@ -55,6 +57,225 @@ class TestAuthAPI:
         assert response.status_code == 400
 
 
+class TestJWT:
+    """Tests para la validación de JWT sin consultas a la BD."""
+
+    def login(self, client):
+        """Helper para obtener token JWT del adoptante."""
+        response = client.post('/api/auth/login',
+            data=json.dumps({'email': 'adoptante@test.com', 'password': 'password123'}),
+            content_type='application/json'
+        )
+        return response.get_json()['token']
+
+    def test_token_incluye_claims(self, app, client, usuario_adoptante):
+        """El token lleva rol, activo y versión de token."""
+        import jwt as pyjwt
+
+        payload = pyjwt.decode(self.login(client), app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+
+        assert payload['user_id'] == usuario_adoptante.id
+        assert payload['rol'] == 'adoptante'
+        assert payload['activo'] is True
+        assert payload['tv'] == 0
+
+    def test_usuario_desactivado_rechazado(self, client, usuario_adoptante):
+        """Un token de un usuario desactivado se rechaza."""
+        from app import db
+
+        token = self.login(client)
+        usuario_adoptante.activo = False
+        db.session.commit()
+
+        response = client.get('/api/solicitudes/mias',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        assert response.status_code == 401
+
+    def test_revocar_tokens(self, client, usuario_adoptante):
+        """Incrementar token_version invalida los tokens anteriores."""
+        token = self.login(client)
+        usuario_adoptante.revocar_tokens()
+
+        response = client.get('/api/solicitudes/mias',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        assert response.status_code == 401
+
+        response = client.get('/api/solicitudes/mias',
+            headers={'Authorization': f'Bearer {self.login(client)}'}
+        )
+        assert response.status_code == 200
+
+    def test_firma_asimetrica(self, app, client, usuario_adoptante):
+        """En modo RS256 el token se verifica solo con la clave pública."""
+        import jwt as pyjwt
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        clave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        app.config['JWT_ALGORITHM'] = 'RS256'
+        app.config['JWT_PRIVATE_KEY'] = clave.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        ).decode()
+        app.config['JWT_PUBLIC_KEY'] = clave.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+
+        token = self.login(client)
+        publica = client.get('/api/auth/clave-publica').get_json()['public_key']
+
+        assert pyjwt.decode(token, publica, algorithms=['RS256'])['user_id'] == usuario_adoptante.id
+        response = client.get('/api/solicitudes/mias',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        assert response.status_code == 200
+
+
+class TestRefreshTokens:
+    """Tests para /api/auth/refresh y /api/auth/logout."""
+
+    def login(self, client):
+        """Helper que devuelve la respuesta completa del login."""
+        response = client.post('/api/auth/login',
+            data=json.dumps({'email': 'adoptante@test.com', 'password': 'password123'}),
+            content_type='application/json'
+        )
+        return response.get_json()
+
+    def refresh(self, client, refresh_token):
+        """Helper para llamar a /api/auth/refresh."""
+        return client.post('/api/auth/refresh',
+            data=json.dumps({'refresh_token': refresh_token}),
+            content_type='application/json'
+        )
+
+    def test_login_devuelve_refresh_token(self, client, usuario_adoptante):
+        """El login devuelve access token de corta duración y refresh token."""
+        data = self.login(client)
+
+        assert data['refresh_token']
+        assert data['expires_in'] == 15 * 60
+
+    def test_refresh_rota_el_token(self, client, usuario_adoptante):
+        """El refresh devuelve tokens nuevos y el refresh token usado deja de valer."""
+        data = self.login(client)
+
+        response = self.refresh(client, data['refresh_token'])
+        assert response.status_code == 200
+        nuevos = response.get_json()
+        assert nuevos['refresh_token'] != data['refresh_token']
+
+        response = client.get('/api/solicitudes/mias',
+            headers={'Authorization': f'Bearer {nuevos["token"]}'}
+        )
+        assert response.status_code == 200
+
+        # Reutilizar el token rotado revoca también el nuevo
+        assert self.refresh(client, data['refresh_token']).status_code == 401
+        assert self.refresh(client, nuevos['refresh_token']).status_code == 401
+
+    def test_refresh_concurrente(self, client, usuario_adoptante, monkeypatch):
+        """Si otro refresh rota el token entre la lectura y el UPDATE, este falla."""
+        from app import db
+        from app.models import TokenRefresco
+
+        data = self.login(client)
+        vigente = TokenRefresco.esta_vigente
+
+        def rotado_por_otro(refresco):
+            # El otro refresh revoca el token después de que este lo haya leído
+            db.session.execute(
+                db.update(TokenRefresco).where(TokenRefresco.id == refresco.id).values(revocado=True)
+                .execution_options(synchronize_session=False)
+            )
+            return vigente(refresco)
+
+        monkeypatch.setattr(TokenRefresco, 'esta_vigente', rotado_por_otro)
+
+        assert self.refresh(client, data['refresh_token']).status_code == 401
+        assert TokenRefresco.query.filter_by(revocado=False).count() == 0
+
+    def test_limpiar_tokens(self, app, client, usuario_adoptante):
+        """flask limpiar-tokens borra los tokens caducados y conserva los vigentes."""
+        from datetime import datetime, timedelta
+        from app import db
+        from app.models import TokenRefresco, TokenRevocado
+
+        self.login(client)
+        ayer = datetime.utcnow() - timedelta(days=1)
+        db.session.add(TokenRefresco(usuario_id=usuario_adoptante.id, token_hash='x' * 64,
+                                     fecha_expiracion=ayer, revocado=True))
+        db.session.add(TokenRevocado(jti='caducado', fecha_expiracion=ayer))
+        db.session.commit()
+
+        resultado = app.test_cli_runner().invoke(args=['limpiar-tokens'])
+
+        assert '1 refresh tokens y 1 tokens revocados borrados' in resultado.output
+        assert TokenRefresco.query.count() == 1
+        assert TokenRevocado.query.count() == 0
+
+    def test_refresh_token_invalido(self, client):
+        """Un refresh token desconocido devuelve 401."""
+        assert self.refresh(client, 'no-existe').status_code == 401
+
+    def test_logout_revoca_tokens(self, client, usuario_adoptante):
+        """Tras el logout el access token y el refresh token dejan de valer."""
+        data = self.login(client)
+        headers = {'Authorization': f'Bearer {data["token"]}'}
+
+        response = client.post('/api/auth/logout',
+            data=json.dumps({'refresh_token': data['refresh_token']}),
+            content_type='application/json',
+            headers=headers
+        )
+        assert response.status_code == 204
+
+        assert client.get('/api/solicitudes/mias', headers=headers).status_code == 401
+        assert self.refresh(client, data['refresh_token']).status_code == 401
+
+
+class TestRateLimitAPI:
+    """Tests para el rate limiting de la API."""
+
+    def test_api_limitada_por_ip(self, app, client):
+        """Superar el límite por IP devuelve 429 en JSON con Retry-After."""
+        app.config['RATELIMIT_API_IP'] = '3/minute'
+
+        for _ in range(3):
+            assert client.get('/api/mascotas/').status_code == 200
+
+        response = client.get('/api/mascotas/')
+        assert response.status_code == 429
+        assert 'error' in response.get_json()
+        assert 'Retry-After' in response.headers
+
+    def test_contadores_solo_admin(self, client, usuario_admin, usuario_adoptante):
+        """/api/auth/limites expone los contadores solo a administradores."""
+        def token(email, password):
+            response = client.post('/api/auth/login',
+                data=json.dumps({'email': email, 'password': password}),
+                content_type='application/json'
+            )
+            return response.get_json()['token']
+
+        response = client.get('/api/auth/limites',
+            headers={'Authorization': f'Bearer {token("adoptante@test.com", "password123")}'}
+        )
+        assert response.status_code == 403
+
+        response = client.get('/api/auth/limites',
+            headers={'Authorization': f'Bearer {token("admin@test.com", "admin123")}'}
+        )
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['login_cuenta']['permitidas'] == 2
+        assert data['api_ip']['rechazadas'] == 0
+
+
 class TestMascotasAPI:
     """Tests para /api/mascotas"""
 
@@ -91,6 +312,103 @@ class TestMascotasAPI:
 
         assert response.status_code == 404
 
+    def test_listar_campos_pedidos(self, app, client, mascota_disponible):
+        """GET /api/mascotas/?fields= devuelve y selecciona en SQL solo esos campos."""
+        from sqlalchemy import event
+
+        sentencias = []
+
+        def registrar(conn, cursor, sentencia, parametros, contexto, executemany):
+            sentencias.append(sentencia)
+
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            response = client.get('/api/mascotas/?fields=nombre,foto_url,especie')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+
+        assert response.status_code == 200
+        assert response.get_json() == [{
+            'id': mascota_disponible.id,
+            'nombre': 'Cerbero',
+            'especie': 'Perro',
+            'foto_url': mascota_disponible.foto_url
+        }]
+
+        consulta = next(s for s in sentencias if 'FROM mascotas' in s)
+        assert 'mascotas.nombre' in consulta
+        assert 'descripcion' not in consulta
+
+    def test_detalle_campos_pedidos(self, client, mascota_disponible):
+        """GET /api/mascotas/<id>?fields= admite fechas y rechaza campos desconocidos."""
+        response = client.get(f'/api/mascotas/{mascota_disponible.id}?fields=fecha_ingreso')
+
+        assert response.get_json() == {
+            'id': mascota_disponible.id,
+            'fecha_ingreso': mascota_disponible.fecha_ingreso.isoformat()
+        }
+
+        response = client.get(f'/api/mascotas/{mascota_disponible.id}?fields=nombre,password')
+        assert response.status_code == 400
+        assert 'password' in response.get_json()['error']
+        assert client.get('/api/mascotas/?fields=nombre,foo').status_code == 400
+
+
+    def test_batch_en_orden_con_no_encontradas(self, app, client, mascota_disponible, mascota_en_proceso):
+        """GET /api/mascotas/batch devuelve en el orden pedido con una sola query."""
+        from sqlalchemy import event
+
+        sentencias = []
+
+        def registrar(conn, cursor, sentencia, parametros, contexto, executemany):
+            sentencias.append(sentencia)
+
+        ids = f'{mascota_en_proceso.id},999,{mascota_disponible.id},{mascota_en_proceso.id}'
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            response = client.get(f'/api/mascotas/batch?ids={ids}&fields=nombre')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+
+        assert response.status_code == 200
+        assert response.get_json() == [
+            {'id': mascota_en_proceso.id, 'nombre': mascota_en_proceso.nombre},
+            {'id': 999, 'error': 'Mascota no encontrada'},
+            {'id': mascota_disponible.id, 'nombre': 'Cerbero'}
+        ]
+        assert len([s for s in sentencias if 'FROM mascotas' in s]) == 1
+
+    def test_batch_cacheable(self, client, mascota_disponible):
+        """La respuesta lleva Cache-Control y ETag, y se revalida con 304."""
+        url = f'/api/mascotas/batch?ids={mascota_disponible.id}'
+        response = client.get(url)
+
+        assert response.cache_control.public
+        assert response.cache_control.max_age == 60
+        etag = response.headers['ETag']
+
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+
+    def test_batch_parametros_invalidos(self, app, client):
+        """Sin ids, ids no numéricos o demasiados ids devuelven 400."""
+        app.config['MASCOTAS_BATCH_MAX'] = 3
+
+        assert client.get('/api/mascotas/batch').status_code == 400
+        assert client.get('/api/mascotas/batch?ids=1,abc').status_code == 400
+        assert client.get('/api/mascotas/batch?ids=1,-2').status_code == 400
+        assert client.get('/api/mascotas/batch?ids=1,2,3,4').status_code == 400
+        assert client.get('/api/mascotas/batch?ids=1,1,2,2,3').status_code == 200
+        assert client.get('/api/mascotas/batch?ids=1&fields=foo').status_code == 400
+
+    def test_parsear_ids_corta_al_pasar_el_maximo(self):
+        """parsear_ids quita repetidos y no sigue leyendo tras superar el máximo."""
+        from app.routes.api.mascotas import parsear_ids
+
+        assert parsear_ids('3,1,3,2,1', 3) == [3, 1, 2]
+        # El resto (incluido el id no válido) ya no se lee
+        with pytest.raises(ValueError, match='Máximo 3'):
+            parsear_ids('1,2,3,4,abc', 3)
 
 class TestSolicitudesAPI:
     """Tests para /api/solicitudes"""
@@ -143,6 +461,11 @@ class TestSolicitudesAPI:
         assert data['mascota_id'] == mascota_disponible.id
         assert data['estado'] == 'pendiente'
 
+        # La mascota queda reservada
+        from app import db
+        db.session.refresh(mascota_disponible)
+        assert mascota_disponible.estado == 'en_proceso'
+
     def test_crear_solicitud_sin_token(self, client, mascota_disponible):
         """POST /api/solicitudes/ sin JWT devuelve 401."""
         response = client.post('/api/solicitudes/',
@@ -171,7 +494,7 @@ class TestSolicitudesAPI:
         assert response.status_code == 404
 
     def test_crear_solicitud_mascota_no_disponible(self, client, usuario_adoptante, mascota_en_proceso):
-        """POST /api/solicitudes/ con mascota en proceso devuelve 400."""
+        """POST /api/solicitudes/ con mascota en proceso devuelve 409."""
         token = self.get_token(client)
 
         response = client.post('/api/solicitudes/',
@@ -183,4 +506,426 @@ class TestSolicitudesAPI:
             headers={'Authorization': f'Bearer {token}'}
         )
 
-        assert response.status_code == 400
+        assert response.status_code == 409
+
+    def test_ranking_solo_admin(self, client, usuario_adoptante):
+        """GET /api/solicitudes/ranking con token de adoptante devuelve 403."""
+        token = self.get_token(client)
+
+        response = client.get('/api/solicitudes/ranking',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        assert response.status_code == 403
+
+    def test_ranking_ordenado_por_puntuacion(self, client, usuario_admin, usuario_adoptante):
+        """GET /api/solicitudes/ranking devuelve las pendientes de mayor a menor puntuación."""
+        from app import db
+
+        cuestionarios = [
+            {'horas_solo': '8+'},
+            {'horas_solo': '0-4', 'compromiso_gastos': 'si', 'tiene_jardin': True},
+            {'horas_solo': '4-8'}
+        ]
+        for i, cuestionario in enumerate(cuestionarios):
+            mascota = Mascota(nombre=f'Ranking {i}', especie='Perro', descripcion='Descripción de prueba')
+            db.session.add(mascota)
+            db.session.flush()
+            db.session.add(Solicitud(usuario_id=usuario_adoptante.id, mascota_id=mascota.id, cuestionario=cuestionario))
+        db.session.commit()
+
+        token = self.get_token(client, 'admin@test.com', 'admin123')
+        response = client.get('/api/solicitudes/ranking?limite=2',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [s['cuestionario'] for s in data] == cuestionarios[1:]
+        assert data[0]['puntuacion'] > data[1]['puntuacion']
+
+        # Límites fuera de rango: como mínimo una solicitud
+        for limite in (0, -1):
+            response = client.get(f'/api/solicitudes/ranking?limite={limite}',
+                headers={'Authorization': f'Bearer {token}'}
+            )
+            assert response.status_code == 200
+            assert len(response.get_json()) == 1
+
+        # Filtro por respuestas del cuestionario
+        response = client.get('/api/solicitudes/ranking?horas_solo=4-8,8%2B',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        assert [s['cuestionario'] for s in response.get_json()] == [cuestionarios[2], cuestionarios[0]]
+
+
+class TestRevisionAdminAPI:
+    """Tests para /api/solicitudes/admin (revisión de solicitudes)."""
+
+    def get_token(self, client, email='admin@test.com', password='admin123'):
+        """Helper para obtener token JWT (admin por defecto)."""
+        response = client.post('/api/auth/login',
+            data=json.dumps({'email': email, 'password': password}),
+            content_type='application/json'
+        )
+        return response.get_json()['token']
+
+    def crear_solicitudes(self, usuario, n):
+        """Helper: crea n solicitudes pendientes, cada una de una mascota."""
+        from app import db
+
+        solicitudes = []
+        for i in range(n):
+            mascota = Mascota(nombre=f'Revisión {i}', especie='Perro', descripcion='Descripción de prueba')
+            db.session.add(mascota)
+            db.session.flush()
+            solicitud = Solicitud(usuario_id=usuario.id, mascota_id=mascota.id)
+            db.session.add(solicitud)
+            solicitudes.append(solicitud)
+        db.session.commit()
+        return [s.id for s in solicitudes]
+
+    def test_solo_admin(self, client, usuario_adoptante, solicitud_pendiente):
+        """Los endpoints de revisión devuelven 403 a un adoptante y 401 sin token."""
+        token = self.get_token(client, 'adoptante@test.com', 'password123')
+        headers = {'Authorization': f'Bearer {token}'}
+
+        assert client.get('/api/solicitudes/admin', headers=headers).status_code == 403
+        assert client.get(f'/api/solicitudes/admin/{solicitud_pendiente.id}', headers=headers).status_code == 403
+        response = client.post('/api/solicitudes/admin/revisar',
+            data=json.dumps({'decisiones': [{'id': solicitud_pendiente.id, 'accion': 'aprobar'}]}),
+            content_type='application/json',
+            headers=headers
+        )
+        assert response.status_code == 403
+        assert solicitud_pendiente.estado == 'pendiente'
+        assert client.get('/api/solicitudes/admin').status_code == 401
+
+    def test_lista_paginada(self, client, usuario_admin, usuario_adoptante):
+        """GET /api/solicitudes/admin pagina por cursor y embebe mascota y usuario."""
+        ids = self.crear_solicitudes(usuario_adoptante, 3)
+        headers = {'Authorization': f'Bearer {self.get_token(client)}'}
+
+        primera = client.get('/api/solicitudes/admin?limite=2', headers=headers).get_json()
+        assert [s['id'] for s in primera['solicitudes']] == ids[:0:-1]
+        assert primera['solicitudes'][0]['mascota']['nombre'] == 'Revisión 2'
+        assert primera['solicitudes'][0]['usuario']['email'] == 'adoptante@test.com'
+        assert 'password_hash' not in primera['solicitudes'][0]['usuario']
+
+        segunda = client.get(f"/api/solicitudes/admin?limite=2&desde={primera['siguiente']}",
+            headers=headers
+        ).get_json()
+        assert [s['id'] for s in segunda['solicitudes']] == [ids[0]]
+        assert segunda['siguiente'] is None
+
+    def test_detalle(self, client, usuario_admin, solicitud_pendiente):
+        """GET /api/solicitudes/admin/<id> devuelve la solicitud con mascota y usuario."""
+        headers = {'Authorization': f'Bearer {self.get_token(client)}'}
+
+        data = client.get(f'/api/solicitudes/admin/{solicitud_pendiente.id}', headers=headers).get_json()
+        assert data['id'] == solicitud_pendiente.id
+        assert data['mascota']['id'] == solicitud_pendiente.mascota_id
+        assert data['usuario']['nombre'] == solicitud_pendiente.usuario.nombre
+
+        assert client.get('/api/solicitudes/admin/99999', headers=headers).status_code == 404
+
+    def test_revision_en_lote(self, client, usuario_admin, usuario_adoptante):
+        """POST /api/solicitudes/admin/revisar aplica las válidas y explica las demás."""
+        from app import db
+
+        aprobar, rechazar = self.crear_solicitudes(usuario_adoptante, 2)
+        response = client.post('/api/solicitudes/admin/revisar',
+            data=json.dumps({'decisiones': [
+                {'id': aprobar, 'accion': 'aprobar', 'comentario': 'Bienvenido'},
+                {'id': rechazar, 'accion': 'rechazar', 'comentario': 'No encaja'},
+                {'id': aprobar, 'accion': 'rechazar'},
+                {'id': 99999, 'accion': 'aprobar'},
+                {'id': rechazar, 'accion': 'borrar'}
+            ]}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {self.get_token(client)}'}
+        )
+
+        assert response.status_code == 200
+        resultados = response.get_json()['resultados']
+        assert [r['ok'] for r in resultados] == [True, True, False, False, False]
+        assert resultados[0]['estado'] == 'aprobada'
+        assert resultados[0]['rechazadas_automaticamente'] == 0
+        assert resultados[1]['estado'] == 'rechazada'
+        assert resultados[3]['error'] == 'Solicitud no encontrada'
+
+        db.session.expire_all()
+        assert db.session.get(Solicitud, aprobar).estado == 'aprobada'
+        assert db.session.get(Solicitud, aprobar).mascota.estado == 'adoptado'
+        assert db.session.get(Solicitud, rechazar).comentarios_admin == 'No encaja'
+
+    def test_revision_lote_invalido(self, client, usuario_admin):
+        """POST /api/solicitudes/admin/revisar sin decisiones o con demasiadas devuelve 400."""
+        headers = {'Authorization': f'Bearer {self.get_token(client)}'}
+
+        for cuerpo in ({}, {'decisiones': []}, {'decisiones': [1, 2]},
+                       {'decisiones': [{'id': i, 'accion': 'aprobar'} for i in range(101)]}):
+            response = client.post('/api/solicitudes/admin/revisar',
+                data=json.dumps(cuerpo),
+                content_type='application/json',
+                headers=headers
+            )
+            assert response.status_code == 400
+
+
+class TestIdempotenciaAPI:
+    """Tests de Idempotency-Key en POST /api/solicitudes/."""
+
+    def get_token(self, client):
+        """Helper para obtener token JWT del adoptante."""
+        response = client.post('/api/auth/login',
+            data=json.dumps({'email': 'adoptante@test.com', 'password': 'password123'}),
+            content_type='application/json'
+        )
+        return response.get_json()['token']
+
+    def crear(self, client, token, mascota_id, clave='clave-1', cuestionario=None):
+        """Helper: POST /api/solicitudes/ con Idempotency-Key."""
+        return client.post('/api/solicitudes/',
+            data=json.dumps({'mascota_id': mascota_id, 'cuestionario': cuestionario or {'vivienda_tipo': 'casa'}}),
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {token}', 'Idempotency-Key': clave}
+        )
+
+    def test_reintento_repite_respuesta(self, client, usuario_adoptante, mascota_disponible):
+        """Un reintento con la misma clave devuelve la respuesta original sin crear nada."""
+        token = self.get_token(client)
+
+        primera = self.crear(client, token, mascota_disponible.id)
+        segunda = self.crear(client, token, mascota_disponible.id)
+
+        assert primera.status_code == 201
+        assert segunda.status_code == 201
+        assert segunda.get_json() == primera.get_json()
+        assert segunda.headers['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in primera.headers
+        assert Solicitud.query.count() == 1
+
+    def test_otra_peticion_misma_clave(self, client, usuario_adoptante, mascota_disponible):
+        """Reutilizar la clave con otro cuerpo devuelve 422."""
+        token = self.get_token(client)
+
+        self.crear(client, token, mascota_disponible.id)
+        response = self.crear(client, token, mascota_disponible.id, cuestionario={'vivienda_tipo': 'finca'})
+
+        assert response.status_code == 422
+
+    def test_sin_clave_duplicada_409(self, client, usuario_adoptante, mascota_disponible):
+        """Sin clave, el reintento sigue respondiendo 409 (no un error 500)."""
+        token = self.get_token(client)
+        headers = {'Authorization': f'Bearer {token}'}
+        cuerpo = json.dumps({'mascota_id': mascota_disponible.id, 'cuestionario': {'vivienda_tipo': 'casa'}})
+
+        client.post('/api/solicitudes/', data=cuerpo, content_type='application/json', headers=headers)
+        response = client.post('/api/solicitudes/', data=cuerpo, content_type='application/json', headers=headers)
+
+        assert response.status_code == 409
+
+    def test_duplicado_en_curso_409(self, client, usuario_adoptante, mascota_disponible):
+        """Un duplicado con la primera aún en curso recibe 409 con Retry-After sin esperar."""
+        from app.models import ClaveIdempotencia
+
+        token = self.get_token(client)
+        self.crear(client, token, mascota_disponible.id)
+
+        # Simular que la primera petición aún no ha terminado
+        db.session.query(ClaveIdempotencia).update({'estado': 'en_curso'})
+        db.session.commit()
+
+        response = self.crear(client, token, mascota_disponible.id)
+        assert response.status_code == 409
+        assert response.headers['Retry-After'] == '1'
+
+    def test_completada_caduca_tras_ttl(self, app, client, usuario_adoptante, mascota_disponible):
+        """La reserva dura IDEMPOTENCIA_RESERVA_SEGUNDOS; al completar pasa al TTL."""
+        from datetime import datetime, timedelta
+        from app.models import ClaveIdempotencia
+
+        token = self.get_token(client)
+        self.crear(client, token, mascota_disponible.id)
+
+        fila = ClaveIdempotencia.query.one()
+        reserva = timedelta(seconds=app.config['IDEMPOTENCIA_RESERVA_SEGUNDOS'])
+        assert fila.estado == 'completada'
+        assert fila.expira > datetime.utcnow() + reserva
+
+    def test_reserva_abandonada(self, app, client, usuario_adoptante, mascota_disponible):
+        """Una reserva 'en_curso' caducada (worker muerto) se retoma y la petición se ejecuta."""
+        from datetime import datetime, timedelta
+        from app import idempotencia
+        from app.models import ClaveIdempotencia
+
+        token = self.get_token(client)
+        antigua = datetime.utcnow() - timedelta(seconds=app.config['IDEMPOTENCIA_RESERVA_SEGUNDOS'] + 1)
+        cuerpo = json.dumps({'mascota_id': mascota_disponible.id, 'cuestionario': {'vivienda_tipo': 'casa'}})
+        with app.test_request_context('/api/solicitudes/', method='POST', data=cuerpo, content_type='application/json'):
+            huella = idempotencia.huella_peticion()
+        db.session.add(ClaveIdempotencia(
+            usuario_id=usuario_adoptante.id,
+            clave='clave-1',
+            hash_peticion=huella,
+            estado='en_curso',
+            fecha_creacion=antigua,
+            expira=antigua + timedelta(seconds=app.config['IDEMPOTENCIA_RESERVA_SEGUNDOS'])
+        ))
+        db.session.commit()
+
+        response = self.crear(client, token, mascota_disponible.id)
+        assert response.status_code == 201
+        assert Solicitud.query.count() == 1
+
+        # La petición original termina tarde: no pisa la reserva nueva
+        idempotencia.completar(usuario_adoptante.id, 'clave-1', antigua, 500, {'error': 'tarde'})
+        idempotencia.liberar(usuario_adoptante.id, 'clave-1', antigua)
+        db.session.expire_all()
+        fila = ClaveIdempotencia.query.one()
+        assert fila.estado == 'completada'
+        assert fila.codigo == 201
+
+    def test_clave_caducada_se_reutiliza(self, client, usuario_adoptante, mascota_disponible):
+        """Tras el TTL la clave se libera y la petición se ejecuta de nuevo."""
+        from datetime import datetime, timedelta
+        from app.models import ClaveIdempotencia
+
+        token = self.get_token(client)
+        self.crear(client, token, mascota_disponible.id)
+
+        db.session.query(ClaveIdempotencia).update({'expira': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+        response = self.crear(client, token, mascota_disponible.id)
+        assert response.status_code == 409
+        assert 'Idempotent-Replayed' not in response.headers
+
+
+class TestSerializacion:
+    """Tests del serializador rápido de la API (app/serializacion.py)."""
+
+    def test_mismo_resultado_que_to_dict(self, client, mascota_disponible):
+        """La lista completa coincide con to_dict(), con y sin orjson."""
+        from app import serializacion
+
+        esperado = [mascota_disponible.to_dict()]
+        assert client.get('/api/mascotas/').get_json() == esperado
+
+        orjson = serializacion.orjson
+        serializacion.orjson = None
+        try:
+            assert client.get('/api/mascotas/').get_json() == esperado
+        finally:
+            serializacion.orjson = orjson
+
+    def test_swagger_documenta_respuestas(self, client):
+        """Swagger sigue documentando los modelos de las respuestas."""
+        spec = client.get('/api/swagger.json').get_json()
+
+        lista = spec['paths']['/mascotas/']['get']['responses']['200']['schema']
+        assert lista == {'type': 'array', 'items': {'$ref': '#/definitions/Mascotas'}}
+        mias = spec['paths']['/solicitudes/mias']['get']['responses']['200']['schema']
+        assert mias['items'] == {'$ref': '#/definitions/Solicitudes'}
+
+    def test_benchmark(self, app):
+        """flask benchmark-serializacion compara las dos rutas."""
+        resultado = app.test_cli_runner().invoke(args=['benchmark-serializacion', '--filas', '5', '--repeticiones', '1'])
+
+        assert resultado.exit_code == 0
+        assert 'más rápido' in resultado.output
+
+
+class TestCambiosAPI:
+    """Tests para el feed de cambios (/cambios)"""
+
+    @pytest.fixture(autouse=True)
+    def sin_margen(self, app):
+        """Entrega también los cambios recién confirmados."""
+        app.config['CAMBIOS_MARGEN_SEGUNDOS'] = 0
+
+    def get_token(self, client):
+        """Helper para obtener token JWT del adoptante."""
+        response = client.post('/api/auth/login',
+            data=json.dumps({'email': 'adoptante@test.com', 'password': 'password123'}),
+            content_type='application/json'
+        )
+        return response.get_json()['token']
+
+    def sincronizar(self, client, url, marca=None, **kwargs):
+        """Llama a /cambios hasta que no quedan páginas; devuelve (páginas, marca)."""
+        paginas = []
+        while True:
+            query = f'&desde={marca}' if marca else ''
+            data = client.get(f'{url}?limite=2{query}', **kwargs).get_json()
+            paginas.append(data)
+            marca = data['siguiente']
+            if not data['hay_mas']:
+                return paginas, marca
+
+    def test_mascotas_cambios_y_eliminadas(self, client, auth_headers_admin, mascota_disponible, mascota_en_proceso):
+        """Solo devuelve lo cambiado tras la marca, con las marcas de borrado."""
+        extra = Mascota(nombre='Toby', especie='Perro', descripcion='Descripción de prueba')
+        db.session.add(extra)
+        db.session.commit()
+
+        paginas, marca = self.sincronizar(client, '/api/mascotas/cambios')
+        assert len(paginas) == 2
+        ids = [m['id'] for p in paginas for m in p['mascotas']]
+        assert sorted(ids) == sorted([mascota_disponible.id, mascota_en_proceso.id, extra.id])
+
+        # Sin cambios: la marca no avanza
+        paginas, misma = self.sincronizar(client, '/api/mascotas/cambios', marca)
+        assert paginas[0]['mascotas'] == [] and misma == marca
+
+        # Modificación (también por UPDATE masivo) y borrado desde el panel
+        db.session.execute(db.update(Mascota).where(Mascota.id == mascota_disponible.id).values(estado='adoptado'))
+        db.session.commit()
+        client.post(f'/mascotas/admin/eliminar/{extra.id}')
+
+        paginas, _ = self.sincronizar(client, '/api/mascotas/cambios', marca)
+        assert [m['estado'] for m in paginas[0]['mascotas']] == ['adoptado']
+        assert paginas[0]['eliminadas'] == [extra.id]
+
+    def test_mascotas_cambios_campos(self, client, mascota_disponible):
+        """Admite fields= y rechaza marcas no válidas."""
+        data = client.get('/api/mascotas/cambios?fields=nombre').get_json()
+        assert data['mascotas'] == [{'id': mascota_disponible.id, 'nombre': 'Cerbero'}]
+
+        assert client.get('/api/mascotas/cambios?desde=ayer').status_code == 400
+        assert client.get('/api/mascotas/cambios?fields=foo').status_code == 400
+
+    def test_margen(self, app, client, mascota_disponible):
+        """Los cambios más recientes que el margen se entregan en la siguiente llamada."""
+        app.config['CAMBIOS_MARGEN_SEGUNDOS'] = 60
+
+        data = client.get('/api/mascotas/cambios').get_json()
+        assert data['mascotas'] == [] and data['siguiente'] is None
+
+    def test_fecha_de_la_base_de_datos(self, mascota_disponible):
+        """fecha_actualizacion la pone el reloj de la base de datos en el propio UPDATE."""
+        from app.models import ahora_utc
+
+        antes = db.session.scalar(db.select(ahora_utc()))
+        db.session.execute(db.update(Mascota).where(Mascota.id == mascota_disponible.id).values(estado='adoptado'))
+        despues = db.session.scalar(db.select(ahora_utc()))
+        db.session.commit()
+
+        fecha = db.session.scalar(db.select(Mascota.fecha_actualizacion).where(Mascota.id == mascota_disponible.id))
+        assert antes <= fecha <= despues
+
+    def test_mis_solicitudes_cambios(self, client, usuario_admin, solicitud_pendiente):
+        """/mias/cambios devuelve las solicitudes del usuario modificadas tras la marca."""
+        headers = {'Authorization': f'Bearer {self.get_token(client)}'}
+
+        data = client.get('/api/solicitudes/mias/cambios', headers=headers).get_json()
+        assert [s['id'] for s in data['solicitudes']] == [solicitud_pendiente.id]
+
+        data = client.get(f"/api/solicitudes/mias/cambios?desde={data['siguiente']}", headers=headers).get_json()
+        assert data['solicitudes'] == []
+
+        solicitud_pendiente.rechazar(usuario_admin.id, 'No')
+        data = client.get(f"/api/solicitudes/mias/cambios?desde={data['siguiente']}", headers=headers).get_json()
+        assert [s['estado'] for s in data['solicitudes']] == ['rechazada']
+
+        assert client.get('/api/solicitudes/mias/cambios').status_code == 401
@@ -0,0 +1,139 @@
+"""
+Tests para el arranque de la app (app/arranque.py).
+
+Tests incluidos:
+- Dependencias pesadas sin importar tras create_app
+- create_all solo con CREAR_TABLAS
+- Fases de create_app y `flask startup-profile`
+- Reinicio tras el fork de gunicorn y gunicorn.conf.py
+- Migración incremental (scripts_bd/04_migracion.sql) al día con los modelos
+"""
+
+import os
+import re
+import runpy
+import subprocess
+import sys
+
+from sqlalchemy import inspect
+
+from config import TestingConfig
+from app import create_app, db
+from app.arranque import parsear_importtime, reiniciar_tras_fork
+
+
+class TestArranque:
+    """Tests del arranque en frío."""
+
+    def test_importaciones_diferidas(self):
+        """boto3, Authlib (cliente OAuth) y NumPy no se importan al arrancar."""
+        script = (
+            "import sys\n"
+            "from app import create_app\n"
+            "create_app('testing')\n"
+            "print(','.join(m for m in ('boto3', 'numpy', 'authlib.integrations.flask_client', 'a2wsgi')"
+            " if m in sys.modules))\n"
+        )
+        salida = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+
+        assert salida.stdout.strip() == ''
+
+    def test_sin_crear_tablas(self, monkeypatch):
+        """Con CREAR_TABLAS=False create_app no toca el esquema."""
+        monkeypatch.setattr(TestingConfig, 'CREAR_TABLAS', False)
+        app = create_app('testing')
+
+        with app.app_context():
+            assert inspect(db.engine).get_table_names() == []
+
+    def test_migracion_cubre_los_modelos(self, app):
+        """04_migracion.sql crea las tablas y columnas que no tenía el esquema inicial."""
+        ruta = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'scripts_bd', '04_migracion.sql')
+        with open(ruta, encoding='utf-8') as f:
+            sql = f.read()
+
+        creadas = {}
+        for tabla, cuerpo in re.findall(r'CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\);', sql, re.S):
+            lineas = [linea.split()[0] for linea in cuerpo.strip().splitlines() if linea.strip()]
+            creadas[tabla] = {columna for columna in lineas if columna not in ('PRIMARY', 'CONSTRAINT')}
+        nuevas = set(re.findall(r'ALTER TABLE (\w+) ADD COLUMN IF NOT EXISTS (\w+)', sql))
+
+        for tabla in db.metadata.sorted_tables:
+            columnas = {columna.name for columna in tabla.columns}
+            if tabla.name in creadas:
+                assert creadas[tabla.name] == columnas, tabla.name
+            else:
+                # Tablas del esquema inicial
+                assert tabla.name in ('usuarios', 'mascotas', 'solicitudes')
+
+        assert nuevas == {
+            ('usuarios', 'token_version'),
+            ('mascotas', 'fecha_actualizacion'),
+            ('solicitudes', 'puntuacion'),
+            ('solicitudes', 'puntuacion_version'),
+            ('solicitudes', 'fecha_actualizacion')
+        }
+
+    def test_fases(self, app):
+        """create_app guarda el tiempo de cada fase."""
+        fases = [fase for fase, _ in app.extensions['arranque'].fases]
+
+        assert fases == ['configuracion', 'extensiones', 'oidc', 'modelos', 'blueprints', 'esquema', 'rutas']
+
+    def test_parsear_importtime(self):
+        """Se leen módulo, nivel y tiempo acumulado; la cabecera se ignora."""
+        salida = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |     flask.json\n'
+            'import time:      1500 |       3000 |   flask\n'
+            'import time:       900 |       4000 | app\n'
+        )
+
+        assert parsear_importtime(salida) == [('flask.json', 2, 0.00012), ('flask', 1, 0.003), ('app', 0, 0.004)]
+
+    def test_comando_startup_profile(self, runner):
+        """`flask startup-profile` muestra la importación y las fases."""
+        resultado = runner.invoke(args=['startup-profile', '--config', 'testing', '--top', '3'])
+
+        assert resultado.exit_code == 0
+        assert 'Importación de app' in resultado.output
+        assert 'blueprints' in resultado.output
+
+    def test_reiniciar_tras_fork(self, app):
+        """El worker no hereda clientes, pools ni suscripciones del maestro."""
+        oidc = app.extensions['oidc']
+        adaptador = oidc.adaptador
+        broker = app.extensions['eventos']
+        broker.suscribir(1)
+        app.extensions['s3'] = object()
+
+        reiniciar_tras_fork(app)
+
+        assert 's3' not in app.extensions
+        assert oidc.adaptador is not adaptador
+        assert not broker._colas
+        assert app.extensions['asincrono'].engine is None
+
+    def test_configuracion_gunicorn(self, monkeypatch):
+        """gunicorn.conf.py: preload, gthread por defecto, max_requests con jitter y workers según las CPUs."""
+        ruta = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+        monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+        monkeypatch.delenv('GUNICORN_PRELOAD', raising=False)
+        monkeypatch.delenv('GUNICORN_WORKER_CLASS', raising=False)
+
+        config = runpy.run_path(ruta)
+
+        # gthread por defecto aunque uvicorn esté instalado
+        assert config['preload_app'] is True
+        assert config['worker_class'] == 'gthread'
+        assert config['wsgi_app'] == 'run:app'
+        assert config['workers'] == 2 * config['CPUS'] + 1
+        assert config['max_requests'] > 0 and config['max_requests_jitter'] > 0
+
+        monkeypatch.setenv('GUNICORN_WORKER_CLASS', 'uvicorn')
+        monkeypatch.setenv('WEB_CONCURRENCY', '3')
+        config = runpy.run_path(ruta)
+
+        assert config['worker_class'] == 'uvicorn.workers.UvicornWorker'
+        assert config['wsgi_app'] == 'asgi:app'
+        assert config['workers'] == 3
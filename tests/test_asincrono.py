@@ -0,0 +1,143 @@
+"""
+Tests para la ruta async de lectura de la API (app/asincrono.py).
+
+Tests incluidos:
+- Misma respuesta que la ruta síncrona (lista, filtros, ?fields=, detalle)
+- Errores 400 y 404
+- Rutas que se delegan en la app WSGI
+- Benchmark síncrona frente a async
+"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('a2wsgi')
+
+from config import TestingConfig
+from app import create_app, db
+from app.asincrono import AppASGI, comparar_rendimiento, peticion_asgi, url_async
+from app.models import Mascota
+
+
+@pytest.fixture
+def app_fichero(tmp_path, monkeypatch):
+    """
+    App de testing con la BD SQLite en un fichero.
+
+    El engine async abre sus propias conexiones: con SQLite en memoria
+    vería una BD vacía.
+    """
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    app = create_app('testing')
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Mascota(nombre='Luna', especie='Perro', tamano='Grande', descripcion='Tranquila'),
+            Mascota(nombre='Michi', especie='Gato', descripcion='Curioso', tamano='Pequeño'),
+            Mascota(nombre='Rocky', especie='Perro', descripcion='Activo', estado='adoptado')
+        ])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def pedir(app, ruta, query=b''):
+    """Petición GET a la app ASGI; devuelve (código, cabeceras, cuerpo)."""
+    aplicacion = AppASGI(app)
+
+    async def peticion():
+        try:
+            return await peticion_asgi(aplicacion, ruta, query)
+        finally:
+            await app.extensions['asincrono'].cerrar()
+
+    return asyncio.run(peticion())
+
+
+class TestRutaAsync:
+    """Tests de AppASGI y las vistas async."""
+
+    def test_url_async(self):
+        """La URL síncrona se traduce al driver async; SQLite en memoria no vale."""
+        assert url_async('sqlite:///datos.db') == 'sqlite+aiosqlite:///datos.db'
+        assert url_async('postgresql://u:p@bd/adopciones') == 'postgresql+asyncpg://u:p@bd/adopciones'
+        with pytest.raises(ValueError):
+            url_async('sqlite:///:memory:')
+
+    def test_lista_igual_que_sincrona(self, app_fichero):
+        """La lista async devuelve lo mismo que la síncrona, con filtros y ?fields=."""
+        cliente = app_fichero.test_client()
+
+        for query in (b'', b'especie=Perro', b'fields=id,nombre'):
+            codigo, cabeceras, cuerpo = pedir(app_fichero, '/api/mascotas/', query)
+            sincrona = cliente.get(f'/api/mascotas/?{query.decode()}')
+
+            assert codigo == 200
+            assert cabeceras['content-type'] == 'application/json'
+            assert json.loads(cuerpo) == sincrona.get_json()
+
+    def test_detalle(self, app_fichero):
+        """El detalle async coincide con el síncrono y devuelve 404 si no existe."""
+        with app_fichero.app_context():
+            mascota_id = Mascota.query.filter_by(nombre='Luna').first().id
+
+        codigo, _, cuerpo = pedir(app_fichero, f'/api/mascotas/{mascota_id}')
+        assert codigo == 200
+        assert json.loads(cuerpo) == app_fichero.test_client().get(f'/api/mascotas/{mascota_id}').get_json()
+
+        codigo, _, _ = pedir(app_fichero, '/api/mascotas/9999')
+        assert codigo == 404
+
+    def test_campos_invalidos(self, app_fichero):
+        """Un ?fields= con campos desconocidos devuelve 400 como en la ruta síncrona."""
+        codigo, _, cuerpo = pedir(app_fichero, '/api/mascotas/', b'fields=nombre,password')
+
+        assert codigo == 400
+        assert 'error' in json.loads(cuerpo)
+
+    def test_pasa_por_hooks_de_flask(self, app_fichero):
+        """La respuesta async pasa por el rate limiting y el resto de hooks."""
+        app_fichero.config['RATELIMIT_API_IP'] = '1/minute'
+
+        assert pedir(app_fichero, '/api/mascotas/')[0] == 200
+        assert pedir(app_fichero, '/api/mascotas/')[0] == 429
+
+    def test_hooks_fuera_del_bucle(self, app_fichero):
+        """Los hooks se ejecutan en otro hilo y un abort() en ellos respeta su código."""
+        import threading
+        from flask import abort, request
+
+        hilos = []
+
+        @app_fichero.before_request
+        def bloquear():
+            hilos.append(threading.current_thread())
+            if request.args.get('bloquear'):
+                abort(403)
+
+        assert pedir(app_fichero, '/api/mascotas/')[0] == 200
+        assert pedir(app_fichero, '/api/mascotas/', b'bloquear=1')[0] == 403
+        assert threading.main_thread() not in hilos
+
+    def test_resto_de_rutas_en_wsgi(self, app_fichero):
+        """Las rutas sin vista async las atiende la app Flask."""
+        codigo, _, cuerpo = pedir(app_fichero, '/api/mascotas/batch', b'ids=1,2')
+        assert codigo == 200
+        assert len(json.loads(cuerpo)) == 2
+
+        assert pedir(app_fichero, '/no-existe')[0] == 404
+
+    def test_benchmark(self, app_fichero):
+        """El benchmark mide las dos rutas."""
+        resultado = comparar_rendimiento(app_fichero, peticiones=20, concurrencia=10, hilos=2, latencia_ms=1)
+
+        assert resultado['sincrona'] > 0
+        assert resultado['async'] > 0
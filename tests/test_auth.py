@@ -237,3 +237,152 @@ class TestModelo:
         assert 'Usuario' in repr_str
         assert 'adoptante@test.com' in repr_str
         assert 'adoptante' in repr_str
+
+
+class TestCacheSesion:
+    """Tests para la caché de usuarios de sesión (Flask-Login)."""
+
+    def test_carga_proyeccion_y_cachea(self, app, usuario_adoptante):
+        """Test: El user_loader devuelve una proyección y la guarda en caché."""
+        from app.cache import cargar_usuario_sesion, UsuarioSesion
+
+        with app.test_request_context():
+            usuario = cargar_usuario_sesion(usuario_adoptante.id)
+
+        assert isinstance(usuario, UsuarioSesion)
+        assert usuario.email == 'adoptante@test.com'
+        assert usuario.is_admin() is False
+        assert len(app.extensions['usuario_cache']) == 1
+
+    def test_invalidacion_al_modificar(self, app, usuario_adoptante):
+        """Test: Modificar un usuario invalida su entrada en caché."""
+        from app.cache import cargar_usuario_sesion
+
+        with app.test_request_context():
+            cargar_usuario_sesion(usuario_adoptante.id)
+
+            usuario_adoptante.nombre = 'Pepe Nuevo'
+            db.session.commit()
+
+            assert len(app.extensions['usuario_cache']) == 0
+            assert cargar_usuario_sesion(usuario_adoptante.id).nombre == 'Pepe Nuevo'
+
+    def test_usuario_desactivado_no_se_carga(self, app, usuario_adoptante):
+        """Test: Un usuario desactivado no se carga (Flask-Login cierra su sesión)."""
+        from app.cache import cargar_usuario_sesion
+
+        with app.test_request_context():
+            assert cargar_usuario_sesion(usuario_adoptante.id) is not None
+
+            usuario_adoptante.activo = False
+            db.session.commit()
+
+            assert cargar_usuario_sesion(usuario_adoptante.id) is None
+
+
+class TestRateLimit:
+    """Tests para el límite de intentos de login."""
+
+    def test_login_limitado_por_cuenta(self, client, usuario_adoptante):
+        """Test: Tras 5 intentos fallidos de la misma cuenta se responde 429."""
+        for _ in range(5):
+            response = client.post('/auth/login', data={
+                'email': 'adoptante@test.com',
+                'password': 'incorrecta'
+            })
+            assert response.status_code == 200
+
+        response = client.post('/auth/login', data={
+            'email': 'adoptante@test.com',
+            'password': 'password123'
+        })
+
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert 'Demasiados intentos' in response.data.decode()
+
+    def test_limite_por_ip_detras_de_proxy(self, monkeypatch):
+        """Test: Con PROXY_SALTOS cada cliente de X-Forwarded-For tiene su propio límite."""
+        from config import TestingConfig
+        from app import create_app
+
+        monkeypatch.setattr(TestingConfig, 'PROXY_SALTOS', 1)
+        monkeypatch.setattr(TestingConfig, 'RATELIMIT_API_IP', '2/minute')
+        app = create_app('testing')
+        client = app.test_client()
+
+        def pedir(ip):
+            return client.get('/api/mascotas/', headers={'X-Forwarded-For': ip}).status_code
+
+        with app.app_context():
+            assert [pedir('203.0.113.1') for _ in range(3)] == [200, 200, 429]
+            # Otro cliente detrás del mismo proxy no comparte el contador
+            assert pedir('203.0.113.2') == 200
+            db.session.remove()
+            db.drop_all()
+
+    def test_backend_sql_comparte_contadores(self, app):
+        """Test: El backend SQL cuenta las peticiones en la BD."""
+        from app.ratelimit import SQLBackend
+
+        backend = SQLBackend(app)
+        assert backend.golpear('login_ip:1.2.3.4', 600, 60) == (0, 1)
+        assert backend.golpear('login_ip:1.2.3.4', 600, 60) == (0, 2)
+
+        # En la ventana siguiente, la anterior cuenta como 'anterior'
+        assert backend.golpear('login_ip:1.2.3.4', 660, 60) == (2, 1)
+
+
+class TestGoogleOAuth:
+    """Tests para el login con Google contra el proveedor OpenID local."""
+
+    def test_login_google_crea_usuario(self, client):
+        """Test: El flujo OAuth completo crea el usuario sin salir a la red."""
+        response = client.get('/auth/google', follow_redirects=True)
+
+        assert response.status_code == 200
+        assert 'Bienvenido' in response.data.decode()
+
+        usuario = Usuario.query.filter_by(email='oidc.local@example.com').first()
+        assert usuario is not None
+        assert usuario.oauth_provider == 'google'
+
+    def test_proveedor_local_solo_en_desarrollo(self, monkeypatch):
+        """Test: Producción no activa el proveedor local y fuera de testing/debug no se registra."""
+        from flask import Flask
+        from config import ProductionConfig
+        from app.oidc_local import init_proveedor_local
+
+        monkeypatch.setenv('OIDC_LOCAL_PROVIDER', 'true')
+        assert ProductionConfig.OIDC_LOCAL_PROVIDER is False
+
+        app = Flask(__name__)
+        app.config['OIDC_LOCAL_EMAIL'] = 'x@example.com'
+        with pytest.raises(RuntimeError):
+            init_proveedor_local(app)
+
+    def test_proveedor_local_sin_redireccion_abierta(self, client):
+        """Test: /oidc-local/authorize solo redirige a la propia app."""
+        response = client.get('/oidc-local/authorize?redirect_uri=https://evil.example/cb')
+
+        assert response.status_code == 400
+
+    def test_documento_cacheado_en_disco(self, tmp_path):
+        """Test: Discovery se descarga una vez y se reutiliza desde disco."""
+        from app.oidc import DocumentoCacheado
+
+        descargas = []
+
+        def descargar(url):
+            descargas.append(url)
+            return {'issuer': 'https://ejemplo'}
+
+        url = 'https://ejemplo/.well-known/openid-configuration'
+        doc = DocumentoCacheado(url, 3600, descargar, str(tmp_path))
+        assert doc.obtener() == {'issuer': 'https://ejemplo'}
+        assert doc.obtener() == {'issuer': 'https://ejemplo'}
+
+        # Un nuevo worker lee la copia de disco sin descargar
+        otro = DocumentoCacheado(url, 3600, descargar, str(tmp_path))
+        assert otro.obtener() == {'issuer': 'https://ejemplo'}
+        assert len(descargas) == 1
@@ -0,0 +1,106 @@
+"""
+Tests para la compresión de respuestas (app/compresion.py).
+
+Tests incluidos:
+- Negociación de Accept-Encoding y umbral mínimo
+- ETag por variante y 304
+- Caché de las variantes comprimidas
+"""
+
+import gzip
+import json
+
+import pytest
+
+from app import compresion
+from app.models import Mascota
+
+
+@pytest.fixture
+def mascotas(app):
+    """Fixture con mascotas suficientes para superar el umbral de compresión."""
+    from app import db
+
+    for i in range(10):
+        db.session.add(Mascota(nombre=f'Mascota {i}', especie='Perro', descripcion='Descripción larga ' * 5))
+    db.session.commit()
+
+
+class TestCompresion:
+    """Tests del compresor de respuestas."""
+
+    def test_gzip_negociado(self, client, mascotas):
+        """Con Accept-Encoding: gzip la respuesta va comprimida y es equivalente."""
+        normal = client.get('/api/mascotas/')
+        comprimida = client.get('/api/mascotas/', headers={'Accept-Encoding': 'gzip'})
+
+        assert 'Content-Encoding' not in normal.headers
+        assert comprimida.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in comprimida.headers['Vary']
+        assert len(comprimida.data) < len(normal.data)
+        assert json.loads(gzip.decompress(comprimida.data)) == normal.get_json()
+
+    def test_html_comprimido(self, client, mascotas):
+        """El catálogo HTML también se comprime."""
+        response = client.get('/mascotas/', headers={'Accept-Encoding': 'gzip, deflate'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert b'Mascota 3' in gzip.decompress(response.data)
+
+    def test_umbral_minimo(self, app, client, mascotas):
+        """Las respuestas por debajo de COMPRESION_MINIMO_BYTES no se comprimen."""
+        app.config['COMPRESION_MINIMO_BYTES'] = 10 ** 6
+
+        response = client.get('/api/mascotas/', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_no_aceptada(self, client, mascotas):
+        """gzip;q=0 o codificaciones desconocidas no comprimen."""
+        for cabecera in ('gzip;q=0', 'identity', 'compress'):
+            response = client.get('/api/mascotas/', headers={'Accept-Encoding': cabecera})
+            assert 'Content-Encoding' not in response.headers
+
+    def test_etag_por_variante_y_304(self, client, mascotas):
+        """Cada variante tiene su ETag y If-None-Match devuelve 304 sin cuerpo."""
+        normal = client.get('/api/mascotas/')
+        comprimida = client.get('/api/mascotas/', headers={'Accept-Encoding': 'gzip'})
+
+        etag = comprimida.headers['ETag']
+        assert etag.endswith('-gzip"')
+        assert normal.headers['ETag'] != etag
+
+        response = client.get('/api/mascotas/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+        # El ETag de la variante comprimida no vale para la normal
+        response = client.get('/api/mascotas/', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+
+    def test_variante_comprimida_una_vez(self, app, client, mascotas, monkeypatch):
+        """Si el contenido no cambia, cada variante se comprime una sola vez."""
+        llamadas = []
+        original = compresion.comprimir
+
+        def contar(datos, codificacion, config):
+            llamadas.append(codificacion)
+            return original(datos, codificacion, config)
+
+        monkeypatch.setattr(compresion, 'comprimir', contar)
+
+        primera = client.get('/api/mascotas/', headers={'Accept-Encoding': 'gzip'})
+        segunda = client.get('/api/mascotas/', headers={'Accept-Encoding': 'gzip'})
+        assert llamadas == ['gzip']
+        assert segunda.data == primera.data
+
+        # Contenido distinto: ETag distinto, se comprime de nuevo
+        client.get('/api/mascotas/?fields=nombre,descripcion', headers={'Accept-Encoding': 'gzip'})
+        assert llamadas == ['gzip', 'gzip']
+
+    @pytest.mark.skipif(compresion.brotli is None, reason='brotli no instalado')
+    def test_brotli_preferido(self, client, mascotas):
+        """Con brotli instalado se prefiere br a igual calidad."""
+        response = client.get('/api/mascotas/', headers={'Accept-Encoding': 'gzip, br'})
+
+        assert response.headers['Content-Encoding'] == 'br'
+        assert json.loads(compresion.brotli.decompress(response.data))
@@ -0,0 +1,206 @@
+"""
+Tests para las notificaciones por email.
+
+Tests incluidos:
+- Emails encolados en la misma transacción (nueva solicitud, revisión)
+- Envío por lotes con una sola conexión SMTP
+- Reintentos y dead letter
+- Resumen diario para administradores
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Mascota, Notificacion, NotificacionFallida, ResumenEnviado, Solicitud, Usuario
+from app.notificaciones import generar_resumen_diario, procesar_lote
+
+
+class TestEncolar:
+    """Tests de emails encolados con los cambios de las solicitudes."""
+
+    def test_nueva_solicitud_avisa_admins(self, app, usuario_admin, usuario_adoptante, mascota_disponible):
+        """Test: Con el aviso inmediato activado, se encola un email por admin."""
+        app.config['NOTIFICAR_ADMINS_NUEVA_SOLICITUD'] = True
+        Solicitud.crear(usuario_adoptante.id, mascota_disponible.id, {'vivienda_tipo': 'casa'})
+
+        notificaciones = Notificacion.query.all()
+        assert [n.destinatario for n in notificaciones] == ['admin@test.com']
+        assert 'Cerbero' in notificaciones[0].asunto
+
+    def test_aviso_admins_desactivable(self, app, usuario_admin, usuario_adoptante, mascota_disponible):
+        """Test: Por defecto los admins no reciben un email por solicitud."""
+        Solicitud.crear(usuario_adoptante.id, mascota_disponible.id)
+
+        assert Notificacion.query.count() == 0
+
+    def test_rollback_descarta_email(self, app, usuario_admin, solicitud_pendiente, usuario_adoptante):
+        """Test: Si la solicitud falla (duplicada) no queda email en la bandeja."""
+        from app.models import ConflictoSolicitud
+
+        app.config['NOTIFICAR_ADMINS_NUEVA_SOLICITUD'] = True
+        mascota = solicitud_pendiente.mascota
+        mascota.estado = 'disponible'
+        db.session.commit()
+
+        with pytest.raises(ConflictoSolicitud):
+            Solicitud.crear(usuario_adoptante.id, mascota.id)
+
+        assert Notificacion.query.count() == 0
+
+    def test_aprobar_avisa_adoptante_y_competidores(self, app, solicitud_pendiente, usuario_admin):
+        """Test: Aprobar avisa al adoptante y a los solicitantes rechazados."""
+        otro = Usuario(email='otro@test.com', nombre='Otro', password='pass123')
+        db.session.add(otro)
+        db.session.flush()
+        db.session.add(Solicitud(usuario_id=otro.id, mascota_id=solicitud_pendiente.mascota_id))
+        db.session.commit()
+
+        solicitud_pendiente.aprobar(usuario_admin.id, 'Todo correcto')
+
+        asuntos = {n.destinatario: n.asunto for n in Notificacion.query.all()}
+        assert 'aprobada' in asuntos['adoptante@test.com']
+        assert 'rechazada' in asuntos['otro@test.com']
+
+    def test_revisar_no_envia_en_la_peticion(self, client, auth_headers_admin, solicitud_pendiente, servidor_smtp):
+        """Test: admin_revisar solo encola; el envío ocurre fuera de la petición."""
+        client.post(f'/solicitudes/admin/revisar/{solicitud_pendiente.id}', data={
+            'accion': 'rechazar',
+            'comentarios': 'Espacio insuficiente'
+        })
+
+        assert servidor_smtp.mensajes == []
+        assert Notificacion.query.count() == 1
+
+        assert procesar_lote() == 1
+        destinatarios, texto = servidor_smtp.mensajes[0]
+        assert destinatarios == ['adoptante@test.com']
+        assert 'Espacio insuficiente' in texto
+
+
+class TestEnvio:
+    """Tests del envío de la bandeja de salida."""
+
+    def encolar(self, n, prefijo='destino'):
+        """Helper: encola n emails directamente."""
+        for i in range(n):
+            db.session.add(Notificacion(destinatario=f'{prefijo}{i}@test.com', asunto='Prueba', cuerpo='Hola'))
+        db.session.commit()
+
+    def test_lote_una_conexion(self, app, servidor_smtp):
+        """Test: Un lote se envía por una sola conexión SMTP y vacía la bandeja."""
+        self.encolar(5)
+
+        assert procesar_lote() == 5
+        assert servidor_smtp.conexiones == 1
+        assert len(servidor_smtp.mensajes) == 5
+        assert Notificacion.query.count() == 0
+
+    def test_reintento_y_dead_letter(self, app, servidor_smtp):
+        """Test: Un destinatario rechazado se reintenta y acaba en dead letter."""
+        app.config['NOTIFICACIONES_MAX_INTENTOS'] = 2
+        servidor_smtp.rechazar.add('destino1@test.com')
+        self.encolar(2)
+
+        assert procesar_lote() == 2
+        pendiente = Notificacion.query.one()
+        assert pendiente.destinatario == 'destino1@test.com'
+        assert pendiente.intentos == 1
+        assert pendiente.proximo_intento > datetime.utcnow()
+
+        # Aún no toca reintentarlo
+        assert procesar_lote() == 0
+
+        pendiente.proximo_intento = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert procesar_lote() == 1
+
+        assert Notificacion.query.count() == 0
+        fallida = NotificacionFallida.query.one()
+        assert fallida.destinatario == 'destino1@test.com'
+        assert fallida.intentos == 2
+        assert '550' in fallida.error
+
+    def test_servidor_caido_reintenta(self, app, servidor_smtp):
+        """Test: Si no se puede conectar, todo el lote queda para reintentar."""
+        self.encolar(3)
+        app.extensions['mail'].port = 1
+
+        assert procesar_lote() == 3
+        assert Notificacion.query.filter_by(intentos=1).count() == 3
+
+    def test_fallo_al_cerrar_no_reenvia(self, app, servidor_smtp, monkeypatch):
+        """Test: Si falla el QUIT, los emails ya enviados no se reintentan."""
+        import smtplib
+
+        def quit_roto(self):
+            raise smtplib.SMTPServerDisconnected('Conexión cerrada')
+
+        monkeypatch.setattr(smtplib.SMTP, 'quit', quit_roto)
+        servidor_smtp.rechazar.add('destino1@test.com')
+        self.encolar(3)
+
+        assert procesar_lote() == 3
+        assert len(servidor_smtp.mensajes) == 2
+        pendiente = Notificacion.query.one()
+        assert pendiente.destinatario == 'destino1@test.com'
+        assert pendiente.intentos == 1
+
+
+class TestResumenDiario:
+    """Tests del resumen diario de solicitudes pendientes."""
+
+    def crear_pendientes(self, mascota, n, dias=0):
+        """Helper: crea n solicitudes pendientes para una mascota."""
+        for i in range(n):
+            usuario = Usuario(email=f'{mascota.nombre}{i}-{dias}@test.com', nombre='Solicitante', password='pass123')
+            db.session.add(usuario)
+            db.session.flush()
+            solicitud = Solicitud(usuario_id=usuario.id, mascota_id=mascota.id)
+            solicitud.fecha_solicitud = datetime.utcnow() - timedelta(days=dias)
+            db.session.add(solicitud)
+        db.session.commit()
+
+    def test_agrupa_por_mascota(self, app, usuario_admin, mascota_disponible, servidor_smtp):
+        """Test: Un email por admin con las pendientes agrupadas y su antigüedad."""
+        otra = Mascota(nombre='Luna', especie='Gato', descripcion='Gata tranquila')
+        db.session.add(otra)
+        db.session.commit()
+        self.crear_pendientes(mascota_disponible, 2, dias=3)
+        self.crear_pendientes(otra, 1)
+
+        assert generar_resumen_diario() == 1
+        assert procesar_lote() == 1
+
+        destinatarios, texto = servidor_smtp.mensajes[0]
+        assert destinatarios == ['admin@test.com']
+        assert '3 pendientes, 3 nuevas' in texto
+        assert 'Cerbero (Perro): 2 pendientes, 2 nuevas. La más antigua lleva 3 días' in texto
+        assert 'Luna (Gato): 1 pendiente, 1 nueva.' in texto
+        assert texto.index('Cerbero') < texto.index('Luna')
+
+    def test_idempotente_por_dia(self, app, usuario_admin, mascota_disponible):
+        """Test: Generarlo dos veces el mismo día solo encola un resumen."""
+        self.crear_pendientes(mascota_disponible, 1)
+
+        assert generar_resumen_diario() == 1
+        assert generar_resumen_diario() == 0
+        assert Notificacion.query.count() == 1
+        assert ResumenEnviado.query.one().fecha == date.today()
+
+    def test_marca_nuevas_desde_el_anterior(self, app, usuario_admin, mascota_disponible):
+        """Test: El resumen siguiente solo cuenta como nuevas las posteriores."""
+        self.crear_pendientes(mascota_disponible, 2, dias=1)
+        generar_resumen_diario(hoy=date.today() - timedelta(days=1))
+        self.crear_pendientes(mascota_disponible, 1)
+
+        assert generar_resumen_diario() == 1
+        ultimo = Notificacion.query.order_by(Notificacion.id.desc()).first()
+        assert '3 solicitudes pendientes (1 nuevas)' in ultimo.asunto
+        assert ResumenEnviado.query.count() == 2
+
+    def test_sin_pendientes_no_envia(self, app, usuario_admin):
+        """Test: Sin solicitudes pendientes no se encola nada."""
+        assert generar_resumen_diario() == 0
+        assert Notificacion.query.count() == 0
@@ -8,8 +8,11 @@ Tests incluidos:
 - Validaciones y restricciones
 """
 
+import re
+from datetime import datetime, timedelta
+
 import pytest
-from app.models import Solicitud, Mascota
+from app.models import Solicitud, Mascota, Usuario
 from app import db
 
 
@@ -79,6 +82,103 @@ class TestCrearSolicitud:
         assert 'ya' in content or 'solicitud' in content
 
 
+class TestConcurrencia:
+    """Tests de creación de solicitudes simultáneas (sin doble reserva)."""
+
+    @pytest.fixture
+    def app_fichero(self, tmp_path, monkeypatch):
+        """App con SQLite en fichero: los hilos necesitan conexiones propias."""
+        from config import TestingConfig
+        from app import create_app
+
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f'sqlite:///{tmp_path}/stress.db')
+        monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_ENGINE_OPTIONS', {'connect_args': {'timeout': 30}}, raising=False)
+        app = create_app('testing')
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+    def test_sin_doble_reserva(self, app_fichero):
+        """Test: De muchas solicitudes simultáneas a una mascota solo una prospera."""
+        import threading
+        from app.models import Usuario, ConflictoSolicitud
+
+        hilos = 16
+        usuarios = [Usuario(email=f'stress_{i}@test.com', nombre=f'Stress {i}', password='pass123') for i in range(hilos)]
+        mascota = Mascota(nombre='Popular', especie='Perro', descripcion='Descripción de prueba')
+        db.session.add_all(usuarios + [mascota])
+        db.session.commit()
+        usuario_ids = [u.id for u in usuarios]
+        mascota_id = mascota.id
+
+        barrera = threading.Barrier(hilos)
+        resultados = []
+
+        def solicitar(usuario_id):
+            with app_fichero.app_context():
+                barrera.wait()
+                try:
+                    Solicitud.crear(usuario_id, mascota_id, {'motivo_adopcion': 'stress'})
+                    resultados.append('creada')
+                except ConflictoSolicitud:
+                    resultados.append('conflicto')
+                finally:
+                    db.session.remove()
+
+        threads = [threading.Thread(target=solicitar, args=(uid,)) for uid in usuario_ids]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        db.session.expire_all()
+        assert resultados.count('creada') == 1
+        assert resultados.count('conflicto') == hilos - 1
+        assert Solicitud.query.filter_by(mascota_id=mascota_id).count() == 1
+        assert db.session.get(Mascota, mascota_id).estado == 'en_proceso'
+
+    def test_duplicada_conflicto(self, app, usuario_adoptante, solicitud_pendiente):
+        """Test: Repetir la solicitud de una mascota disponible da conflicto, no error 500."""
+        from app.models import ConflictoSolicitud
+
+        mascota = solicitud_pendiente.mascota
+        mascota.estado = 'disponible'
+        db.session.commit()
+
+        with pytest.raises(ConflictoSolicitud):
+            Solicitud.crear(usuario_adoptante.id, mascota.id)
+
+        # El rollback deshace también la reserva
+        assert db.session.get(Mascota, mascota.id).estado == 'disponible'
+
+    def test_duplicada_sin_restriccion_unica(self, app, usuario_adoptante, solicitud_pendiente):
+        """Test: El duplicado se detecta antes del INSERT (sin depender de unique_usuario_mascota)."""
+        from sqlalchemy import event
+        from app.models import ConflictoSolicitud
+
+        solicitud_pendiente.rechazar(usuario_adoptante.id)
+        mascota = solicitud_pendiente.mascota
+        mascota.estado = 'disponible'
+        db.session.commit()
+
+        sentencias = []
+
+        def registrar(conn, cursor, sentencia, parametros, contexto, executemany):
+            sentencias.append(sentencia)
+
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            with pytest.raises(ConflictoSolicitud, match='Ya has enviado'):
+                Solicitud.crear(usuario_adoptante.id, mascota.id)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+
+        assert not any(s.startswith('INSERT INTO solicitudes') for s in sentencias)
+        assert db.session.get(Mascota, mascota.id).estado == 'disponible'
+
+
 class TestMisSolicitudes:
     """Tests para ver las solicitudes del usuario."""
 
@@ -197,6 +297,238 @@ class TestAdminPanel:
         assert 'Cerbero' in content or 'pendiente' in content.lower()
 
 
+class TestPaginacionAdmin:
+    """Tests de la cola admin paginada por cursor y los conteos por estado."""
+
+    def crear_solicitudes(self, n, estado='pendiente', fecha=None):
+        """Helper: crea n solicitudes (misma fecha si se indica) y devuelve sus IDs."""
+        from app.models import Usuario
+        ids = []
+        for i in range(n):
+            usuario = Usuario(email=f'cola_{estado}_{i}@test.com', nombre=f'Usuario {i}', password='pass123')
+            mascota = Mascota(nombre=f'Cola {estado} {i}', especie='Gato', descripcion='Descripción de prueba')
+            db.session.add_all([usuario, mascota])
+            db.session.flush()
+            solicitud = Solicitud(usuario_id=usuario.id, mascota_id=mascota.id)
+            solicitud.estado = estado
+            if fecha:
+                solicitud.fecha_solicitud = fecha
+            db.session.add(solicitud)
+            db.session.flush()
+            ids.append(solicitud.id)
+        db.session.commit()
+        return ids
+
+    def test_vista_por_defecto_pendientes(self, client, auth_headers_admin):
+        """Test: Sin filtro se muestran solo las pendientes."""
+        self.crear_solicitudes(1, estado='pendiente')
+        self.crear_solicitudes(1, estado='aprobada')
+
+        content = client.get('/solicitudes/admin').data.decode('utf-8')
+        assert 'Cola pendiente 0' in content
+        assert 'Cola aprobada 0' not in content
+
+        content = client.get('/solicitudes/admin?estado=todas').data.decode('utf-8')
+        assert 'Cola pendiente 0' in content
+        assert 'Cola aprobada 0' in content
+
+    def test_paginacion_por_cursor(self, app, client, auth_headers_admin):
+        """Test: Las páginas no repiten ni saltan filas aunque compartan fecha."""
+        app.config['SOLICITUDES_POR_PAGINA'] = 2
+        ids = self.crear_solicitudes(5, fecha=datetime(2024, 1, 1, 12, 0))
+
+        vistos = []
+        url = '/solicitudes/admin'
+        while url:
+            content = client.get(url).data.decode('utf-8')
+            vistos += [int(i) for i in re.findall(r'/solicitudes/admin/revisar/(\d+)"', content)]
+            match = re.search(r'href="([^"]*desde=[^"]*)"', content)
+            url = match.group(1).replace('&amp;', '&') if match else None
+
+        assert vistos == sorted(ids, reverse=True)
+
+    def test_cursor_invalido_primera_pagina(self, client, auth_headers_admin, solicitud_pendiente):
+        """Test: Un cursor mal formado vuelve a la primera página."""
+        response = client.get('/solicitudes/admin?desde=basura')
+        assert response.status_code == 200
+        assert 'Cerbero' in response.data.decode('utf-8')
+
+    def test_conteos_una_query_y_cache(self, app, auth_headers_admin):
+        """Test: Los conteos salen de un GROUP BY cacheado e invalidado al cambiar."""
+        from app.cache import conteos_solicitudes
+        from app.query_counter import ContadorConsultas
+
+        self.crear_solicitudes(2, estado='pendiente')
+        self.crear_solicitudes(1, estado='rechazada')
+
+        with ContadorConsultas(db.engine) as contador:
+            conteos = conteos_solicitudes()
+            conteos_solicitudes()
+        assert contador.total == 1
+        assert conteos == {'pendiente': 2, 'aprobada': 0, 'rechazada': 1, 'todas': 3}
+
+        self.crear_solicitudes(1, estado='aprobada')
+        assert conteos_solicitudes()['aprobada'] == 1
+
+
+class TestPuntuacion:
+    """Tests del motor de puntuación de cuestionarios."""
+
+    def test_puntuar_vectorizado(self):
+        """Test: Puntúa varios cuestionarios a la vez, aceptando 'si' y True."""
+        from app.scoring import puntuar
+
+        reglas = {'tiene_jardin': {True: 10}, 'horas_solo': {'0-4': 30, '4-8': 10}}
+        puntuaciones = puntuar([
+            {'tiene_jardin': True, 'horas_solo': '0-4'},
+            {'tiene_jardin': 'si', 'horas_solo': '4-8'},
+            {'tiene_jardin': 'no'},
+            None
+        ], reglas)
+
+        assert list(puntuaciones) == [100.0, 50.0, 0.0, 0.0]
+
+    def test_nueva_solicitud_puntuada(self, app, solicitud_pendiente):
+        """Test: La solicitud se puntúa al crearse."""
+        from app.scoring import version_reglas
+
+        assert solicitud_pendiente.puntuacion is not None
+        assert solicitud_pendiente.puntuacion_version == version_reglas(app.config['SCORING_REGLAS'])
+
+    def test_recalculo_incremental(self, app, solicitud_pendiente, usuario_admin):
+        """Test: Al cambiar las reglas solo se recalculan las pendientes."""
+        from app.scoring import actualizar_puntuaciones
+
+        revisada = TestPaginacionAdmin().crear_solicitudes(1, estado='aprobada')[0]
+        puntuacion_revisada = db.session.get(Solicitud, revisada).puntuacion
+
+        assert actualizar_puntuaciones() == 0
+
+        app.config['SCORING_REGLAS'] = {'tiene_jardin': {True: 1}}
+        assert actualizar_puntuaciones() == 1
+        assert actualizar_puntuaciones() == 0
+
+        db.session.expire_all()
+        assert solicitud_pendiente.puntuacion == 100.0
+        assert db.session.get(Solicitud, revisada).puntuacion == puntuacion_revisada
+
+    def test_cola_admin_por_puntuacion(self, app, client, auth_headers_admin):
+        """Test: ?orden=puntuacion muestra primero los mejores candidatos, paginado."""
+        app.config['SOLICITUDES_POR_PAGINA'] = 1
+        app.config['SCORING_REGLAS'] = {'horas_solo': {'0-4': 20, '4-8': 10}}
+        ids = TestPaginacionAdmin().crear_solicitudes(3)
+        for solicitud_id, horas in zip(ids, ['4-8', '0-4', '8+']):
+            db.session.get(Solicitud, solicitud_id).cuestionario_json = {'horas_solo': horas}
+        db.session.commit()
+        app.config['SCORING_REGLAS'] = {'horas_solo': {'0-4': 20, '4-8': 10, '8+': 0}}
+
+        # Las GET no puntúan: con las reglas nuevas hace falta el comando
+        client.get('/solicitudes/admin?orden=puntuacion')
+        assert db.session.get(Solicitud, ids[1]).puntuacion == 0.0
+        app.test_cli_runner().invoke(args=['puntuar-solicitudes'])
+
+        # Una solicitud sin puntuar va al final (NULLS LAST) y no rompe el cursor
+        from app.models import Usuario
+        usuario = Usuario(email='sin_puntuar@test.com', nombre='Sin puntuar', password='pass123')
+        mascota = Mascota(nombre='Sin puntuar', especie='Gato', descripcion='Descripción de prueba')
+        db.session.add_all([usuario, mascota])
+        db.session.flush()
+        solicitud = Solicitud(usuario_id=usuario.id, mascota_id=mascota.id)
+        db.session.add(solicitud)
+        db.session.flush()
+        sin_puntuar = solicitud.id
+        db.session.execute(db.update(Solicitud).where(Solicitud.id == sin_puntuar).values(puntuacion=None))
+        db.session.commit()
+
+        vistos = []
+        url = '/solicitudes/admin?orden=puntuacion'
+        while url:
+            content = client.get(url).data.decode('utf-8')
+            vistos += [int(i) for i in re.findall(r'/solicitudes/admin/revisar/(\d+)"', content)]
+            match = re.search(r'href="([^"]*desde=[^"]*)"', content)
+            url = match.group(1).replace('&amp;', '&') if match else None
+
+        assert vistos == [ids[1], ids[0], ids[2], sin_puntuar]
+
+
+class TestFiltrosCuestionario:
+    """Tests de las respuestas tipadas del cuestionario y sus filtros."""
+
+    def test_extraer_respuestas_tipadas(self):
+        """Test: Las respuestas conocidas se tipan; las no válidas quedan a None."""
+        from app.models import RespuestasCuestionario
+
+        valores = RespuestasCuestionario.extraer({
+            'vivienda_tipo': 'Casa',
+            'tiene_jardin': 'si',
+            'compromiso_gastos': False,
+            'horas_solo': '4-6 horas'
+        })
+
+        assert valores['vivienda_tipo'] == 'casa'
+        assert valores['tiene_jardin'] is True
+        assert valores['compromiso_gastos'] is False
+        assert valores['horas_solo'] is None
+        assert valores['tiene_mascotas'] is None
+
+    def test_respuestas_sincronizadas(self, app, solicitud_pendiente):
+        """Test: Cambiar el cuestionario actualiza sus respuestas tipadas."""
+        assert solicitud_pendiente.respuestas.tiene_jardin is True
+
+        solicitud_pendiente.cuestionario_json = {'tiene_jardin': 'no', 'horas_solo': '8+'}
+        db.session.commit()
+        db.session.expire_all()
+
+        assert solicitud_pendiente.respuestas.tiene_jardin is False
+        assert solicitud_pendiente.respuestas.horas_solo == '8+'
+
+    def test_filtro_admin(self, client, auth_headers_admin):
+        """Test: El panel admin filtra por jardín y horas solo."""
+        ids = TestPaginacionAdmin().crear_solicitudes(3)
+        cuestionarios = [
+            {'tiene_jardin': 'si', 'horas_solo': '0-4'},
+            {'tiene_jardin': 'si', 'horas_solo': '8+'},
+            {'tiene_jardin': 'no', 'horas_solo': '0-4'}
+        ]
+        for solicitud_id, cuestionario in zip(ids, cuestionarios):
+            db.session.get(Solicitud, solicitud_id).cuestionario_json = cuestionario
+        db.session.commit()
+
+        content = client.get('/solicitudes/admin?tiene_jardin=si&horas_solo=0-4').data.decode('utf-8')
+        vistos = [int(i) for i in re.findall(r'/solicitudes/admin/revisar/(\d+)"', content)]
+        assert vistos == [ids[0]]
+
+        content = client.get('/solicitudes/admin?horas_solo=0-4,4-8').data.decode('utf-8')
+        vistos = [int(i) for i in re.findall(r'/solicitudes/admin/revisar/(\d+)"', content)]
+        assert sorted(vistos) == [ids[0], ids[2]]
+
+    def test_rellenar_respuestas(self, client, runner, auth_headers_admin):
+        """Test: `flask rellenar-respuestas` crea las que faltan y los filtros las encuentran."""
+        from app.models import RespuestasCuestionario
+
+        ids = TestPaginacionAdmin().crear_solicitudes(3)
+        for solicitud_id in ids[:2]:
+            db.session.get(Solicitud, solicitud_id).cuestionario_json = {'tiene_jardin': 'si'}
+        db.session.commit()
+        # Solicitudes anteriores a la tabla: sin respuestas tipadas
+        db.session.execute(db.delete(RespuestasCuestionario).where(RespuestasCuestionario.solicitud_id.in_(ids[:2])))
+        db.session.commit()
+
+        content = client.get('/solicitudes/admin?tiene_jardin=si').data.decode('utf-8')
+        assert re.findall(r'/solicitudes/admin/revisar/(\d+)"', content) == []
+
+        resultado = runner.invoke(args=['rellenar-respuestas', '--lote', '1'])
+        assert resultado.exit_code == 0
+        assert '2 solicitudes' in resultado.output
+
+        content = client.get('/solicitudes/admin?tiene_jardin=si').data.decode('utf-8')
+        vistos = [int(i) for i in re.findall(r'/solicitudes/admin/revisar/(\d+)"', content)]
+        assert sorted(vistos) == ids[:2]
+
+        # Una segunda pasada no crea nada
+        assert RespuestasCuestionario.rellenar() == 0
+
+
 class TestRevisarSolicitud:
     """Tests para revisar y aprobar/rechazar solicitudes."""
 
@@ -285,6 +617,53 @@ class TestModelo:
         mascota = Mascota.query.get(solicitud_pendiente.mascota_id)
         assert mascota.estado == 'adoptado'
 
+    def crear_competidoras(self, mascota_id, n):
+        """Helper: crea n solicitudes pendientes de otros usuarios para la mascota."""
+        from app.models import Usuario
+        ids = []
+        for i in range(n):
+            usuario = Usuario(email=f'competidor_{i}@test.com', nombre=f'Competidor {i}', password='pass123')
+            db.session.add(usuario)
+            db.session.flush()
+            solicitud = Solicitud(usuario_id=usuario.id, mascota_id=mascota_id)
+            db.session.add(solicitud)
+            db.session.flush()
+            ids.append(solicitud.id)
+        db.session.commit()
+        return ids
+
+    def test_aprobar_rechaza_competidoras(self, app, solicitud_pendiente, usuario_admin):
+        """Test: Aprobar rechaza el resto de pendientes de la mascota en la misma transacción."""
+        from sqlalchemy import event
+        from app.models import COMENTARIO_RECHAZO_ADOPTADA
+
+        ids = self.crear_competidoras(solicitud_pendiente.mascota_id, 3)
+
+        commits = []
+        sesion = db.session()
+        registrar = commits.append
+        event.listen(sesion, 'after_commit', registrar)
+        try:
+            rechazadas = solicitud_pendiente.aprobar(usuario_admin.id, 'Aprobada')
+        finally:
+            event.remove(sesion, 'after_commit', registrar)
+
+        assert rechazadas == 3
+        assert len(commits) == 1
+        for solicitud_id in ids:
+            competidora = db.session.get(Solicitud, solicitud_id)
+            assert competidora.estado == 'rechazada'
+            assert competidora.revisado_por == usuario_admin.id
+            assert competidora.comentarios_admin == COMENTARIO_RECHAZO_ADOPTADA
+
+    def test_aprobar_dos_veces_falla(self, app, solicitud_pendiente, usuario_admin):
+        """Test: No se puede aprobar una solicitud ya revisada."""
+        otra_id = self.crear_competidoras(solicitud_pendiente.mascota_id, 1)[0]
+        solicitud_pendiente.aprobar(usuario_admin.id)
+
+        with pytest.raises(ValueError):
+            db.session.get(Solicitud, otra_id).aprobar(usuario_admin.id)
+
     def test_rechazar_metodo(self, app, solicitud_pendiente, usuario_admin):
         """Test: Método rechazar() funciona correctamente."""
         solicitud_pendiente.rechazar(usuario_admin.id, 'Rechazada')
@@ -308,3 +687,273 @@ class TestModelo:
         assert 'Solicitud' in repr_str
         assert str(solicitud_pendiente.id) in repr_str
         assert 'pendiente' in repr_str
+
+
+class TestQueryBudget:
+    """Tests de número de queries (evitar N+1 en los listados)."""
+
+    def crear_solicitudes(self, n, inicio=0):
+        """Helper: crea n solicitudes de usuarios y mascotas distintos."""
+        from app.models import Usuario
+        for i in range(inicio, inicio + n):
+            usuario = Usuario(email=f'n1_{i}@test.com', nombre=f'Usuario {i}', password='pass123')
+            mascota = Mascota(nombre=f'Mascota {i}', especie='Perro', descripcion='Descripción de prueba')
+            db.session.add_all([usuario, mascota])
+            db.session.flush()
+            db.session.add(Solicitud(usuario_id=usuario.id, mascota_id=mascota.id))
+        db.session.commit()
+        db.session.expire_all()
+
+    def test_admin_lista_sin_n1(self, client, auth_headers_admin, query_budget):
+        """Test: El panel admin no hace una query por fila."""
+        self.crear_solicitudes(1)
+        with query_budget(10) as una_fila:
+            assert client.get('/solicitudes/admin').status_code == 200
+
+        self.crear_solicitudes(5, inicio=1)
+        with query_budget(una_fila.total) as seis_filas:
+            assert client.get('/solicitudes/admin').status_code == 200
+
+        assert seis_filas.repetidas() == []
+
+    def test_revisar_una_query_para_relaciones(self, client, auth_headers_admin, solicitud_pendiente, query_budget):
+        """Test: Revisar carga solicitud, mascota y usuario en una query."""
+        solicitud_id = solicitud_pendiente.id
+        db.session.expire_all()
+
+        # Usuario de la sesión + solicitud con mascota y usuario
+        with query_budget(2):
+            response = client.get(f'/solicitudes/admin/revisar/{solicitud_id}')
+        assert response.status_code == 200
+
+
+class TestArchivo:
+    """Tests del archivado de solicitudes resueltas antiguas."""
+
+    def crear_resueltas(self, mascota, estados, dias):
+        """Helper: crea solicitudes con estado y antigüedad dados."""
+        ids = []
+        for i, estado in enumerate(estados):
+            usuario = Usuario(email=f'archivo{dias}-{estado}-{i}@test.com', nombre='Archivo', password='pass123')
+            db.session.add(usuario)
+            db.session.flush()
+            solicitud = Solicitud(usuario_id=usuario.id, mascota_id=mascota.id, cuestionario={'tiene_jardin': True})
+            solicitud.estado = estado
+            solicitud.fecha_solicitud = datetime.utcnow() - timedelta(days=dias)
+            db.session.add(solicitud)
+            db.session.flush()
+            ids.append(solicitud.id)
+        db.session.commit()
+        return ids
+
+    def test_archiva_solo_resueltas_antiguas(self, app, mascota_disponible):
+        """Test: Se archivan las resueltas antiguas, por lotes; el resto se queda."""
+        from app.archivo import archivar_solicitudes
+        from app.models import RespuestasCuestionario, SolicitudArchivada
+
+        antiguas = self.crear_resueltas(mascota_disponible, ['aprobada', 'rechazada', 'rechazada'], dias=400)
+        pendiente = self.crear_resueltas(mascota_disponible, ['pendiente'], dias=400)
+        recientes = self.crear_resueltas(mascota_disponible, ['rechazada'], dias=10)
+
+        assert archivar_solicitudes(dias=365, lote=2) == 3
+
+        db.session.expire_all()
+        assert sorted(s.id for s in Solicitud.query.all()) == pendiente + recientes
+        assert sorted(s.id for s in SolicitudArchivada.query.all()) == antiguas
+        assert db.session.get(RespuestasCuestionario, antiguas[0]) is None
+        archivada = db.session.get(SolicitudArchivada, antiguas[0])
+        assert archivada.estado == 'aprobada'
+        assert archivada.cuestionario_json == {'tiene_jardin': True}
+
+        # Repetirlo no hace nada
+        assert archivar_solicitudes(dias=365) == 0
+
+    def test_detalle_archivada(self, client, app, usuario_adoptante, mascota_disponible):
+        """Test: El detalle de una solicitud archivada se sigue viendo."""
+        from app.archivo import archivar_solicitudes
+
+        solicitud = Solicitud(usuario_id=usuario_adoptante.id, mascota_id=mascota_disponible.id,
+                              cuestionario={'vivienda_tipo': 'casa'})
+        solicitud.estado = 'rechazada'
+        solicitud.comentarios_admin = 'Motivo archivado'
+        solicitud.fecha_solicitud = datetime.utcnow() - timedelta(days=800)
+        db.session.add(solicitud)
+        db.session.commit()
+        solicitud_id = solicitud.id
+        archivar_solicitudes()
+
+        client.post('/auth/login', data={'email': 'adoptante@test.com', 'password': 'password123'})
+        response = client.get(f'/solicitudes/detalle/{solicitud_id}')
+
+        assert response.status_code == 200
+        assert b'Motivo archivado' in response.data
+        assert b'Archivada' in response.data
+        assert client.get('/solicitudes/detalle/99999').status_code == 404
+
+    def test_archivada_cuenta_como_duplicada(self, app, usuario_adoptante, mascota_disponible):
+        """Test: Una solicitud archivada impide volver a solicitar la misma mascota."""
+        from app.archivo import archivar_solicitudes
+        from app.models import ConflictoSolicitud
+
+        solicitud = Solicitud(usuario_id=usuario_adoptante.id, mascota_id=mascota_disponible.id)
+        solicitud.estado = 'rechazada'
+        solicitud.fecha_solicitud = datetime.utcnow() - timedelta(days=800)
+        db.session.add(solicitud)
+        db.session.commit()
+        assert archivar_solicitudes() == 1
+
+        with pytest.raises(ConflictoSolicitud, match='Ya has enviado'):
+            Solicitud.crear(usuario_adoptante.id, mascota_disponible.id)
+        assert db.session.get(Mascota, mascota_disponible.id).estado == 'disponible'
+
+
+class TestEventosSSE:
+    """Tests para los eventos en tiempo real del estado de las solicitudes (app/eventos.py)."""
+
+    @pytest.fixture
+    def token(self, client, usuario_adoptante):
+        """JWT del adoptante para /api/solicitudes/mias/eventos."""
+        response = client.post('/api/auth/login', json={'email': 'adoptante@test.com', 'password': 'password123'})
+        return response.get_json()['token']
+
+    def abrir(self, client, token, **headers):
+        """Abre el flujo SSE de la API sin leerlo entero."""
+        headers['Authorization'] = f'Bearer {token}'
+        return client.get('/api/solicitudes/mias/eventos', headers=headers, buffered=False)
+
+    def test_evento_tras_revision(self, client, token, usuario_admin, solicitud_pendiente):
+        """Al rechazar la solicitud el flujo abierto recibe el evento."""
+        response = self.abrir(client, token)
+        assert response.mimetype == 'text/event-stream'
+        assert 'Content-Encoding' not in response.headers
+
+        flujo = iter(response.response)
+        assert next(flujo) == b'retry: 3000\n\n'
+
+        solicitud_pendiente.rechazar(usuario_admin.id, 'No')
+
+        evento = next(flujo).decode()
+        assert evento.startswith('id: ') and '\nevent: solicitud\n' in evento
+        assert f'"solicitud_id":{solicitud_pendiente.id}' in evento
+        assert '"estado":"rechazada"' in evento
+        response.close()
+
+    def test_reconexion_con_last_event_id(self, app, client, token, usuario_admin, usuario_adoptante):
+        """Con Last-Event-ID se repiten solo los eventos posteriores."""
+        from app import eventos
+        from app.models import EventoSolicitud
+
+        for estado in ('rechazada', 'aprobada'):
+            eventos.registrar(usuario_adoptante.id, 1, estado)
+        eventos.registrar(usuario_admin.id, 2, 'rechazada')
+        db.session.commit()
+        primero = EventoSolicitud.query.order_by(EventoSolicitud.id).first()
+
+        app.config['EVENTOS_DURACION_MAXIMA_SEGUNDOS'] = 0
+        cuerpo = self.abrir(client, token, **{'Last-Event-ID': str(primero.id)}).get_data(as_text=True)
+
+        assert cuerpo.count('event: solicitud') == 1
+        assert '"estado":"aprobada"' in cuerpo
+
+        # Sin Last-Event-ID solo los nuevos
+        cuerpo = self.abrir(client, token).get_data(as_text=True)
+        assert 'event: solicitud' not in cuerpo
+
+    def test_latido(self, app, client, token):
+        """Sin eventos se envían comentarios de latido hasta la duración máxima."""
+        app.config['EVENTOS_LATIDO_SEGUNDOS'] = 0.01
+        app.config['EVENTOS_DURACION_MAXIMA_SEGUNDOS'] = 0.05
+
+        cuerpo = self.abrir(client, token).get_data(as_text=True)
+        assert ': latido\n\n' in cuerpo
+        # Al cerrar el flujo se libera la suscripción
+        assert not app.extensions['eventos']._colas
+
+    def test_rollback_sin_evento(self, app, usuario_adoptante):
+        """Si la transacción se deshace no hay evento ni aviso."""
+        from app import eventos
+        from app.models import EventoSolicitud
+
+        broker = app.extensions['eventos']
+        cola = broker.suscribir(usuario_adoptante.id)
+        eventos.registrar(usuario_adoptante.id, 1, 'rechazada')
+        db.session.rollback()
+
+        assert EventoSolicitud.query.count() == 0
+        assert cola.empty()
+
+        eventos.registrar(usuario_adoptante.id, 1, 'rechazada')
+        db.session.commit()
+        assert cola.get_nowait() is True
+
+    def test_aprobar_avisa_a_los_rechazados(self, usuario_admin, usuario_adoptante, mascota_disponible):
+        """Aprobar una solicitud genera eventos también para las rechazadas automáticamente."""
+        from app.models import EventoSolicitud
+
+        otro = Usuario(email='otro@test.com', nombre='Otro', password='password123')
+        db.session.add(otro)
+        db.session.commit()
+        aprobada = Solicitud.crear(usuario_adoptante.id, mascota_disponible.id, {'vivienda_tipo': 'casa'})
+        rechazada = Solicitud(usuario_id=otro.id, mascota_id=mascota_disponible.id, cuestionario={})
+        db.session.add(rechazada)
+        db.session.commit()
+
+        aprobada.aprobar(usuario_admin.id)
+
+        eventos = {(e.usuario_id, e.solicitud_id, e.estado) for e in EventoSolicitud.query.all()}
+        assert eventos == {
+            (usuario_adoptante.id, aprobada.id, 'aprobada'),
+            (otro.id, rechazada.id, 'rechazada')
+        }
+
+    def test_flujo_web(self, app, client, auth_headers_adoptante, solicitud_pendiente):
+        """mis_solicitudes abre el flujo SSE de la sesión web si hay pendientes."""
+        app.config['EVENTOS_DURACION_MAXIMA_SEGUNDOS'] = 0
+
+        assert 'EventSource' in client.get('/solicitudes/mis-solicitudes').get_data(as_text=True)
+        response = client.get('/solicitudes/mis-solicitudes/eventos')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+
+        # Sin pendientes no hay nada que esperar: no se abre el flujo
+        solicitud_pendiente.estado = 'rechazada'
+        db.session.commit()
+        assert 'EventSource' not in client.get('/solicitudes/mis-solicitudes').get_data(as_text=True)
+
+    def test_limite_de_flujos(self, app, client, token):
+        """Por encima de EVENTOS_MAX_FLUJOS se responde 503 con Retry-After."""
+        app.config['EVENTOS_MAX_FLUJOS'] = 1
+
+        abierto = self.abrir(client, token)
+        assert abierto.status_code == 200
+
+        rechazado = self.abrir(client, token)
+        assert rechazado.status_code == 503
+        assert rechazado.headers['Retry-After'] == '3'
+        assert rechazado.get_data(as_text=True) == 'retry: 3000\n\n'
+
+        # Al cerrar el primero (aunque no se haya leído) queda sitio
+        abierto.close()
+        assert app.extensions['eventos'].abiertas() == 0
+        app.config['EVENTOS_DURACION_MAXIMA_SEGUNDOS'] = 0
+        assert self.abrir(client, token).status_code == 200
+
+    def test_flujo_requiere_login(self, client):
+        """Sin sesión ni JWT no hay flujo."""
+        assert client.get('/solicitudes/mis-solicitudes/eventos').status_code == 302
+        assert client.get('/api/solicitudes/mias/eventos').status_code == 401
+
+    def test_limpiar_eventos(self, app, usuario_adoptante):
+        """flask limpiar-eventos borra los eventos antiguos."""
+        from app.models import EventoSolicitud
+
+        db.session.add_all([
+            EventoSolicitud(usuario_id=usuario_adoptante.id, solicitud_id=1, estado='aprobada',
+                            fecha=datetime.utcnow() - timedelta(hours=48)),
+            EventoSolicitud(usuario_id=usuario_adoptante.id, solicitud_id=2, estado='aprobada')
+        ])
+        db.session.commit()
+
+        resultado = app.test_cli_runner().invoke(args=['limpiar-eventos'])
+        assert '1 eventos borrados' in resultado.output
+        assert EventoSolicitud.query.count() == 1